@@ -0,0 +1,2 @@
+# Modules shared by the listing, abstract and full-text Lambdas. Package this
+# directory next to each handler so `from common... import ...` resolves.
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from common.single_flight import single_flight
+
+# Records larger than this go to S3 in the DynamoDB tier (DynamoDB items cap at 400 KB)
+DYNAMO_INLINE_LIMIT = 300 * 1024
+# Parser version of the abstracts get_abstract stores; the listing reranker reads them under the same one
+ABSTRACT_PARSER_VERSION = "1"
+
+
+def canonical_url(url: str) -> str:
+    """Normalize an article URL so equivalent links share one store key."""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    if scheme == "http":
+        scheme = "https"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not k.startswith("utm_")))
+    return urlunsplit((scheme, parts.netloc.lower(), path, query, ""))
+
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    if not doi:
+        return None
+    doi = doi.strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "doi:"):
+        if doi.startswith(prefix):
+            doi = doi[len(prefix):]
+    doi = doi.strip()
+    # Extractors use placeholders such as "DOI not available" when nothing was found
+    return doi if doi.startswith("10.") else None
+
+
+def doi_from_blocks(blocks: Any) -> Optional[str]:
+    """Find the DOI in a list of full-text content blocks, if one was extracted."""
+    if not isinstance(blocks, list):
+        return None
+    for block in blocks:
+        if isinstance(block, dict) and block.get("type") == "doi":
+            return normalize_doi(block.get("content"))
+    return None
+
+
+def is_storable(result: Any) -> bool:
+    """Error payloads from the extractors are never persisted."""
+    if isinstance(result, dict):
+        return "error" not in result and result.get("status") != "error"
+    return bool(result)
+
+
+class SQLiteArticleStore:
+    """Local store: one row per (canonical URL, kind) with a DOI index."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            " url TEXT NOT NULL, kind TEXT NOT NULL, doi TEXT, parser_version TEXT NOT NULL,"
+            " data TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (url, kind))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS articles_doi ON articles (doi, kind)")
+        self._conn.commit()
+
+    def get(self, url: str, kind: str, parser_version: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM articles WHERE url = ? AND kind = ? AND parser_version = ?",
+                (canonical_url(url), kind, parser_version),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_by_doi(self, doi: str, kind: str, parser_version: str) -> Optional[Any]:
+        doi = normalize_doi(doi)
+        if not doi:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM articles WHERE doi = ? AND kind = ? AND parser_version = ? ORDER BY updated_at DESC LIMIT 1",
+                (doi, kind, parser_version),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def url_for_doi(self, doi: str) -> Optional[str]:
+        doi = normalize_doi(doi)
+        if not doi:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url FROM articles WHERE doi = ? ORDER BY updated_at DESC LIMIT 1", (doi,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, url: str, kind: str, parser_version: str, data: Any, doi: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles (url, kind, doi, parser_version, data, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (canonical_url(url), kind, normalize_doi(doi), parser_version, json.dumps(data), time.time()),
+            )
+            self._conn.commit()
+
+
+class DynamoArticleStore:
+    """Production tier: DynamoDB table keyed by (url, kind) with a `doi-index` GSI.
+
+    Payloads too large for a DynamoDB item are written to S3 and the item keeps
+    only the object key.
+    """
+
+    def __init__(self, table_name: str, bucket: Optional[str] = None):
+        import boto3
+        self._table = boto3.resource("dynamodb").Table(table_name)
+        self._s3 = boto3.client("s3") if bucket else None
+        self._bucket = bucket
+
+    def _load(self, item: Optional[Dict], parser_version: str) -> Optional[Any]:
+        if not item or item.get("parser_version") != parser_version:
+            return None
+        if "data_key" in item:
+            body = self._s3.get_object(Bucket=self._bucket, Key=item["data_key"])["Body"].read()
+            return json.loads(body)
+        return json.loads(item["data"])
+
+    def get(self, url: str, kind: str, parser_version: str) -> Optional[Any]:
+        response = self._table.get_item(Key={"url": canonical_url(url), "kind": kind})
+        return self._load(response.get("Item"), parser_version)
+
+    def _query_doi(self, doi: str, kind: Optional[str] = None):
+        from boto3.dynamodb.conditions import Key
+        condition = Key("doi").eq(doi)
+        if kind:
+            condition = condition & Key("kind").eq(kind)
+        return self._table.query(IndexName="doi-index", KeyConditionExpression=condition).get("Items", [])
+
+    def get_by_doi(self, doi: str, kind: str, parser_version: str) -> Optional[Any]:
+        doi = normalize_doi(doi)
+        if not doi:
+            return None
+        items = self._query_doi(doi, kind)
+        if not items:
+            return None
+        # GSI items may be projected without the payload; fetch the base item
+        return self.get(items[0]["url"], kind, parser_version)
+
+    def url_for_doi(self, doi: str) -> Optional[str]:
+        doi = normalize_doi(doi)
+        items = self._query_doi(doi) if doi else []
+        return items[0]["url"] if items else None
+
+    def put(self, url: str, kind: str, parser_version: str, data: Any, doi: Optional[str] = None) -> None:
+        key = canonical_url(url)
+        item = {"url": key, "kind": kind, "parser_version": parser_version, "updated_at": int(time.time())}
+        doi = normalize_doi(doi)
+        if doi:
+            item["doi"] = doi
+        payload = json.dumps(data)
+        if self._s3 and len(payload) > DYNAMO_INLINE_LIMIT:
+            data_key = f"articles/{kind}/{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+            self._s3.put_object(Bucket=self._bucket, Key=data_key, Body=payload.encode("utf-8"))
+            item["data_key"] = data_key
+        else:
+            item["data"] = payload
+        self._table.put_item(Item=item)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_article_store():
+    """Return the process-wide store selected by ARTICLE_STORE_BACKEND (sqlite, dynamodb or none)."""
+    global _store
+    backend = os.environ.get("ARTICLE_STORE_BACKEND", "sqlite").lower()
+    if backend == "none":
+        return None
+    with _store_lock:
+        if _store is None:
+            if backend == "dynamodb":
+                _store = DynamoArticleStore(
+                    os.environ.get("ARTICLE_STORE_TABLE", "article_store"),
+                    os.environ.get("ARTICLE_STORE_BUCKET"),
+                )
+            else:
+                _store = SQLiteArticleStore(os.environ.get("ARTICLE_STORE_PATH", "/tmp/article_store.sqlite3"))
+        return _store
+
+
+def remember(url: str, kind: str, parser_version: str, result: Any,
+             doi_of: Callable[[Any], Optional[str]] = doi_from_blocks) -> None:
+    """Persist a result that was produced as a by-product of another request."""
+    store = get_article_store()
+    if store is None or not is_storable(result):
+        return
+    try:
+        store.put(url, kind, parser_version, result, doi_of(result))
+    except Exception as e:
+        print(f"Article store write failed: {str(e)}")
+
+
+def read_through(url: str, kind: str, parser_version: str, compute: Callable[[], Any],
+                 doi_of: Callable[[Any], Optional[str]] = doi_from_blocks) -> Any:
+    """Serve `kind` for `url` from the store, or compute, persist and return it.
+
+    Concurrent misses for the same article share one computation (and, with a
+    shared lease table, one computation across containers). Store failures
+    never fail the request; the article is simply parsed again.
+    """
+    store = get_article_store()
+
+    def lookup():
+        try:
+            return store.get(url, kind, parser_version)
+        except Exception as e:
+            print(f"Article store read failed: {str(e)}")
+            return None
+
+    if store is not None:
+        cached = lookup()
+        if cached is not None:
+            return cached
+
+    def compute_and_store():
+        result = compute()
+        remember(url, kind, parser_version, result, doi_of)
+        return result
+
+    key = f"article|{kind}|{parser_version}|{canonical_url(url)}"
+    return single_flight(key, compute_and_store, lookup if store is not None else None)
@@ -0,0 +1,36 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connections kept alive per upstream host
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "32"))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def shared_session() -> requests.Session:
+    """One keep-alive connection pool per process, shared by every handler and thread.
+
+    A warm Lambda container or a server worker reuses TLS connections to
+    PubMed, medRxiv and PLOS across requests instead of reconnecting per call.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def get(url, **kwargs) -> requests.Response:
+    return shared_session().get(url, **kwargs)
+
+
+def post(url, **kwargs) -> requests.Response:
+    return shared_session().post(url, **kwargs)
@@ -0,0 +1,284 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from common import http_pool
+from common.article_store import normalize_doi
+
+# NCBI PMC ID Converter; answers up to IDCONV_BATCH_SIZE identifiers of one type per request
+IDCONV_URL = os.environ.get("IDCONV_URL", "https://pmc.ncbi.nlm.nih.gov/tools/idconv/api/v1/articles/")
+IDCONV_BATCH_SIZE = 200
+IDCONV_TIMEOUT = float(os.environ.get("IDCONV_TIMEOUT", "5"))
+# Identifier mappings practically never change; a missing PMC copy may appear later
+ID_CACHE_TTL = int(os.environ.get("ID_CACHE_TTL", str(30 * 24 * 3600)))
+ID_CACHE_MISS_TTL = int(os.environ.get("ID_CACHE_MISS_TTL", str(24 * 3600)))
+
+PMID = "pmid"
+PMCID = "pmcid"
+DOI = "doi"
+
+PMCID_PATTERN = re.compile(r"\bPMC(\d+)\b", re.I)
+PMID_PATTERN = re.compile(r"^(?:pmid:?\s*)?(\d{1,9})$", re.I)
+PUBMED_URL_PATTERN = re.compile(r"pubmed\.ncbi\.nlm\.nih\.gov/(\d+)")
+
+# DOI prefixes whose publishers have their own full-text extractor; no lookup needed
+PUBLISHER_DOI_PREFIXES = {"10.1101/": "medrxiv", "10.1371/": "plos"}
+
+
+class IdentifierLookupError(Exception):
+    """The ID Converter failed, so an identifier's mapping is unknown rather than absent.
+
+    status_code is 502 when NCBI answered with an error and 503 when it could
+    not be reached in time.
+    """
+
+    def __init__(self, message: str, status_code: int = 503):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_identifier(value: str) -> Optional[Tuple[str, str]]:
+    """(kind, normalized value) for a PMID, PMCID, DOI or PubMed/PMC/doi.org URL."""
+    value = (value or "").strip()
+    doi = normalize_doi(value)
+    if doi:
+        return DOI, doi
+    match = PMCID_PATTERN.search(value)
+    if match:
+        return PMCID, f"PMC{match.group(1)}"
+    match = PUBMED_URL_PATTERN.search(value) or PMID_PATTERN.match(value)
+    if match:
+        return PMID, match.group(1)
+    return None
+
+
+def pmc_article_url(pmcid: str) -> str:
+    return f"https://pmc.ncbi.nlm.nih.gov/articles/{pmcid}/"
+
+
+def _cache_key(kind: str, value: str) -> str:
+    return f"{kind}:{value}"
+
+
+def _is_fresh(record: Dict, stored_at: float) -> bool:
+    ttl = ID_CACHE_TTL if record else ID_CACHE_MISS_TTL
+    return stored_at >= time.time() - ttl
+
+
+class SQLiteIdentifierCache:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS identifiers (key TEXT PRIMARY KEY, data TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, data, stored_at FROM identifiers WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, data, stored_at in rows:
+                    record = json.loads(data)
+                    if _is_fresh(record, stored_at):
+                        found[key] = record
+        return found
+
+    def put_many(self, records: Dict[str, Dict]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO identifiers (key, data, stored_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(record), now) for key, record in records.items()],
+            )
+            self._conn.commit()
+
+
+class DynamoIdentifierCache:
+    """DynamoDB table with string partition key `key`; enable TTL on `expires_at`."""
+
+    def __init__(self, table_name: str):
+        import boto3
+        self._resource = boto3.resource("dynamodb")
+        self._table_name = table_name
+        self._table = self._resource.Table(table_name)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict]:
+        found = {}
+        for start in range(0, len(keys), 100):
+            response = self._resource.batch_get_item(
+                RequestItems={self._table_name: {"Keys": [{"key": key} for key in keys[start:start + 100]]}}
+            )
+            # Unprocessed keys are treated as misses and converted again
+            for item in response.get("Responses", {}).get(self._table_name, []):
+                record = json.loads(item["data"])
+                if _is_fresh(record, int(item["stored_at"])):
+                    found[item["key"]] = record
+        return found
+
+    def put_many(self, records: Dict[str, Dict]) -> None:
+        now = int(time.time())
+        with self._table.batch_writer(overwrite_by_pkeys=["key"]) as batch:
+            for key, record in records.items():
+                ttl = ID_CACHE_TTL if record else ID_CACHE_MISS_TTL
+                batch.put_item(Item={"key": key, "data": json.dumps(record), "stored_at": now, "expires_at": now + ttl})
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_identifier_cache():
+    """Process-wide identifier cache selected by ID_CACHE_BACKEND (sqlite, dynamodb or none)."""
+    global _cache
+    backend = os.environ.get("ID_CACHE_BACKEND", "sqlite").lower()
+    if backend == "none":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            if backend == "dynamodb":
+                _cache = DynamoIdentifierCache(os.environ.get("ID_CACHE_TABLE", "article_identifiers"))
+            else:
+                _cache = SQLiteIdentifierCache(os.environ.get("ID_CACHE_PATH", "/tmp/identifiers.sqlite3"))
+        return _cache
+
+
+def _normalize_record(record: Dict) -> Dict:
+    normalized = {}
+    if record.get("pmid"):
+        normalized[PMID] = str(record["pmid"])
+    if record.get("pmcid"):
+        normalized[PMCID] = str(record["pmcid"]).upper()
+    doi = normalize_doi(record.get("doi"))
+    if doi:
+        normalized[DOI] = doi
+    return normalized
+
+
+def convert_ids(kind: str, values: List[str]) -> Dict[str, Dict]:
+    """Batched ID Converter lookups for identifiers of one kind; unknown ones map to {}."""
+    converted = {}
+    for start in range(0, len(values), IDCONV_BATCH_SIZE):
+        batch = values[start:start + IDCONV_BATCH_SIZE]
+        params = {"ids": ",".join(batch), "idtype": kind, "format": "json",
+                  "tool": os.environ.get("NCBI_TOOL", "infer-server-less")}
+        if os.environ.get("NCBI_EMAIL"):
+            params["email"] = os.environ["NCBI_EMAIL"]
+        if os.environ.get("NCBI_API_KEY"):
+            params["api_key"] = os.environ["NCBI_API_KEY"]
+        response = http_pool.get(IDCONV_URL, params=params, timeout=IDCONV_TIMEOUT)
+        response.raise_for_status()
+        for record in response.json().get("records", []):
+            requested = parse_identifier(str(record.get("requested-id", "")))
+            if requested is None or record.get("status") == "error":
+                continue
+            converted[requested[1]] = _normalize_record(record)
+    return {value: converted.get(value, {}) for value in values}
+
+
+def remember_identifiers(record: Dict) -> None:
+    """Cache a mapping learned elsewhere (e.g. from a scraped PubMed page) under each of its ids."""
+    record = _normalize_record(record)
+    cache = get_identifier_cache()
+    if cache is None or not record:
+        return
+    try:
+        cache.put_many({_cache_key(kind, value): record for kind, value in record.items()})
+    except Exception as e:
+        print(f"Identifier cache write failed: {str(e)}")
+
+
+def resolve_identifiers(values: Iterable[str], strict: bool = False) -> Dict[str, Dict]:
+    """Map each identifier to {"pmid", "pmcid", "doi"} (whichever exist); {} when NCBI has no record.
+
+    Cached mappings are answered locally; everything else costs one ID
+    Converter request per identifier kind and batch. Unparseable values are
+    left out of the result, and so are ones whose conversion failed, unless
+    `strict`, which raises IdentifierLookupError for those instead.
+    """
+    parsed = {value: parse_identifier(value) for value in values}
+    keys = sorted({_cache_key(*kv) for kv in parsed.values() if kv})
+    cache = get_identifier_cache()
+    known: Dict[str, Dict] = {}
+    if cache is not None and keys:
+        try:
+            known = cache.get_many(keys)
+        except Exception as e:
+            print(f"Identifier cache read failed: {str(e)}")
+
+    missing: Dict[str, List[str]] = {}
+    for key in keys:
+        if key not in known:
+            kind, value = key.split(":", 1)
+            missing.setdefault(kind, []).append(value)
+
+    learned: Dict[str, Dict] = {}
+    failure: Optional[IdentifierLookupError] = None
+    for kind, batch in missing.items():
+        try:
+            converted = convert_ids(kind, batch)
+        except Exception as e:
+            # Not cached, so the next request tries again
+            print(f"ID conversion failed for {len(batch)} {kind}s: {str(e)}")
+            failure = IdentifierLookupError(f"ID conversion failed: {str(e)}",
+                                            502 if isinstance(e, (requests.HTTPError, ValueError)) else 503)
+            continue
+        for value, record in converted.items():
+            learned[_cache_key(kind, value)] = record
+            for other_kind, other_value in record.items():
+                learned[_cache_key(other_kind, other_value)] = record
+    if cache is not None and learned:
+        try:
+            cache.put_many(learned)
+        except Exception as e:
+            print(f"Identifier cache write failed: {str(e)}")
+    if strict and failure is not None:
+        raise failure
+
+    known.update(learned)
+    return {value: known[_cache_key(*kv)] for value, kv in parsed.items() if kv and _cache_key(*kv) in known}
+
+
+def needs_conversion(identifier: str) -> bool:
+    """Whether full_text_target has to map this identifier through the ID Converter."""
+    parsed = parse_identifier(identifier)
+    if parsed is None or parsed[0] == PMCID:
+        return False
+    kind, value = parsed
+    return not (kind == DOI and value.startswith(tuple(PUBLISHER_DOI_PREFIXES)))
+
+
+def full_text_target(identifier: str, records: Optional[Dict[str, Dict]] = None) -> Optional[Tuple[str, str]]:
+    """(dispatcher source, full-text URL) for any article identifier, or None if there is no full text.
+
+    `records` are mappings already fetched with resolve_identifiers (e.g. in
+    batches); without them the identifier is resolved on its own. Raises
+    IdentifierLookupError when that can't be told because the ID Converter failed.
+    """
+    parsed = parse_identifier(identifier)
+    if parsed is None:
+        return None
+    kind, value = parsed
+    if kind == DOI:
+        for prefix, source in PUBLISHER_DOI_PREFIXES.items():
+            if value.startswith(prefix):
+                if source == "medrxiv":
+                    return source, f"https://www.medrxiv.org/content/{value}.full-text"
+                return source, f"https://journals.plos.org/plosone/article?id={value}"
+    if kind == PMCID:
+        return "pubmed", pmc_article_url(value)
+    if records is None:
+        records = resolve_identifiers([identifier], strict=True)
+    record = records.get(identifier) or {}
+    return ("pubmed", pmc_article_url(record[PMCID])) if record.get(PMCID) else None
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from common.article_store import DYNAMO_INLINE_LIMIT, canonical_url
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "error"
+
+# Completed results are shared by every submitter of the same article for this long
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", str(24 * 3600)))
+# A pending or running job older than this is assumed lost and may be claimed again
+JOB_STALE_AFTER = int(os.environ.get("JOB_STALE_AFTER", "900"))
+
+Job = Dict[str, Any]  # {"job_id", "source", "params"}
+Execute = Callable[[Job], Any]
+
+
+def job_id_for(source: str, params: Dict[str, str]) -> str:
+    """Stable id per (source, canonical URL, passthrough params), so repeat submissions share one job."""
+    variant = "&".join(f"{key}={params[key]}" for key in sorted(params) if key != "url")
+    key = f"{source}|{canonical_url(params['url'])}|{variant}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _claimable(record: Optional[Dict], now: float) -> bool:
+    if record is None or record["status"] == FAILED:
+        return True
+    if record["status"] == DONE:
+        return record["updated_at"] < now - JOB_RESULT_TTL
+    return record["updated_at"] < now - JOB_STALE_AFTER
+
+
+class SQLiteJobStore:
+    """Local job table; results are kept inline as JSON."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY, source TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL,"
+            " result TEXT, error TEXT, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _get(self, job_id: str) -> Optional[Dict]:
+        row = self._conn.execute(
+            "SELECT job_id, source, params, status, result, error, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row[0], "source": row[1], "params": json.loads(row[2]), "status": row[3],
+            "result": json.loads(row[4]) if row[4] is not None else None, "error": row[5], "updated_at": row[6],
+        }
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._get(job_id)
+
+    def claim(self, job: Job) -> bool:
+        """Create the job as pending unless a live or completed copy exists; True if the caller should run it."""
+        now = time.time()
+        with self._lock:
+            if not _claimable(self._get(job["job_id"]), now):
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, source, params, status, result, error, updated_at)"
+                " VALUES (?, ?, ?, ?, NULL, NULL, ?)",
+                (job["job_id"], job["source"], json.dumps(job["params"]), PENDING, now),
+            )
+            self._conn.commit()
+            return True
+
+    def update(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+            self._conn.commit()
+
+
+class DynamoJobStore:
+    """DynamoDB job table keyed by `job_id`; enable TTL on `expires_at`.
+
+    Large results go to S3 like the article store's payloads.
+    """
+
+    def __init__(self, table_name: str, bucket: Optional[str] = None):
+        import boto3
+        self._table = boto3.resource("dynamodb").Table(table_name)
+        self._s3 = boto3.client("s3") if bucket else None
+        self._bucket = bucket
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        item = self._table.get_item(Key={"job_id": job_id}, ConsistentRead=True).get("Item")
+        if not item:
+            return None
+        result = None
+        if "result_key" in item:
+            result = json.loads(self._s3.get_object(Bucket=self._bucket, Key=item["result_key"])["Body"].read())
+        elif "result" in item:
+            result = json.loads(item["result"])
+        return {
+            "job_id": item["job_id"], "source": item["source"], "params": json.loads(item["params"]),
+            "status": item["status"], "result": result, "error": item.get("error"),
+            "updated_at": int(item["updated_at"]),
+        }
+
+    def claim(self, job: Job) -> bool:
+        from botocore.exceptions import ClientError
+        now = int(time.time())
+        try:
+            self._table.put_item(
+                Item={
+                    "job_id": job["job_id"], "source": job["source"], "params": json.dumps(job["params"]),
+                    "status": PENDING, "updated_at": now, "expires_at": now + JOB_STALE_AFTER,
+                },
+                ConditionExpression=(
+                    "attribute_not_exists(job_id) OR #s = :failed"
+                    " OR (#s = :done AND updated_at < :done_cutoff)"
+                    " OR (#s <> :done AND updated_at < :stale_cutoff)"
+                ),
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={
+                    ":failed": FAILED, ":done": DONE,
+                    ":done_cutoff": now - JOB_RESULT_TTL, ":stale_cutoff": now - JOB_STALE_AFTER,
+                },
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+
+    def update(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        now = int(time.time())
+        names = {"#s": "status"}
+        values = {":status": status, ":now": now, ":expires": now + (JOB_RESULT_TTL if status == DONE else JOB_STALE_AFTER)}
+        assignments = ["#s = :status", "updated_at = :now", "expires_at = :expires"]
+        if result is not None:
+            payload = json.dumps(result)
+            if self._s3 and len(payload) > DYNAMO_INLINE_LIMIT:
+                result_key = f"jobs/{job_id}.json"
+                self._s3.put_object(Bucket=self._bucket, Key=result_key, Body=payload.encode("utf-8"))
+                assignments.append("result_key = :result_key")
+                values[":result_key"] = result_key
+            else:
+                assignments.append("#r = :result")
+                names["#r"] = "result"
+                values[":result"] = payload
+        if error is not None:
+            assignments.append("#e = :error")
+            names["#e"] = "error"
+            values[":error"] = error
+        self._table.update_item(
+            Key={"job_id": job_id},
+            UpdateExpression="SET " + ", ".join(assignments),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+
+def run_job(store, job: Job, execute: Execute) -> None:
+    """Execute a claimed job and record its outcome; failures are stored, never raised."""
+    store.update(job["job_id"], RUNNING)
+    try:
+        result = execute(job)
+    except Exception as e:
+        print(f"Job {job['job_id']} failed: {str(e)}")
+        store.update(job["job_id"], FAILED, error=str(e))
+        return
+    store.update(job["job_id"], DONE, result=result)
+
+
+class LambdaJobRunner:
+    """Runs each job in a fresh asynchronous (Event) invocation of `function_name`.
+
+    The target receives {"job": {...}} and should call `run_job` with it.
+    """
+
+    def __init__(self, function_name: str):
+        import boto3
+        self._client = boto3.client("lambda")
+        self._function_name = function_name
+
+    def submit(self, store, job: Job, execute: Execute) -> None:
+        self._client.invoke(FunctionName=self._function_name, InvocationType="Event", Payload=json.dumps({"job": job}))
+
+
+class LocalJobRunner:
+    """Thread pool stand-in for Event invocations, for local runs and tests.
+
+    `execute` replaces the caller's executor, e.g. to call the extractor
+    handlers in-process instead of invoking their Lambdas.
+    """
+
+    def __init__(self, workers: int = 4, execute: Optional[Execute] = None):
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._execute = execute
+
+    def submit(self, store, job: Job, execute: Execute) -> None:
+        self._pool.submit(run_job, store, job, self._execute or execute)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+_store = None
+_runner = None
+_lock = threading.Lock()
+
+
+def job_backends():
+    """(runner, store backend) from JOB_RUNNER and JOB_STORE_BACKEND.
+
+    Lambda-run jobs execute, and are polled, in other containers than the one
+    that submitted them, so they need the shared DynamoDB store; it is the
+    default there and a local SQLite store is refused.
+    """
+    runner = os.environ.get("JOB_RUNNER", "lambda").lower()
+    backend = os.environ.get("JOB_STORE_BACKEND", "dynamodb" if runner == "lambda" else "sqlite").lower()
+    if runner == "lambda" and backend != "dynamodb":
+        raise RuntimeError(f"JOB_RUNNER=lambda needs JOB_STORE_BACKEND=dynamodb, not {backend!r}: "
+                           "a store under /tmp is not visible to the invocations that run and poll the job")
+    return runner, backend
+
+
+def get_job_store():
+    """Process-wide job store selected by JOB_STORE_BACKEND (sqlite or dynamodb; see job_backends)."""
+    global _store
+    with _lock:
+        if _store is None:
+            if job_backends()[1] == "dynamodb":
+                _store = DynamoJobStore(os.environ.get("JOB_STORE_TABLE", "fulltext_jobs"),
+                                        os.environ.get("JOB_STORE_BUCKET"))
+            else:
+                _store = SQLiteJobStore(os.environ.get("JOB_STORE_PATH", "/tmp/fulltext_jobs.sqlite3"))
+        return _store
+
+
+def set_job_runner(runner) -> None:
+    """Install a runner explicitly, e.g. a LocalJobRunner in tests."""
+    global _runner
+    with _lock:
+        _runner = runner
+
+
+def get_job_runner(function_name: Optional[str] = None):
+    """Process-wide runner selected by JOB_RUNNER (lambda or local).
+
+    The Lambda runner re-invokes `function_name` (JOB_FUNCTION_NAME, else the
+    calling function itself) asynchronously for each job.
+    """
+    global _runner
+    with _lock:
+        if _runner is None:
+            if job_backends()[0] == "local":
+                _runner = LocalJobRunner(int(os.environ.get("JOB_WORKERS", "4")))
+            else:
+                _runner = LambdaJobRunner(os.environ.get("JOB_FUNCTION_NAME") or function_name)
+        return _runner
+
+
+def submit_job(source: str, params: Dict[str, str], execute: Execute, function_name: Optional[str] = None) -> Dict:
+    """Return the job for (source, params), starting it only if no live or completed copy exists."""
+    store = get_job_store()
+    job = {"job_id": job_id_for(source, params), "source": source, "params": params}
+    if store.claim(job):
+        try:
+            get_job_runner(function_name).submit(store, job, execute)
+        except Exception as e:
+            store.update(job["job_id"], FAILED, error=f"Could not start job: {str(e)}")
+    return store.get(job["job_id"])
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+# Results older than this are searched again; ratings and new preprints drift within hours
+LISTING_CACHE_TTL = int(os.environ.get("LISTING_CACHE_TTL", str(6 * 3600)))
+
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+def listing_key(query: str, page: int = 1, sort: str = "relevance", start_date: Optional[str] = None,
+                end_date: Optional[str] = None, article_types: Optional[List[str]] = None,
+                subject_areas: Optional[List[str]] = None, source_mode: str = "live") -> str:
+    """Cache key for one listing request; case and spacing of the query do not matter."""
+    parts = [normalize_query(query), int(page), sort, start_date, end_date,
+             sorted(article_types or []), sorted(subject_areas or []), source_mode]
+    return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+class SQLiteListingCache:
+    def __init__(self, path: str, ttl_seconds: int = LISTING_CACHE_TTL):
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS listings (key TEXT PRIMARY KEY, data TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (result, stored_at) for a fresh entry."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, stored_at FROM listings WHERE key = ? AND stored_at >= ?", (key, time.time() - self._ttl)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def put(self, key: str, result: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO listings (key, data, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(result), time.time()),
+            )
+            self._conn.commit()
+
+
+class DynamoListingCache:
+    """DynamoDB table with string partition key `key`; enable TTL on `expires_at`."""
+
+    def __init__(self, table_name: str, ttl_seconds: int = LISTING_CACHE_TTL):
+        import boto3
+        self._table = boto3.resource("dynamodb").Table(table_name)
+        self._ttl = ttl_seconds
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        item = self._table.get_item(Key={"key": key}).get("Item")
+        # TTL deletion can lag by hours, so check freshness here too
+        if not item or int(item["stored_at"]) < time.time() - self._ttl:
+            return None
+        return json.loads(item["data"]), float(item["stored_at"])
+
+    def put(self, key: str, result: Any) -> None:
+        now = int(time.time())
+        self._table.put_item(Item={"key": key, "data": json.dumps(result), "stored_at": now, "expires_at": now + self._ttl})
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_listing_cache():
+    """Process-wide listing cache selected by LISTING_CACHE (none, sqlite or dynamodb); off by default."""
+    global _cache
+    backend = os.environ.get("LISTING_CACHE", "none").lower()
+    if backend == "none":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            if backend == "dynamodb":
+                _cache = DynamoListingCache(os.environ.get("LISTING_CACHE_TABLE", "listing_cache"))
+            else:
+                _cache = SQLiteListingCache(os.environ.get("LISTING_CACHE_PATH", "/tmp/listing_cache.sqlite3"))
+        return _cache
+
+
+def cached_listing(key: str) -> Optional[Tuple[Any, float]]:
+    cache = get_listing_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception as e:
+        print(f"Listing cache read failed: {str(e)}")
+        return None
+
+
+def store_listing(key: str, result: Any) -> None:
+    """Cache successful listings only; failures never fail the search."""
+    cache = get_listing_cache()
+    if cache is None or not isinstance(result, dict) or result.get("statusCode") != 200:
+        return
+    try:
+        cache.put(key, result)
+    except Exception as e:
+        print(f"Listing cache write failed: {str(e)}")
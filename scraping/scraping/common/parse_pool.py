@@ -0,0 +1,217 @@
+"""Process-wide worker pool for CPU-bound HTML parsing.
+
+BeautifulSoup with html.parser is pure Python, so parses started on handler
+threads run one at a time under the GIL even after their downloads have
+overlapped. Handing them to this pool lets them use the other vCPUs.
+
+PARSE_POOL selects the workers:
+    process      ProcessPoolExecutor (default outside Lambda)
+    pipes        worker processes fed over multiprocessing Pipes (default on
+                 Lambda, which has no /dev/shm for the semaphores the
+                 executor's queues need)
+    interpreter  InterpreterPoolExecutor, Python 3.14+; falls back to process
+    off          parse in the calling thread
+PARSE_WORKERS defaults to the vCPUs this process may run on. With fewer than
+two, or where no pool can be created, tasks run in the calling thread.
+
+Workers are started with forkserver (spawn where unavailable): the pool is
+created from handler threads, and forking a multithreaded process can leave
+the child holding another thread's locks. Each worker re-imports the main
+script as __mp_main__, so scripts that use the pool keep their work under
+`if __name__ == "__main__"` (the Lambda bootstrap and uvicorn already do).
+
+Tasks must be module-level functions of a module that imports cheaply, and
+should take and return plain data (bytes in, lists and dicts out): both
+directions are pickled.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+PARSE_POOL = os.environ.get("PARSE_POOL", "pipes" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else "process").lower()
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "0")) or _available_cpus()
+
+_pool = None
+_pool_lock = threading.Lock()
+# Set once pool creation has failed, so later calls don't retry it
+_unavailable = False
+
+
+def _mp_context():
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _pipe_worker(conn) -> None:
+    while True:
+        message = conn.recv()
+        if message is None:
+            return
+        task, args = message
+        try:
+            conn.send((True, task(*args)))
+        except Exception as e:
+            conn.send((False, e))
+
+
+class PipePool:
+    """A fixed set of worker processes, each driven over its own Pipe.
+
+    Needs no semaphores or shared memory, only processes and socket pairs, so
+    it works on Lambda. Each call occupies one worker until its result is back.
+    """
+
+    def __init__(self, workers: int):
+        context = _mp_context()
+        self._idle: "queue.Queue" = queue.Queue()
+        self._processes = []
+        self._conns = []
+        for _ in range(workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_pipe_worker, args=(child_conn,), daemon=True)
+            process.start()
+            child_conn.close()
+            self._processes.append(process)
+            self._conns.append(parent_conn)
+            self._idle.put(parent_conn)
+
+    def _take(self, count: int = 1):
+        conns = [self._idle.get() for _ in range(count)]
+        if None in conns:
+            # A worker died or the pool was shut down; the sentinel wakes every other waiter too
+            for conn in conns:
+                self._idle.put(conn)
+            raise BrokenProcessPool("Parse pool is no longer usable")
+        return conns
+
+    def run(self, task: Callable[..., Any], *args) -> Any:
+        conn, = self._take()
+        try:
+            conn.send((task, args))
+            ok, result = conn.recv()
+        except (EOFError, OSError) as e:
+            self._idle.put(None)
+            raise BrokenProcessPool(f"Parse worker exited: {str(e)}")
+        self._idle.put(conn)
+        if not ok:
+            raise result
+        return result
+
+    def run_on_each(self, task: Callable[..., Any], *args) -> None:
+        """task(*args) once on every worker, e.g. to have each import its parsers."""
+        conns = self._take(len(self._conns))
+        try:
+            for conn in conns:
+                conn.send((task, args))
+            results = [conn.recv() for conn in conns]
+        except (EOFError, OSError) as e:
+            self._idle.put(None)
+            raise BrokenProcessPool(f"Parse worker exited: {str(e)}")
+        for conn in conns:
+            self._idle.put(conn)
+        for ok, result in results:
+            if not ok:
+                raise result
+
+    def shutdown(self, wait: bool = True) -> None:
+        for conn in self._conns:
+            self._idle.put(None)
+            try:
+                conn.send(None)
+                conn.close()
+            except OSError:
+                pass
+        for process in self._processes:
+            if wait:
+                process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+def _create_pool():
+    if PARSE_POOL == "pipes":
+        return PipePool(PARSE_WORKERS)
+    if PARSE_POOL == "interpreter":
+        try:
+            from concurrent.futures import InterpreterPoolExecutor
+            return InterpreterPoolExecutor(max_workers=PARSE_WORKERS)
+        except ImportError:
+            print("InterpreterPoolExecutor unavailable; parsing on a process pool")
+    return ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=_mp_context())
+
+
+def get_parse_pool():
+    """The shared pool, created on first use; None when parsing stays in the calling thread."""
+    global _pool, _unavailable
+    if PARSE_POOL == "off" or PARSE_WORKERS < 2 or _unavailable:
+        return None
+    with _pool_lock:
+        if _pool is None and not _unavailable:
+            try:
+                _pool = _create_pool()
+            except (OSError, NotImplementedError) as e:
+                print(f"Parse pool unavailable, parsing in-thread: {str(e)}")
+                _unavailable = True
+        return _pool
+
+
+def _discard(pool, error: Exception) -> None:
+    global _pool
+    print(f"Parse pool broken, replacing it: {str(error)}")
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _run(pool, task: Callable[..., Any], *args) -> Any:
+    if isinstance(pool, PipePool):
+        return pool.run(task, *args)
+    return pool.submit(task, *args).result()
+
+
+def run_parse(task: Callable[..., Any], *args) -> Any:
+    """task(*args) on the parse pool, waiting for the result.
+
+    Exceptions raised by the task propagate. If a worker died (e.g. out of
+    memory) the pool is replaced and this call runs in the calling thread.
+    """
+    pool = get_parse_pool()
+    if pool is None:
+        return task(*args)
+    try:
+        return _run(pool, task, *args)
+    except BrokenProcessPool as e:
+        _discard(pool, e)
+        return task(*args)
+
+
+def start_parse_workers(task: Callable[..., Any], *args) -> str:
+    """Give every worker task(*args) once, so it has started and imported the parsers; for warm-up requests.
+
+    Otherwise the first parses would pay for the process start and the imports.
+    """
+    pool = get_parse_pool()
+    if pool is None:
+        task(*args)
+        return "in-thread"
+    if isinstance(pool, PipePool):
+        pool.run_on_each(task, *args)
+    else:
+        # All submitted before any is awaited, so no worker is idle yet and each one gets started
+        futures = [pool.submit(task, *args) for _ in range(PARSE_WORKERS)]
+        for future in futures:
+            future.result()
+    return f"{type(pool).__name__} x{PARSE_WORKERS}"
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+# Listing source labels -> full-text dispatcher source keys
+LISTING_SOURCES = {"PubMed": "pubmed", "MedRxiv": "medrxiv", "PLOS": "plos"}
+
+Job = Tuple[str, str]  # (source, url)
+Worker = Callable[[str, str], None]
+
+
+def jobs_from_listing(articles: Iterable[dict], top_k: int) -> List[Job]:
+    """Turn the first `top_k` ranked listing results into prewarm jobs."""
+    jobs = []
+    for article in articles:
+        if len(jobs) >= top_k:
+            break
+        source = LISTING_SOURCES.get(article.get("source"))
+        url = article.get("url", "")
+        if source and url.startswith("http"):
+            jobs.append((source, url))
+    return jobs
+
+
+class InProcessPrewarmQueue:
+    """Bounded in-memory queue drained by daemon threads; the local stand-in for SQS."""
+
+    def __init__(self, worker: Worker, max_depth: int = 50, workers: int = 2):
+        self._worker = worker
+        self._queue: "queue.Queue[Job]" = queue.Queue(maxsize=max_depth)
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def enqueue(self, jobs: Iterable[Job]) -> int:
+        accepted = 0
+        for source, url in jobs:
+            with self._lock:
+                if url in self._in_flight:
+                    continue
+                try:
+                    self._queue.put_nowait((source, url))
+                except queue.Full:
+                    break
+                self._in_flight.add(url)
+            accepted += 1
+        return accepted
+
+    def join(self) -> None:
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            source, url = self._queue.get()
+            try:
+                self._worker(source, url)
+            except Exception as e:
+                print(f"Prewarm failed for {url}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(url)
+                self._queue.task_done()
+
+
+class SQLitePrewarmQueue:
+    """Durable local queue: pending jobs are rows keyed by URL, so duplicates collapse.
+
+    Only processes on the same host see it; the container server drains it
+    with `start_draining` (see server/app.py).
+    """
+
+    def __init__(self, path: str, max_depth: int = 50, stale_after: float = 900.0):
+        self._max_depth = max_depth
+        self._stale_after = stale_after
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prewarm_jobs ("
+            " url TEXT PRIMARY KEY, source TEXT NOT NULL, status TEXT NOT NULL, enqueued_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def enqueue(self, jobs: Iterable[Job]) -> int:
+        accepted = 0
+        with self._lock:
+            depth = self._conn.execute("SELECT COUNT(*) FROM prewarm_jobs").fetchone()[0]
+            for source, url in jobs:
+                if depth >= self._max_depth:
+                    break
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO prewarm_jobs (url, source, status, enqueued_at) VALUES (?, ?, 'pending', ?)",
+                    (url, source, time.time()),
+                )
+                depth += cursor.rowcount
+                accepted += cursor.rowcount
+            self._conn.commit()
+        return accepted
+
+    def _claim(self, limit: int) -> List[Job]:
+        # enqueued_at is reset when a job is claimed, so a 'running' row left by a
+        # process that died is claimable again after stale_after seconds
+        now = time.time()
+        with self._lock:
+            # Server workers drain the same file; the write lock makes select-and-claim atomic
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT url, source FROM prewarm_jobs WHERE status = 'pending' OR (status = 'running' AND enqueued_at < ?)"
+                    " ORDER BY enqueued_at LIMIT ?", (now - self._stale_after, limit)
+                ).fetchall()
+                self._conn.executemany("UPDATE prewarm_jobs SET status = 'running', enqueued_at = ? WHERE url = ?",
+                                       [(now, url) for url, _ in rows])
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return rows
+
+    def drain(self, worker: Worker, limit: int = 10) -> int:
+        """Run up to `limit` pending jobs; finished jobs are removed so the URL can be queued again."""
+        rows = self._claim(limit)
+        for url, source in rows:
+            try:
+                worker(source, url)
+            except Exception as e:
+                print(f"Prewarm failed for {url}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._conn.execute("DELETE FROM prewarm_jobs WHERE url = ?", (url,))
+                    self._conn.commit()
+        return len(rows)
+
+    def start_draining(self, worker: Worker, interval: float = 2.0, limit: int = 10) -> threading.Thread:
+        """Drain on a daemon thread for the life of the process, polling every `interval` seconds when idle."""
+        def run():
+            while True:
+                try:
+                    drained = self.drain(worker, limit)
+                except Exception as e:
+                    print(f"Prewarm drain failed: {str(e)}")
+                    drained = 0
+                if not drained:
+                    time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="prewarm-drain", daemon=True)
+        thread.start()
+        return thread
+
+
+class SQSPrewarmQueue:
+    """Production queue: an SQS FIFO queue whose deduplication id is the URL hash.
+
+    Depth is bounded with the queue's approximate message count, refreshed at
+    most every `depth_ttl` seconds.
+    """
+
+    def __init__(self, queue_url: str, max_depth: int = 500, depth_ttl: float = 10.0):
+        import boto3
+        self._sqs = boto3.client("sqs")
+        self._queue_url = queue_url
+        self._max_depth = max_depth
+        self._depth_ttl = depth_ttl
+        self._depth = 0
+        self._depth_checked = 0.0
+
+    def _approximate_depth(self) -> int:
+        if time.time() - self._depth_checked > self._depth_ttl:
+            attributes = self._sqs.get_queue_attributes(
+                QueueUrl=self._queue_url,
+                AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible"],
+            )["Attributes"]
+            self._depth = int(attributes["ApproximateNumberOfMessages"]) + int(attributes["ApproximateNumberOfMessagesNotVisible"])
+            self._depth_checked = time.time()
+        return self._depth
+
+    def enqueue(self, jobs: Iterable[Job]) -> int:
+        room = self._max_depth - self._approximate_depth()
+        entries = []
+        for idx, (source, url) in enumerate(jobs):
+            if len(entries) >= min(room, 10):  # SQS batches hold at most 10 messages
+                break
+            entries.append({
+                "Id": str(idx),
+                "MessageBody": json.dumps({"source": source, "url": url}),
+                "MessageGroupId": source,
+                "MessageDeduplicationId": hashlib.sha1(url.encode("utf-8")).hexdigest(),
+            })
+        if not entries:
+            return 0
+        response = self._sqs.send_message_batch(QueueUrl=self._queue_url, Entries=entries)
+        accepted = len(response.get("Successful", []))
+        self._depth += accepted
+        return accepted
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def set_prewarm_queue(prewarm_queue) -> None:
+    """Install a queue explicitly, e.g. an InProcessPrewarmQueue wired to the extractors."""
+    global _queue
+    with _queue_lock:
+        _queue = prewarm_queue
+
+
+def get_prewarm_queue():
+    """Process-wide queue selected by PREWARM_QUEUE (none, sqlite or sqs)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            backend = os.environ.get("PREWARM_QUEUE", "none").lower()
+            max_depth = int(os.environ.get("PREWARM_MAX_DEPTH", "50"))
+            if backend == "sqs":
+                _queue = SQSPrewarmQueue(os.environ["PREWARM_QUEUE_URL"], max_depth)
+            elif backend == "sqlite":
+                _queue = SQLitePrewarmQueue(os.environ.get("PREWARM_QUEUE_PATH", "/tmp/prewarm_queue.sqlite3"), max_depth)
+        return _queue
+
+
+def enqueue_top_results(articles: List[dict], top_k: Optional[int] = None) -> int:
+    """Queue full-text prewarming for the top ranked results; never fails the search."""
+    if top_k is None:
+        top_k = int(os.environ.get("PREWARM_TOP_K", "0"))
+    if top_k <= 0:
+        return 0
+    try:
+        prewarm_queue = get_prewarm_queue()
+        if prewarm_queue is None:
+            return 0
+        return prewarm_queue.enqueue(jobs_from_listing(articles, top_k))
+    except Exception as e:
+        print(f"Prewarm enqueue failed: {str(e)}")
+        return 0
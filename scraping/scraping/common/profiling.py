@@ -0,0 +1,170 @@
+"""Opt-in per-invocation profiling.
+
+PROFILE=on profiles every call of a `@profiled` function; PROFILE_SAMPLE_PERCENT=5
+profiles about one call in twenty. Each profiled call runs under cProfile and
+tracemalloc and writes <name>-<timestamp>-<id>.prof (load with pstats or
+snakeviz) plus a .json summary with the call's arguments, wall time, peak
+traced memory and top allocation sites to PROFILE_OUTPUT: a directory
+(default /tmp/profiles) or s3://bucket/prefix.
+
+Both variables are read at import. When neither is set `profiled` returns the
+function untouched, so disabled profiling costs nothing per call.
+"""
+import cProfile
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+PROFILE_ALWAYS = os.environ.get("PROFILE", "off").lower() in ("1", "on", "true")
+PROFILE_SAMPLE_PERCENT = float(os.environ.get("PROFILE_SAMPLE_PERCENT", "0"))
+PROFILE_OUTPUT = os.environ.get("PROFILE_OUTPUT", "/tmp/profiles")
+TOP_ALLOCATIONS = int(os.environ.get("PROFILE_TOP_ALLOCATIONS", "25"))
+
+# cProfile allows one active profiler per thread; nested profiled calls are
+# already covered by the outer profile
+_local = threading.local()
+# tracemalloc is process-wide; it stays on while any profiled call is running
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+# Whether profiling turned tracemalloc on; if something else did (e.g. replay
+# --trace-memory), it is left running
+_started_tracing = False
+
+
+def enabled() -> bool:
+    return PROFILE_ALWAYS or PROFILE_SAMPLE_PERCENT > 0
+
+
+def _sampled() -> bool:
+    return PROFILE_ALWAYS or random.random() * 100 < PROFILE_SAMPLE_PERCENT
+
+
+def _start_tracing() -> None:
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        _tracing_users += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+
+
+def _stop_tracing() -> None:
+    # Whichever call finishes last stops tracing, not necessarily the one that started it
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def _describe(value: Any) -> Any:
+    # Handlers are tagged with their query parameters rather than the whole event
+    if isinstance(value, dict) and "queryStringParameters" in value:
+        return value.get("queryStringParameters") or {}
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value if not isinstance(value, str) else value[:200]
+    return repr(value)[:200]
+
+
+def call_tags(fn: Callable, args: tuple, kwargs: dict) -> Dict[str, Any]:
+    try:
+        bound = inspect.signature(fn).bind_partial(*args, **kwargs)
+    except TypeError:
+        return {"args": [_describe(a) for a in args], **{k: _describe(v) for k, v in kwargs.items()}}
+    return {name: _describe(value) for name, value in bound.arguments.items() if name != "context"}
+
+
+def write_artifacts(name: str, profiler: cProfile.Profile, summary: Dict[str, Any]) -> Optional[str]:
+    """Write the .prof and .json pair; returns the common path prefix. Never raises."""
+    stem = f"{name}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+    try:
+        if PROFILE_OUTPUT.startswith("s3://"):
+            import boto3
+            import tempfile
+            bucket, _, prefix = PROFILE_OUTPUT[len("s3://"):].partition("/")
+            key = f"{prefix.rstrip('/')}/{stem}" if prefix else stem
+            s3 = boto3.client("s3")
+            with tempfile.NamedTemporaryFile(suffix=".prof") as f:
+                profiler.dump_stats(f.name)
+                s3.upload_file(f.name, bucket, key + ".prof")
+            s3.put_object(Bucket=bucket, Key=key + ".json", Body=json.dumps(summary, default=str).encode("utf-8"))
+            return f"s3://{bucket}/{key}"
+
+        os.makedirs(PROFILE_OUTPUT, exist_ok=True)
+        path = os.path.join(PROFILE_OUTPUT, stem)
+        profiler.dump_stats(path + ".prof")
+        with open(path + ".json", "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+        return path
+    except Exception as e:
+        print(f"Profile artifact write failed for {name}: {str(e)}")
+        return None
+
+
+def profiled(name: str) -> Callable[[Callable], Callable]:
+    """Profile calls of the decorated function when profiling is enabled.
+
+    Only the calling thread is profiled: work handed to a thread pool shows up
+    as waiting, so decorate the pooled functions too to see inside them. From
+    Python 3.12 only one profiler can run per process, so a pooled call made
+    while another call is being profiled runs unprofiled.
+    """
+    def decorate(fn: Callable) -> Callable:
+        if not enabled():
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "active", False) or not _sampled():
+                return fn(*args, **kwargs)
+
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process, and
+                # another thread's profiled call already holds it
+                return fn(*args, **kwargs)
+
+            _local.active = True
+            _start_tracing()
+            started = time.perf_counter()
+            error = None
+            try:
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    profiler.disable()
+            except BaseException as e:
+                error = f"{type(e).__name__}: {str(e)}"
+                raise
+            finally:
+                wall = time.perf_counter() - started
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                _stop_tracing()
+                _local.active = False
+                summary = {
+                    "name": name,
+                    "tags": call_tags(fn, args, kwargs),
+                    "wall_seconds": round(wall, 4),
+                    "traced_peak_mb": round(peak / (1024 * 1024), 2),
+                    "error": error,
+                    "top_allocations": [
+                        {"site": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+                    ],
+                }
+                write_artifacts(name, profiler, summary)
+
+        return wrapper
+
+    return decorate
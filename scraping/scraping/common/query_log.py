@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from common.listing_cache import normalize_query
+
+# Prefix of the structured log line written for every listing request
+QUERY_LOG_MARKER = "LISTING_QUERY"
+# Parameters that identify a search; paging and source_mode are chosen by the prewarmer
+QUERY_FIELDS = ("query", "start_date", "end_date", "article_types", "subject_areas")
+
+_file_lock = threading.Lock()
+
+
+def log_query(query_params: Dict) -> None:
+    """Record a listing request for the popular-query prewarmer; never fails the request.
+
+    The line goes to stdout (CloudWatch Logs on Lambda) and, when
+    QUERY_LOG_PATH is set, to a local JSONL file.
+    """
+    try:
+        record = {key: value for key, value in (query_params or {}).items() if value not in (None, "")}
+        record["ts"] = int(time.time())
+        line = json.dumps(record, sort_keys=True)
+        print(f"{QUERY_LOG_MARKER} {line}")
+        path = os.environ.get("QUERY_LOG_PATH")
+        if path:
+            with _file_lock, open(path, "a") as f:
+                f.write(line + "\n")
+    except Exception as e:
+        print(f"Query log write failed: {str(e)}")
+
+
+def read_query_log_file(path: str, since: float) -> List[Dict]:
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("ts", 0) >= since:
+                records.append(record)
+    return records
+
+
+def read_query_log_cloudwatch(log_group: str, since: float, limit: int = 50000) -> List[Dict]:
+    """Pull the structured query lines out of the listing Lambda's log group."""
+    import boto3
+    logs = boto3.client("logs")
+    records = []
+    kwargs = {"logGroupName": log_group, "startTime": int(since * 1000), "filterPattern": f'"{QUERY_LOG_MARKER}"'}
+    while len(records) < limit:
+        response = logs.filter_log_events(**kwargs)
+        for event in response.get("events", []):
+            _, _, payload = event["message"].partition(f"{QUERY_LOG_MARKER} ")
+            try:
+                records.append(json.loads(payload))
+            except ValueError:
+                continue
+        if "nextToken" not in response:
+            break
+        kwargs["nextToken"] = response["nextToken"]
+    return records[:limit]
+
+
+def read_query_log(since: float) -> List[Dict]:
+    """Query records since `since` from QUERY_LOG_PATH, else from QUERY_LOG_GROUP in CloudWatch Logs."""
+    path = os.environ.get("QUERY_LOG_PATH")
+    if path:
+        return read_query_log_file(path, since) if os.path.exists(path) else []
+    log_group = os.environ.get("QUERY_LOG_GROUP")
+    return read_query_log_cloudwatch(log_group, since) if log_group else []
+
+
+def search_identity(record: Dict) -> Tuple:
+    return tuple(normalize_query(record.get(field, "")) if field == "query" else record.get(field)
+                 for field in QUERY_FIELDS)
+
+
+def popular_searches(records: Iterable[Dict], top_n: int, sorts_per_query: int = 2) -> List[Tuple[Dict, List[str]]]:
+    """The `top_n` most frequent searches with their most used sort orders.
+
+    Each entry is (search parameters, sorts), most popular first.
+    """
+    searches: Counter = Counter()
+    sorts: Dict[Tuple, Counter] = {}
+    for record in records:
+        identity = search_identity(record)
+        if not identity[0]:
+            continue
+        searches[identity] += 1
+        sorts.setdefault(identity, Counter())[record.get("sort") or "relevance"] += 1
+
+    popular = []
+    for identity, _ in searches.most_common(top_n):
+        params = {field: value for field, value in zip(QUERY_FIELDS, identity) if value}
+        popular.append((params, [sort for sort, _ in sorts[identity].most_common(sorts_per_query)]))
+    return popular
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from common.article_store import canonical_url, normalize_doi
+from common.listing_cache import normalize_query
+
+# Seen keys kept per saved search (bounded to stay well inside a DynamoDB item);
+# once older keys are dropped, the per-source date watermarks exclude older articles
+MAX_SEEN = int(os.environ.get("SAVED_SEARCH_MAX_SEEN", "2000"))
+
+
+def saved_search_id(query: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    article_types: Optional[List[str]] = None, subject_areas: Optional[List[str]] = None) -> str:
+    parts = [normalize_query(query), start_date, end_date, sorted(article_types or []), sorted(subject_areas or [])]
+    return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def article_keys(article: Dict) -> List[str]:
+    """Identities an article can be recognised by across runs: its DOI and its canonical URL."""
+    keys = []
+    doi = normalize_doi(article.get("doi"))
+    if doi:
+        keys.append(f"doi:{doi}")
+    url = article.get("url") or ""
+    if url.startswith("http"):
+        keys.append(f"url:{canonical_url(url)}")
+    return keys
+
+
+class Watermark:
+    """What a saved search has already returned: the seen article keys and, per source, the newest date seen."""
+
+    def __init__(self, last_dates: Optional[Dict[str, str]] = None, seen: Optional[Iterable[str]] = None,
+                 runs: int = 0, truncated: bool = False, baselines: Optional[Iterable[str]] = None):
+        self.last_dates = dict(last_dates or {})  # source -> ISO yyyy-mm-dd
+        self.seen = list(seen or [])
+        self.runs = runs
+        # Sources whose first page has been recorded; a source that failed on earlier runs has none yet
+        self.baselines = sorted(set(baselines or []))
+        # Whether seen keys have been dropped, so older articles may no longer be recognised by key
+        self.truncated = truncated
+        self._seen_set = set(self.seen)
+
+    def has_seen(self, article: Dict) -> bool:
+        return any(key in self._seen_set for key in article_keys(article))
+
+    def is_older(self, source: str, date: Optional[str]) -> bool:
+        """Whether an unseen article from `source` predates what earlier runs already covered.
+
+        Only used once seen keys have been dropped: dates are unreliable (PubMed
+        issue dates are often ahead of indexing), so the keys decide while complete.
+        """
+        last_date = self.last_dates.get(source)
+        return self.truncated and bool(last_date and date and date < last_date)
+
+    def has_baseline(self, source: str) -> bool:
+        return source in self.baselines
+
+    def record_baseline(self, source: str) -> None:
+        if source not in self.baselines:
+            self.baselines = sorted(self.baselines + [source])
+
+    def mark_seen(self, articles: Iterable[Dict]) -> None:
+        for article in articles:
+            for key in article_keys(article):
+                if key not in self._seen_set:
+                    self._seen_set.add(key)
+                    self.seen.append(key)
+
+    def record_dates(self, source: str, dates: Iterable[Optional[str]]) -> None:
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        for date in dates:
+            # A future issue date would hold the watermark ahead of everything published until then
+            if date and date <= today and date > self.last_dates.get(source, ""):
+                self.last_dates[source] = date
+
+    def record_run(self) -> None:
+        if len(self.seen) > MAX_SEEN:
+            self.seen = self.seen[-MAX_SEEN:]
+            self._seen_set = set(self.seen)
+            self.truncated = True
+        self.runs += 1
+
+    def to_dict(self) -> Dict:
+        return {"last_dates": self.last_dates, "seen": self.seen, "runs": self.runs, "truncated": self.truncated,
+                "baselines": self.baselines}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "Watermark":
+        # Watermarks written before per-source dates carry a single last_date, which is not kept.
+        # Ones written before per-source baselines count a source as baselined once it has a date.
+        data = data or {}
+        baselines = data.get("baselines")
+        if baselines is None:
+            baselines = data.get("last_dates") or {}
+        return cls(data.get("last_dates"), data.get("seen"), data.get("runs", 0), data.get("truncated", False), baselines)
+
+
+class SQLiteSavedSearchStore:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS saved_searches ("
+            " search_id TEXT PRIMARY KEY, params TEXT NOT NULL, watermark TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, search_id: str) -> Optional[Watermark]:
+        with self._lock:
+            row = self._conn.execute("SELECT watermark FROM saved_searches WHERE search_id = ?", (search_id,)).fetchone()
+        return Watermark.from_dict(json.loads(row[0])) if row else None
+
+    def put(self, search_id: str, params: Dict, watermark: Watermark) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO saved_searches (search_id, params, watermark, updated_at) VALUES (?, ?, ?, ?)",
+                (search_id, json.dumps(params), json.dumps(watermark.to_dict()), time.time()),
+            )
+            self._conn.commit()
+
+
+class DynamoSavedSearchStore:
+    """DynamoDB table with string partition key `search_id`."""
+
+    def __init__(self, table_name: str):
+        import boto3
+        self._table = boto3.resource("dynamodb").Table(table_name)
+
+    def get(self, search_id: str) -> Optional[Watermark]:
+        item = self._table.get_item(Key={"search_id": search_id}, ConsistentRead=True).get("Item")
+        return Watermark.from_dict(json.loads(item["watermark"])) if item else None
+
+    def put(self, search_id: str, params: Dict, watermark: Watermark) -> None:
+        self._table.put_item(Item={
+            "search_id": search_id, "params": json.dumps(params),
+            "watermark": json.dumps(watermark.to_dict()), "updated_at": int(time.time()),
+        })
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_saved_search_store():
+    """Process-wide watermark store selected by SAVED_SEARCH_BACKEND (sqlite or dynamodb)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if os.environ.get("SAVED_SEARCH_BACKEND", "sqlite").lower() == "dynamodb":
+                _store = DynamoSavedSearchStore(os.environ.get("SAVED_SEARCH_TABLE", "saved_searches"))
+            else:
+                _store = SQLiteSavedSearchStore(os.environ.get("SAVED_SEARCH_PATH", "/tmp/saved_searches.sqlite3"))
+        return _store
@@ -0,0 +1,226 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from common.article_store import canonical_url, normalize_doi
+
+# Relative BM25 weights for the indexed columns: title, abstract, authors
+BM25_WEIGHTS = (10.0, 3.0, 1.0)
+
+# Listing labels; the abstract and full-text handlers use the lowercase source names
+SOURCE_LABELS = {"pubmed": "PubMed", "medrxiv": "MedRxiv", "plos": "PLOS"}
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# What scrapers write when a field is missing: "Title not available", "Title not
+# found", "No Title Found", "Date extraction error from DOI"
+_PLACEHOLDER_FIELD = r"(?:title|authors?|abstract|doi|date|link|type)"
+_PLACEHOLDER_RE = re.compile(
+    rf"{_PLACEHOLDER_FIELD} not (?:available|found)|no {_PLACEHOLDER_FIELD} found|date extraction error.*", re.I)
+
+
+def _sortable_date(value: Optional[str]) -> Optional[str]:
+    """Listing dates come as '%d-%b-%Y'; keep an ISO copy for ordering and range filters."""
+    if not value:
+        return None
+    for fmt in ("%d-%b-%Y", "%Y-%m-%d", "published %d %b %Y"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def _match_expression(query: str) -> Optional[str]:
+    # Quote every token so user input can never be read as FTS5 syntax
+    tokens = _TOKEN_RE.findall(query.lower())
+    return " ".join(f'"{token}"' for token in tokens) if tokens else None
+
+
+def is_placeholder(value) -> bool:
+    return bool(_PLACEHOLDER_RE.fullmatch(str(value).strip()))
+
+
+def abstract_text(abstract) -> str:
+    if isinstance(abstract, list):
+        return " ".join(_TAG_RE.sub(" ", str(block.get("content", ""))) for block in abstract if isinstance(block, dict))
+    return _TAG_RE.sub(" ", abstract or "")
+
+
+class SearchIndex:
+    """SQLite FTS5 index over titles, abstracts and authors of articles seen so far.
+
+    `articles` holds one row per canonical URL; the FTS table mirrors it through
+    triggers so every upsert updates the index incrementally.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY, url TEXT UNIQUE NOT NULL, link TEXT NOT NULL, title TEXT, abstract TEXT, authors TEXT,
+                source TEXT, doi TEXT, date TEXT, date_sort TEXT, pmid TEXT);
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                title, abstract, authors, content='articles', content_rowid='id');
+            CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+                INSERT INTO articles_fts(rowid, title, abstract, authors) VALUES (new.id, new.title, new.abstract, new.authors);
+            END;
+            CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+                INSERT INTO articles_fts(articles_fts, rowid, title, abstract, authors) VALUES ('delete', old.id, old.title, old.abstract, old.authors);
+            END;
+            CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+                INSERT INTO articles_fts(articles_fts, rowid, title, abstract, authors) VALUES ('delete', old.id, old.title, old.abstract, old.authors);
+                INSERT INTO articles_fts(rowid, title, abstract, authors) VALUES (new.id, new.title, new.abstract, new.authors);
+            END;
+        """)
+        self._conn.commit()
+
+    def upsert(self, url: str, title: Optional[str] = None, abstract: Optional[str] = None, authors: Optional[str] = None,
+               source: Optional[str] = None, doi: Optional[str] = None, date: Optional[str] = None, pmid: Optional[str] = None,
+               commit: bool = True) -> None:
+        """Insert or merge one article; fields that are missing now keep their stored value.
+
+        Rows are keyed by canonical URL but keep the URL as the caller saw it, so
+        local results carry the same links (and rating keys) as live ones.
+        """
+        if source:
+            source = SOURCE_LABELS.get(source.lower(), source)
+        fields = {
+            "link": url, "title": title, "abstract": abstract, "authors": authors, "source": source,
+            "doi": normalize_doi(doi), "date": date, "date_sort": _sortable_date(date), "pmid": pmid,
+        }
+        # Placeholders must never overwrite a real value stored from another page
+        fields = {key: value for key, value in fields.items() if value and not is_placeholder(value)}
+        columns = ["url"] + list(fields)
+        # The first link seen for an article is kept
+        updates = ", ".join(f"{column} = excluded.{column}" for column in fields if column != "link")
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO articles ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT(url) DO {f'UPDATE SET {updates}' if updates else 'NOTHING'}",
+                [canonical_url(url)] + list(fields.values()),
+            )
+            if commit:
+                self._conn.commit()
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def search(self, query: str, limit: int = 30, offset: int = 0, sort: str = "relevance",
+               start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
+        match = _match_expression(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT a.link, a.title, a.authors, a.source, a.doi, a.date, a.pmid, bm25(articles_fts, ?, ?, ?) AS rank "
+            "FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid WHERE articles_fts MATCH ?"
+        )
+        params: list = list(BM25_WEIGHTS) + [match]
+        if start_date and end_date:
+            sql += " AND a.date_sort BETWEEN ? AND ?"
+            params += [start_date, end_date]
+        if sort == "recent":
+            sql += " ORDER BY a.date_sort IS NULL, a.date_sort DESC, rank"
+        elif sort == "oldest":
+            sql += " ORDER BY a.date_sort IS NULL, a.date_sort ASC, rank"
+        else:
+            sql += " ORDER BY rank"
+        sql += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        articles = []
+        for row in rows:
+            article = {
+                "title": row["title"] or "Title not available",
+                "url": row["link"],
+                "authors": row["authors"] or "Authors not available",
+                "source": row["source"],
+                "doi": row["doi"],
+                "date": row["date"],
+                # bm25() is lower-is-better; flip it so it reads like a score
+                "local_score": -row["rank"],
+            }
+            if row["pmid"]:
+                article["pmid"] = row["pmid"]
+            articles.append(article)
+        return articles
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> Optional[SearchIndex]:
+    """Process-wide index at SEARCH_INDEX_PATH; SEARCH_INDEX=off disables indexing."""
+    global _index
+    if os.environ.get("SEARCH_INDEX", "on").lower() == "off":
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex(os.environ.get("SEARCH_INDEX_PATH", "/tmp/search_index.sqlite3"))
+        return _index
+
+
+def _safely(index_fn):
+    # Indexing is a side effect of serving a request and must never fail it
+    def wrapper(*args, **kwargs):
+        try:
+            index = get_search_index()
+            if index is not None:
+                index_fn(index, *args, **kwargs)
+        except Exception as e:
+            print(f"Search index update failed: {str(e)}")
+    return wrapper
+
+
+@_safely
+def index_listing_articles(index: SearchIndex, articles: Iterable[Dict]) -> None:
+    for article in articles:
+        url = article.get("url")
+        if not url or not url.startswith("http"):
+            continue
+        authors = article.get("authors")
+        index.upsert(
+            url,
+            title=article.get("title"),
+            authors=", ".join(authors) if isinstance(authors, list) else authors,
+            source=article.get("source"),
+            doi=article.get("doi"),
+            date=article.get("date"),
+            pmid=article.get("pmid"),
+            commit=False,
+        )
+    index.commit()
+
+
+@_safely
+def index_abstract_record(index: SearchIndex, url: str, source: str, record: Dict) -> None:
+    if not isinstance(record, dict) or "error" in record:
+        return
+    authors = record.get("authors")
+    index.upsert(
+        url,
+        title=record.get("title"),
+        abstract=abstract_text(record.get("abstract")),
+        authors=", ".join(authors) if isinstance(authors, list) else authors,
+        source=source,
+        doi=record.get("doi"),
+    )
+
+
+@_safely
+def index_full_text_blocks(index: SearchIndex, url: str, source: str, blocks) -> None:
+    if not isinstance(blocks, list):
+        return
+    title = next((block.get("content") for block in blocks if isinstance(block, dict) and block.get("type") == "title"), None)
+    doi = next((block.get("content") for block in blocks if isinstance(block, dict) and block.get("type") == "doi"), None)
+    index.upsert(url, title=title if isinstance(title, str) else None, source=source, doi=doi if isinstance(doi, str) else None)
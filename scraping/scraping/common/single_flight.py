@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller runs `fn`; callers arriving while it is in flight block
+    and receive the same result (or exception). Nothing is cached afterwards.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class DynamoLease:
+    """Cross-container lock: a conditional put on a DynamoDB item with an expiry.
+
+    The table needs a string partition key `key`; enable TTL on `expires_at`
+    so abandoned leases are cleaned up.
+    """
+
+    def __init__(self, table_name: str, ttl_seconds: int = 30):
+        import boto3
+        self._table = boto3.resource("dynamodb").Table(table_name)
+        self.ttl_seconds = ttl_seconds
+
+    def acquire(self, key: str) -> Optional[str]:
+        from botocore.exceptions import ClientError
+        token = uuid.uuid4().hex
+        now = int(time.time())
+        try:
+            self._table.put_item(
+                Item={"key": key, "token": token, "expires_at": now + self.ttl_seconds},
+                ConditionExpression="attribute_not_exists(#k) OR expires_at < :now",
+                ExpressionAttributeNames={"#k": "key"},
+                ExpressionAttributeValues={":now": now},
+            )
+            return token
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return None
+            raise
+
+    def release(self, key: str, token: str) -> None:
+        from botocore.exceptions import ClientError
+        try:
+            self._table.delete_item(
+                Key={"key": key},
+                ConditionExpression="#t = :token",
+                ExpressionAttributeNames={"#t": "token"},
+                ExpressionAttributeValues={":token": token},
+            )
+        except ClientError:
+            pass
+
+
+_flights = SingleFlight()
+_lease = None
+_lease_lock = threading.Lock()
+
+
+def get_lease() -> Optional[DynamoLease]:
+    """Shared lease store, enabled by setting SINGLE_FLIGHT_TABLE."""
+    global _lease
+    table_name = os.environ.get("SINGLE_FLIGHT_TABLE")
+    if not table_name:
+        return None
+    with _lease_lock:
+        if _lease is None:
+            _lease = DynamoLease(table_name, int(os.environ.get("SINGLE_FLIGHT_TTL", "30")))
+        return _lease
+
+
+def single_flight(key: str, fn: Callable[[], Any], lookup: Optional[Callable[[], Any]] = None,
+                  poll_interval: float = 0.25) -> Any:
+    """Run `fn` once per key across concurrent callers in this process.
+
+    When `lookup` is given and SINGLE_FLIGHT_TABLE is set, containers also
+    coordinate: only the lease holder runs `fn`, the others poll `lookup` (for
+    example the article store) until the result appears or the lease expires.
+    """
+    def run():
+        lease = get_lease() if lookup is not None else None
+        if lease is None:
+            return fn()
+        try:
+            token = lease.acquire(key)
+        except Exception as e:
+            print(f"Single-flight lease unavailable: {str(e)}")
+            return fn()
+        if token is not None:
+            try:
+                return fn()
+            finally:
+                lease.release(key, token)
+
+        deadline = time.time() + lease.ttl_seconds
+        while time.time() < deadline:
+            time.sleep(poll_interval)
+            result = lookup()
+            if result is not None:
+                return result
+        # The other container did not deliver in time; do the work here
+        return fn()
+
+    return _flights.do(key, run)
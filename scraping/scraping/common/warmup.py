@@ -0,0 +1,85 @@
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+from urllib.parse import urlsplit
+
+from common import http_pool
+
+Step = Tuple[str, Callable[[], Any]]
+
+
+def is_warmup(event: Any) -> bool:
+    """A keep-warm ping rather than a request.
+
+    Schedules and provisioned-concurrency hooks send {"warmup": true};
+    serverless-plugin-warmup's {"source": "serverless-plugin-warmup"} is
+    accepted too.
+    """
+    if not isinstance(event, dict):
+        return False
+    return bool(event.get("warmup")) or event.get("source") == "serverless-plugin-warmup"
+
+
+def open_connections(urls: Iterable[str], timeout: float = 3.0) -> Dict[str, Any]:
+    """Put one keep-alive connection per upstream host into the shared pool.
+
+    A HEAD of the site root does the DNS lookup and TLS handshake without
+    fetching any page a scraper would parse. Never pass a Lambda function
+    URL: every request to one is an invocation.
+
+    An unreachable host is reported under "failed" and the others are still
+    warmed; the step only fails when no host could be reached.
+    """
+    session = http_pool.shared_session()
+    opened, failed = [], {}
+    for url in urls:
+        parts = urlsplit(url)
+        try:
+            session.head(f"{parts.scheme}://{parts.netloc}/", timeout=timeout)
+            opened.append(parts.netloc)
+        except Exception as e:
+            failed[parts.netloc] = str(e)
+    if failed and not opened:
+        raise Exception(f"No upstream reachable: {json.dumps(failed)}")
+    return {"opened": opened, "failed": failed}
+
+
+def describe(component: Any) -> str:
+    """Step detail for a process singleton: its backend class, or "disabled"."""
+    return type(component).__name__ if component is not None else "disabled"
+
+
+def warm_parser() -> None:
+    # First use of html.parser builds BeautifulSoup's builder registry and tree classes
+    from bs4 import BeautifulSoup
+    BeautifulSoup("<html><body><p>warm</p></body></html>", "html.parser").get_text()
+
+
+def run_warmup(handler_name: str, steps: List[Step]) -> Dict:
+    """Run each initialization step once, timing it; a failed step is reported, not raised.
+
+    Steps return None or a short description of what they warmed.
+    """
+    started = time.perf_counter()
+    report = []
+    for name, step in steps:
+        step_started = time.perf_counter()
+        entry = {"step": name}
+        try:
+            detail = step()
+            entry["ok"] = True
+            if detail is not None:
+                entry["detail"] = detail
+        except Exception as e:
+            entry["ok"] = False
+            entry["error"] = str(e)
+        entry["ms"] = round((time.perf_counter() - step_started) * 1000, 1)
+        report.append(entry)
+    body = {
+        "warmup": handler_name,
+        "warmed": [entry["step"] for entry in report if entry["ok"]],
+        "steps": report,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    print(f"Warm-up: {json.dumps(body)}")
+    return {"statusCode": 200, "body": json.dumps(body)}
@@ -0,0 +1,424 @@
+"""Export full text for a list of article URLs or DOIs into JSONL shards.
+
+Downloads run concurrently on an asyncio loop (bounded by --concurrency, with
+a minimum interval per upstream host); parsing runs on a process pool across
+all cores with the same parsers the full-text Lambdas use. Each finished item
+is appended to the current shard and then to the checkpoint file, so an
+interrupted run started again with the same --out skips everything already
+exported and retries what failed.
+
+    python bulk_export.py --input urls.txt --out ./corpus --concurrency 16
+    python bulk_export.py --input dois.txt --out ./corpus --sections front,body --shard-size 5000
+
+Input is one item per line: an article URL (PMC, PubMed, medRxiv/bioRxiv,
+PLOS), a DOI, a PMID or a PMCID. Identifiers are mapped to full-text URLs
+through common/identifiers, in rate-limited ID Converter batches. Blank lines
+and lines starting with # are ignored.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+for path in (ROOT, os.path.join(ROOT, "full_text")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from bs4 import BeautifulSoup
+
+import bioRxiv_full
+import plos_full
+import pubmed_full
+from prewarm_worker import HEADERS, full_text_url_for
+from sections import FRONT, parse_sections
+from common import http_pool
+from common.article_store import doi_from_blocks
+from common.identifiers import (IDCONV_BATCH_SIZE, IDCONV_URL, IdentifierLookupError, full_text_target,
+                                needs_conversion, parse_identifier, resolve_identifiers)
+
+# Minimum seconds between requests to one host; NCBI allows 3 requests/second without an API key
+HOST_MIN_INTERVAL = {
+    "pmc.ncbi.nlm.nih.gov": 0.34,
+    "pubmed.ncbi.nlm.nih.gov": 0.34,
+    "www.medrxiv.org": 1.0,
+    "www.biorxiv.org": 1.0,
+    "journals.plos.org": 0.5,
+}
+DEFAULT_MIN_INTERVAL = 1.0
+# Seconds between progress lines
+REPORT_EVERY_SECONDS = 30
+
+
+def is_identifier(item: str) -> bool:
+    """A DOI, PMID or PMCID line rather than an article URL."""
+    return not item.startswith("http") or "doi.org/" in item
+
+
+def resolve_item(item: str, records: Dict[str, Dict]) -> Optional[Tuple[str, str]]:
+    """(source, article URL) for an input line, or None when no extractor handles it.
+
+    `records` holds the ID Converter mappings BulkExporter.resolve_identifiers
+    fetched for the line's batch, so this makes no requests.
+    """
+    if is_identifier(item):
+        return full_text_target(item, records)
+
+    host = urlsplit(item).hostname or ""
+    if host.endswith("ncbi.nlm.nih.gov"):
+        return "pubmed", item
+    if host.endswith("medrxiv.org") or host.endswith("biorxiv.org"):
+        return "medrxiv", item
+    if host == "journals.plos.org":
+        return "plos", item
+    return None
+
+
+def parse_document(source: str, url: str, html: str, sections: frozenset) -> Tuple[List[Dict], Optional[str]]:
+    """Process-pool task: parse one downloaded page into content blocks.
+
+    Returns the blocks and, for PMC pages whose front matter was requested and
+    found, the PMCID whose citations still have to be fetched (workers do no
+    network I/O).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    if source == "pubmed":
+        pmcid = None
+        # The extractor only adds citations to the front matter
+        if FRONT in sections and soup.find('section', {'class': 'front-matter'}):
+            pmcid = pubmed_full.pmcid_from_url(url) or pubmed_full.extract_pmcid(soup)
+        blocks = pubmed_full.parse_pubmed_full_text(soup, sections, fetch_citations=None, pmcid=pmcid)
+        return [block.to_dict() for block in blocks], pmcid
+    if source == "medrxiv":
+        return bioRxiv_full.parse_biorxiv_full_text(soup, sections), None
+    return plos_full.parse_plos_full_text(soup, sections), None
+
+
+class HostRateLimiter:
+    """Spaces out request starts per host; waiting happens on the event loop, not in a thread."""
+
+    def __init__(self, overrides: Optional[Dict[str, float]] = None):
+        self._intervals = {**HOST_MIN_INTERVAL, **(overrides or {})}
+        self._next_at: Dict[str, float] = {}
+
+    async def wait(self, url: str) -> None:
+        host = urlsplit(url).hostname or ""
+        now = time.monotonic()
+        start_at = max(now, self._next_at.get(host, 0.0))
+        self._next_at[host] = start_at + self._intervals.get(host, DEFAULT_MIN_INTERVAL)
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+
+class Checkpoint:
+    """Append-only JSONL of finished items: {"item", "status", "shard"|"error"}."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a killed run
+                    if record["status"] == "ok":
+                        self.done.add(record["item"])
+        self._file = open(path, "a")
+
+    def record(self, item: str, status: str, **details) -> None:
+        self._file.write(json.dumps({"item": item, "status": status, **details}) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ShardWriter:
+    """Writes records to part-NNNNN.jsonl files of at most `shard_size` lines.
+
+    A resumed run starts a new shard rather than appending to one that may
+    end in a partial line.
+    """
+
+    def __init__(self, out_dir: str, shard_size: int):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        existing = [name for name in os.listdir(out_dir) if name.startswith("part-") and name.endswith(".jsonl")]
+        self._index = len(existing)
+        self._count = 0
+        self._file = None
+        self.bytes_written = 0
+
+    @property
+    def shard_name(self) -> str:
+        return f"part-{self._index:05d}.jsonl"
+
+    def write(self, record: Dict) -> str:
+        if self._file is None or self._count >= self.shard_size:
+            if self._file is not None:
+                self._file.close()
+                self._index += 1
+            self._file = open(os.path.join(self.out_dir, self.shard_name), "a")
+            self._count = 0
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._file.write(line)
+        self._file.flush()
+        self._count += 1
+        self.bytes_written += len(line.encode("utf-8"))
+        return self.shard_name
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+class Stats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.exported = 0
+        self.failed = 0
+        self.skipped = 0
+        self.unsupported = 0
+        self.bytes_fetched = 0
+        self.fetch_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.by_source: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def snapshot(self, written_bytes: int = 0) -> Dict:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "exported": self.exported,
+            "failed": self.failed,
+            "skipped_checkpointed": self.skipped,
+            "unsupported": self.unsupported,
+            "elapsed_seconds": round(elapsed, 1),
+            "articles_per_second": round(self.exported / elapsed, 2),
+            "fetched_mb": round(self.bytes_fetched / 1e6, 1),
+            "fetched_mb_per_second": round(self.bytes_fetched / 1e6 / elapsed, 2),
+            "written_mb": round(written_bytes / 1e6, 1),
+            # Summed over concurrent items, so they can exceed elapsed time
+            "fetch_seconds_total": round(self.fetch_seconds, 1),
+            "parse_seconds_total": round(self.parse_seconds, 1),
+            "by_source": self.by_source,
+            "errors": self.errors,
+        }
+
+
+def read_items(path: str) -> Iterator[str]:
+    with open(path) as f:
+        for line in f:
+            item = line.strip()
+            if item and not item.startswith("#"):
+                yield item
+
+
+class BulkExporter:
+    def __init__(self, out_dir: str, sections: frozenset, concurrency: int, parse_workers: Optional[int],
+                 shard_size: int, host_intervals: Optional[Dict[str, float]] = None):
+        os.makedirs(out_dir, exist_ok=True)
+        self.sections = sections
+        self.concurrency = concurrency
+        self.checkpoint = Checkpoint(os.path.join(out_dir, "checkpoint.jsonl"))
+        self.shards = ShardWriter(out_dir, shard_size)
+        self.report_path = os.path.join(out_dir, "report.json")
+        self.limiter = HostRateLimiter(host_intervals)
+        # ID Converter results for queued identifier lines, filled a batch at a time
+        self.records: Dict[str, Dict] = {}
+        self.lookup_errors: Dict[str, IdentifierLookupError] = {}
+        self.stats = Stats()
+        # requests is blocking, so downloads run on threads driven by the event loop
+        self.io_pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="export-fetch")
+        self.parse_pool = ProcessPoolExecutor(max_workers=parse_workers or os.cpu_count())
+
+    async def fetch(self, url: str) -> str:
+        await self.limiter.wait(url)
+        started = time.monotonic()
+        response = await asyncio.get_running_loop().run_in_executor(
+            self.io_pool, lambda: http_pool.get(url, headers=HEADERS, timeout=60))
+        self.stats.fetch_seconds += time.monotonic() - started
+        response.raise_for_status()
+        self.stats.bytes_fetched += len(response.content)
+        return response.text
+
+    async def resolve_identifiers(self, items: List[str]) -> None:
+        """Map the identifier lines among `items` with one rate-limited ID Converter request per kind.
+
+        Items are at most IDCONV_BATCH_SIZE, so each kind fits in one request;
+        cached mappings cost none, but still take a slot from the limiter.
+        """
+        by_kind: Dict[str, List[str]] = {}
+        for item in items:
+            if is_identifier(item) and needs_conversion(item):
+                by_kind.setdefault(parse_identifier(item)[0], []).append(item)
+        for batch in by_kind.values():
+            await self.limiter.wait(IDCONV_URL)
+            try:
+                self.records.update(await asyncio.get_running_loop().run_in_executor(
+                    self.io_pool, lambda: resolve_identifiers(batch, strict=True)))
+            except IdentifierLookupError as e:
+                self.lookup_errors.update((item, e) for item in batch)
+
+    async def full_text_url(self, source: str, url: str) -> Optional[str]:
+        if source == "pubmed" and "pmc" not in url:
+            # PubMed pages link to the PMC copy; looking it up is one more request to PubMed
+            await self.limiter.wait(url)
+        return await asyncio.get_running_loop().run_in_executor(self.io_pool, full_text_url_for, source, url)
+
+    async def add_citations(self, blocks: List[Dict], pmcid: str) -> None:
+        """Insert the PMC citation formats; the article is exported without them if they cannot be fetched."""
+        await self.limiter.wait(f"https://pmc.ncbi.nlm.nih.gov/resources/citations/{pmcid}/")
+        try:
+            citations = await asyncio.get_running_loop().run_in_executor(
+                self.io_pool, pubmed_full.fetch_pubmed_citation, pmcid)
+        except Exception as e:
+            print(f"Citations for PMC{pmcid} not fetched: {str(e)}")
+            return
+        if citations:
+            # Same position the extractor gives them: right after the title
+            blocks.insert(1 if blocks and blocks[0].get("type") == "title" else 0,
+                          {"type": "citations", "content": citations})
+
+    async def export_item(self, item: str) -> None:
+        loop = asyncio.get_running_loop()
+        lookup_error = self.lookup_errors.pop(item, None)
+        if lookup_error is not None:
+            # Recorded as an error rather than unsupported, so a resumed run retries it
+            self.stats.failed += 1
+            self.stats.errors["IdentifierLookupError"] = self.stats.errors.get("IdentifierLookupError", 0) + 1
+            self.checkpoint.record(item, "error", error=f"IdentifierLookupError: {str(lookup_error)}")
+            return
+        resolved = resolve_item(item, self.records)
+        self.records.pop(item, None)
+        if resolved is None:
+            self.stats.unsupported += 1
+            self.checkpoint.record(item, "unsupported")
+            return
+        source, url = resolved
+        try:
+            target = await self.full_text_url(source, url)
+            if not target:
+                raise Exception("No full text link found")
+            html = await self.fetch(target)
+
+            started = time.monotonic()
+            blocks, pmcid = await loop.run_in_executor(self.parse_pool, parse_document, source, target, html, self.sections)
+            self.stats.parse_seconds += time.monotonic() - started
+        except Exception as e:
+            kind = type(e).__name__
+            self.stats.failed += 1
+            self.stats.errors[kind] = self.stats.errors.get(kind, 0) + 1
+            self.checkpoint.record(item, "error", error=f"{kind}: {str(e)}")
+            return
+
+        if pmcid:
+            await self.add_citations(blocks, pmcid)
+        shard = self.shards.write({
+            "item": item, "source": source, "url": target,
+            "doi": doi_from_blocks(blocks), "content": blocks, "exported_at": int(time.time()),
+        })
+        # Checkpoint only after the record is in the shard
+        self.checkpoint.record(item, "ok", shard=shard)
+        self.stats.exported += 1
+        self.stats.by_source[source] = self.stats.by_source.get(source, 0) + 1
+
+    async def run(self, items: Iterator[str]) -> Dict:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                try:
+                    if item is not None:
+                        await self.export_item(item)
+                finally:
+                    queue.task_done()
+                if item is None:
+                    return
+
+        async def report():
+            while True:
+                await asyncio.sleep(REPORT_EVERY_SECONDS)
+                print(f"Export progress: {json.dumps(self.stats.snapshot(self.shards.bytes_written))}")
+
+        async def enqueue(batch):
+            # Identifier lines are mapped a batch at a time before any of them is queued
+            await self.resolve_identifiers(batch)
+            for item in batch:
+                await queue.put(item)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        reporter = asyncio.ensure_future(report())
+        seen = set()
+        batch: List[str] = []
+        for item in items:
+            if item in self.checkpoint.done or item in seen:
+                self.stats.skipped += 1
+                continue
+            seen.add(item)
+            batch.append(item)
+            if len(batch) >= IDCONV_BATCH_SIZE:
+                await enqueue(batch)
+                batch = []
+        await enqueue(batch)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        reporter.cancel()
+
+        summary = self.stats.snapshot(self.shards.bytes_written)
+        with open(self.report_path, "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+    def close(self) -> None:
+        self.checkpoint.close()
+        self.shards.close()
+        self.io_pool.shutdown(wait=False)
+        self.parse_pool.shutdown()
+
+
+def _host_intervals(values: Optional[List[str]]) -> Dict[str, float]:
+    """--rate host=requests_per_second, repeatable."""
+    intervals = {}
+    for value in values or []:
+        host, _, rate = value.partition("=")
+        intervals[host] = 1.0 / float(rate)
+    return intervals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", required=True, help="file with one URL or DOI per line")
+    parser.add_argument("--out", required=True, help="output directory for shards, checkpoint and report")
+    parser.add_argument("--sections", help="comma-separated sections to keep (default: all)")
+    parser.add_argument("--concurrency", type=int, default=8, help="items in flight at once")
+    parser.add_argument("--parse-workers", type=int, help="parser processes (default: one per core)")
+    parser.add_argument("--shard-size", type=int, default=1000, help="records per shard file")
+    parser.add_argument("--rate", action="append", metavar="HOST=RPS", help="per-host request rate override")
+    args = parser.parse_args()
+
+    try:
+        sections = parse_sections(args.sections)
+        host_intervals = _host_intervals(args.rate)
+    except ValueError as e:
+        parser.error(str(e))
+
+    exporter = BulkExporter(args.out, sections, args.concurrency, args.parse_workers, args.shard_size, host_intervals)
+    try:
+        summary = asyncio.run(exporter.run(read_items(args.input)))
+    finally:
+        exporter.close()
+    print(f"Export finished: {json.dumps(summary)}")
+
+
+if __name__ == "__main__":
+    main()
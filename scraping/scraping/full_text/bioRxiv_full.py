@@ -1,30 +1,30 @@
 import json
 import requests
 from bs4 import BeautifulSoup
-from typing import List, Dict
-
-def extract_content_from_biorxiv(url: str) -> Dict:
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
-    }
-    try:
-        response = requests.get(url, headers=headers)
-    except requests.exceptions.RequestException:
-        return {"status": "error", "detail": "Error making request to the URL"}
-
-    if response.status_code != 200:
-        return {"status": "error", "detail": "Failed to fetch the URL"}
-
-    try:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        content_blocks: List[Dict] = []
-
+from typing import FrozenSet, List, Dict, Optional
+from compact import COMPACT, compact_blocks, parse_format
+from doc_index import DocumentIndex, anchor
+from sections import ALL_SECTIONS, BODY, FIGURES, FRONT, REFERENCES, TABLES, page_slice, parse_reference_page, parse_sections, reference_page_meta, store_kind
+from common import http_pool
+from common.article_store import get_article_store, read_through
+from common.profiling import profiled
+from common.search_index import get_search_index, index_full_text_blocks
+from common.warmup import describe, is_warmup, open_connections, run_warmup, warm_parser
+
+# Bump when the extraction output changes so stored articles are re-derived
+PARSER_VERSION = "1"
+
+def parse_biorxiv_full_text(soup: BeautifulSoup, sections: FrozenSet[str] = ALL_SECTIONS, ref_offset: int = 0, ref_limit: Optional[int] = None) -> List[Dict]:
+    # Works on an already-parsed page so the abstract Lambda can reuse its download
+    content_blocks: List[Dict] = []
+
+    if FRONT in sections:
         # Extract title
         title = soup.find('h1', {'class': 'highwire-cite-title'}).get_text(strip=True) if soup.find('h1', {'class': 'highwire-cite-title'}) else "No Title Found"
         if title:
             content_blocks.append({'type': 'title', 'content': title})
 
-         # Extract DOI
+        # Extract DOI
         doi_tag = soup.find('span', {'class': 'highwire-cite-metadata-doi'})
         doi = doi_tag.get_text(strip=True).replace("doi:", "").strip() if doi_tag else "No DOI Found"
         if doi:
@@ -39,120 +39,156 @@ def extract_content_from_biorxiv(url: str) -> Dict:
             citation_text = " ".join(citation_parts).strip()
             if title in citation_text:
                 citation_text = citation_text.replace(title, "").strip()
-            
+
             # Ensure newline before bioRxiv reference
             citation_text = citation_text.replace("bioRxiv", "\nbioRxiv")
 
         if citation_text:
             content_blocks.append({'type': 'citation', 'content': citation_text})
 
+    # Drop the reference list up front when it was not requested so the
+    # body scan below never walks into it
+    if REFERENCES not in sections:
+        for ref_list in soup.find_all('ol', {'class': 'cit-list'}):
+            ref_list.decompose()
+
+    # Only look for the tag kinds that feed the requested block types
+    wanted_tags = []
+    if BODY in sections:
+        wanted_tags += ['h2', 'h3', 'p']
+    if FIGURES in sections:
+        wanted_tags += ['figure', 'span']
+    if TABLES in sections:
+        wanted_tags += ['table']
+
+    # Extract main article content from full text
+    full_text_section = soup.find('div', {'class': 'article fulltext-view'}) if wanted_tags else None
+    if full_text_section:
+        last_captions = set()
+        index = None
+        if FIGURES in sections or TABLES in sections:
+            # One pass over the page records where every caption anchor sits
+            index = DocumentIndex(soup, {
+                'caption-title': anchor('span', 'caption-title'),
+                'table-caption': anchor('div', 'table-caption'),
+            })
+        for section in full_text_section.find_all(wanted_tags):
+            if section.name == 'h2':
+                heading_text = section.get_text(strip=True)
+                if heading_text:
+                    content_blocks.append({'type': 'heading', 'content': heading_text})
+
+            elif section.name == 'h3':
+                subheading_text = section.get_text(strip=True)
+                if subheading_text:
+                    content_blocks.append({'type': 'subheading', 'content': subheading_text})
+
+            elif section.name == 'p':
+                paragraph_text = section.get_text(strip=True)
+                if paragraph_text:
+                    content_blocks.append({'type': 'text', 'content': paragraph_text})
+
+            elif section.name in ['figure', 'span']:
+                img_tag = section.find('img', {'class': 'highwire-fragment fragment-image'})
+                heading_text = ""
+                if img_tag and 'alt' in img_tag.attrs:
+                    heading_text = img_tag['alt']
+                if img_tag and 'src' in img_tag.attrs:
+                    img_url = img_tag['src']
+                    if img_url.startswith("/"):
+                        img_url = f"https://www.medrxiv.org{img_url}"
+                    download_url = f"{img_url}?download=true"
+
+                    caption_title_tag = section.find('span', {'class': 'caption-title'})
+                    if not caption_title_tag:
+                        caption_title_tag = index.next(section, 'caption-title')
+                    caption_title = caption_title_tag.get_text(strip=True) if caption_title_tag else None
+                    image_content = {"url": img_url, "caption": heading_text, "downloads": download_url}
+
+                    if caption_title:
+                        image_content["caption-title"] = caption_title
+                    content_blocks.append({'type': 'image', 'content': image_content})
+
+            elif section.name == 'table':
+                table_label = ""
+                caption_title = ""
+                table_caption_div = index.previous(section, 'table-caption')
+                if table_caption_div:
+                    table_label_tag = table_caption_div.find('span', {'class': 'table-label'})
+                    table_label = table_label_tag.get_text(strip=True) if table_label_tag else ""
+                    caption_title_tag = table_caption_div.find('span', {'class': 'caption-title'})
+                    caption_title = caption_title_tag.get_text(strip=True) if caption_title_tag else ""
+                if table_label or caption_title:
+                    heading_text = f"{table_label} {caption_title}".strip()
+                    content_blocks.append({'type': 'table-caption', 'content': heading_text})
+
+
+    # Assuming `soup` is your BeautifulSoup object
+    references_section = soup.find('ol', {'class': 'cit-list'}) if REFERENCES in sections else None
+    references = []
+    ref_items = []
+
+    if references_section:
+        ref_items = references_section.find_all('li')
+        for idx, ref_item in enumerate(page_slice(ref_items, ref_offset, ref_limit), start=ref_offset):
+            citation_text = ref_item.get_text(strip=True)[4:]  # Trim the first 4 characters
+
+            links = []
+            google_scholar_url = None
+
+            for link in ref_item.find_all('a', href=True):
+                # Exclude hidden links with `display: none`
+                if link.has_attr('style') and "display:none" in link['style']:
+                    continue
+
+                link_text = link.get_text(strip=True)
+                link_url = link['href']
+
+                # Construct full URL if needed
+                full_url = f"https://www.medrxiv.org{link_url}" if not link_url.startswith("http") else link_url
+
+                # Skip unwanted links like "↵" and "OpenUrl"
+                if link_text in ["↵", "OpenUrl"]:
+                    continue
+
+                # Identify Google Scholar links dynamically
+                if "google-scholar" in link_url.lower() or "gs_type=article" in link_url.lower():
+                    google_scholar_url = full_url
+                else:
+                    links.append({"source": link_text, "url": full_url})
+
+            # If Google Scholar link was found, add it separately
+            if google_scholar_url:
+                links.append({"source": "Google Scholar", "url": google_scholar_url})
+
+            # Store the reference details
+            reference_entry = {"id": f"ref{idx}", "citation": citation_text}
+            if links:
+                reference_entry["links"] = links
+            references.append(reference_entry)
+
+    # Add references to content_blocks if they exist
+    if references:
+        content_blocks.append({"type": "references", "content": references, **reference_page_meta(len(ref_items), ref_offset, ref_limit)})
+    return content_blocks
+
+
+@profiled("fulltext.medrxiv.extract")
+def extract_content_from_biorxiv(url: str, sections: FrozenSet[str] = ALL_SECTIONS, ref_offset: int = 0, ref_limit: Optional[int] = None) -> Dict:
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
+    }
+    try:
+        response = http_pool.get(url, headers=headers)
+    except requests.exceptions.RequestException:
+        return {"status": "error", "detail": "Error making request to the URL"}
+
+    if response.status_code != 200:
+        return {"status": "error", "detail": "Failed to fetch the URL"}
 
-        # Extract main article content from full text
-        full_text_section = soup.find('div', {'class': 'article fulltext-view'})
-        if full_text_section:
-            last_captions = set()
-            for section in full_text_section.find_all(['h2', 'h3', 'p', 'figure', 'table', 'span']):
-                if section.name == 'h2':
-                    heading_text = section.get_text(strip=True)
-                    if heading_text:
-                        content_blocks.append({'type': 'heading', 'content': heading_text})
-
-                elif section.name == 'h3':
-                    subheading_text = section.get_text(strip=True)
-                    if subheading_text:
-                        content_blocks.append({'type': 'subheading', 'content': subheading_text})
-
-                elif section.name == 'p':
-                    paragraph_text = section.get_text(strip=True)
-                    if paragraph_text:
-                        content_blocks.append({'type': 'text', 'content': paragraph_text})
-
-                elif section.name in ['figure', 'span']:
-                    img_tag = section.find('img', {'class': 'highwire-fragment fragment-image'})
-                    heading_text = ""
-                    if img_tag and 'alt' in img_tag.attrs:
-                        heading_text = img_tag['alt']
-                    if img_tag and 'src' in img_tag.attrs:
-                        img_url = img_tag['src']
-                        if img_url.startswith("/"):
-                            img_url = f"https://www.medrxiv.org{img_url}"
-                        download_url = f"{img_url}?download=true"
-
-                        caption_title_tag = section.find('span', {'class': 'caption-title'})
-                        if not caption_title_tag:
-                            caption_title_tag = section.find_next('span', {'class': 'caption-title'})
-                        caption_title = caption_title_tag.get_text(strip=True) if caption_title_tag else None
-                        image_content = {"url": img_url, "caption": heading_text, "downloads": download_url}
-
-                        if caption_title:
-                            image_content["caption-title"] = caption_title
-                        content_blocks.append({'type': 'image', 'content': image_content})
-
-                elif section.name == 'table':
-                    table_label = ""
-                    caption_title = ""
-                    table_caption_div = section.find_previous('div', {'class': 'table-caption'})
-                    if table_caption_div:
-                        table_label_tag = table_caption_div.find('span', {'class': 'table-label'})
-                        table_label = table_label_tag.get_text(strip=True) if table_label_tag else ""
-                        caption_title_tag = table_caption_div.find('span', {'class': 'caption-title'})
-                        caption_title = caption_title_tag.get_text(strip=True) if caption_title_tag else ""
-                    if table_label or caption_title:
-                        heading_text = f"{table_label} {caption_title}".strip()
-                        content_blocks.append({'type': 'table-caption', 'content': heading_text})
-
-
-        # Assuming `soup` is your BeautifulSoup object
-        references_section = soup.find('ol', {'class': 'cit-list'})
-        references = []
-
-        if references_section:
-            for idx, ref_item in enumerate(references_section.find_all('li')):
-                citation_text = ref_item.get_text(strip=True)[4:]  # Trim the first 4 characters
-
-                links = []
-                google_scholar_url = None
-
-                for link in ref_item.find_all('a', href=True):
-                    # Exclude hidden links with `display: none`
-                    if link.has_attr('style') and "display:none" in link['style']:
-                        continue
-
-                    link_text = link.get_text(strip=True)
-                    link_url = link['href']
-
-                    # Construct full URL if needed
-                    full_url = f"https://www.medrxiv.org{link_url}" if not link_url.startswith("http") else link_url
-
-                    # Skip unwanted links like "↵" and "OpenUrl"
-                    if link_text in ["↵", "OpenUrl"]:
-                        continue
-
-                    # Identify Google Scholar links dynamically
-                    if "google-scholar" in link_url.lower() or "gs_type=article" in link_url.lower():
-                        google_scholar_url = full_url
-                    else:
-                        links.append({"source": link_text, "url": full_url})
-
-                # If Google Scholar link was found, add it separately
-                if google_scholar_url:
-                    links.append({"source": "Google Scholar", "url": google_scholar_url})
-
-                # Store the reference details
-                reference_entry = {"id": f"ref{idx}", "citation": citation_text}
-                if links:
-                    reference_entry["links"] = links
-                references.append(reference_entry)
-
-        # Add references to content_blocks if they exist
-        if references:
-            content_blocks.append({"type": "references", "content": references})
-
-
-
-
-
-        return  content_blocks
+    try:
+        soup = BeautifulSoup(response.text, 'html.parser')
+        return parse_biorxiv_full_text(soup, sections, ref_offset, ref_limit)
 
     except Exception as e:
         return {"status": "error", "detail": "Error processing content"}
@@ -164,7 +200,19 @@ HEADERS = {
     "Access-Control-Allow-Methods": "GET, OPTIONS",
     "Access-Control-Allow-Headers": "Content-Type"
 }
+
+def warmup_steps():
+    return [
+        ("parser", warm_parser),
+        ("article_store", lambda: describe(get_article_store())),
+        ("search_index", lambda: describe(get_search_index())),
+        ("connections", lambda: open_connections(["https://www.medrxiv.org/"])),
+    ]
+
+@profiled("fulltext.medrxiv.handler")
 def lambda_handler(event, context):
+    if is_warmup(event):
+        return run_warmup("medrxiv", warmup_steps())
     try:
         query_params = event.get('queryStringParameters', {})
         url = query_params.get('url')
@@ -172,7 +220,18 @@ def lambda_handler(event, context):
         if not url:
             return {"statusCode": 400, "headers":HEADERS, 'body': json.dumps({"status": "error", "detail": "URL query parameter is required"})}
 
-        result = extract_content_from_biorxiv(url)
+        try:
+            sections = parse_sections(query_params.get('sections'))
+            ref_offset, ref_limit = parse_reference_page(query_params)
+            output_format = parse_format(query_params.get('format'))
+        except ValueError as e:
+            return {"statusCode": 400, "headers":HEADERS, 'body': json.dumps({"status": "error", "detail": str(e)})}
+
+        result = read_through(url, store_kind(sections, ref_offset, ref_limit), PARSER_VERSION,
+                              lambda: extract_content_from_biorxiv(url, sections, ref_offset, ref_limit))
+        index_full_text_blocks(url, "medrxiv", result)
+        if output_format == COMPACT:
+            result = compact_blocks(result)
 
         return {"statusCode": 200, "headers":HEADERS,'body': result}
     except Exception as e:
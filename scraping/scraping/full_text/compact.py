@@ -0,0 +1,102 @@
+from typing import Any, Dict, List, Optional
+
+# Values of the `format` query parameter
+VERBOSE = "verbose"
+COMPACT = "compact"
+FORMATS = (VERBOSE, COMPACT)
+
+REFERENCE_FIELDS = ["id", "citation", "links"]
+
+
+def parse_format(value: Optional[str]) -> str:
+    if not value:
+        return VERBOSE
+    value = value.strip().lower()
+    if value not in FORMATS:
+        raise ValueError(f"Unknown format: {value}. Choose from {', '.join(FORMATS)}.")
+    return value
+
+
+class StringTable:
+    """Interns strings into one list shared by every block of a response."""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def ref(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+
+def compact_table(content: Dict, strings: StringTable) -> Dict:
+    # Rows can be ragged (header rows, spanning cells); missing cells are null
+    rows = content.get("rows", [])
+    width = max((len(row) for row in rows), default=0)
+    columns = [[strings.ref(row[col]) if col < len(row) else None for row in rows] for col in range(width)]
+    return {"caption": content.get("caption"), "rows": len(rows), "columns": columns}
+
+
+def compact_references(references: List[Dict], strings: StringTable) -> Dict:
+    # Link labels ("PubMed", "Google Scholar", "DOI", ...) repeat on every
+    # reference, so they are interned; URLs and citations are mostly unique
+    # and stay inline. medRxiv names the label "source" (the others "text")
+    # and omits "links" on references without any; those stay null.
+    label_key = "text"
+    items = []
+    for ref in references:
+        links = None
+        if "links" in ref:
+            links = []
+            for link in ref["links"]:
+                if "source" in link:
+                    label_key = "source"
+                links.extend((strings.ref(link.get(label_key, "")), link.get("url")))
+        items.append([ref.get("id"), ref.get("citation"), links])
+    return {"fields": REFERENCE_FIELDS, "link_label": label_key, "items": items}
+
+
+def compact_blocks(blocks: Any) -> Any:
+    """Columnar form of a full-text block list for `format=compact`.
+
+    Tables become columns of indexes into the response's `strings` list and
+    references become [id, citation, [label index, url, ...] or null] arrays.
+    Other blocks are unchanged. Error results (not block lists) pass through.
+    """
+    if not isinstance(blocks, list):
+        return blocks
+    strings = StringTable()
+    packed = []
+    for block in blocks:
+        if block.get("type") == "table" and isinstance(block.get("content"), dict):
+            block = {**block, "content": compact_table(block["content"], strings)}
+        elif block.get("type") == "references" and isinstance(block.get("content"), list):
+            block = {**block, "content": compact_references(block["content"], strings)}
+        packed.append(block)
+    return {"format": COMPACT, "strings": strings.strings, "blocks": packed}
+
+
+def expand_blocks(document: Dict) -> List[Dict]:
+    """Inverse of compact_blocks, for clients and tools that want the verbose blocks back."""
+    strings = document["strings"]
+    blocks = []
+    for block in document["blocks"]:
+        content = block.get("content")
+        if block.get("type") == "table" and isinstance(content, dict) and "columns" in content:
+            columns = content["columns"]
+            rows = [[strings[column[row]] for column in columns if column[row] is not None] for row in range(content["rows"])]
+            block = {**block, "content": {"caption": content["caption"], "rows": rows}}
+        elif block.get("type") == "references" and isinstance(content, dict) and "items" in content:
+            label_key = content.get("link_label", "text")
+            references = []
+            for ref_id, citation, links in content["items"]:
+                reference = {"id": ref_id, "citation": citation}
+                if links is not None:
+                    reference["links"] = [{label_key: strings[links[i]], "url": links[i + 1]} for i in range(0, len(links), 2)]
+                references.append(reference)
+            block = {**block, "content": references}
+        blocks.append(block)
+    return blocks
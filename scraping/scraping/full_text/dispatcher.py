@@ -1,7 +1,15 @@
 import json
 import boto3
+from compact import parse_format
+from sections import PASSTHROUGH_PARAMS, parse_reference_page, parse_sections
+from common.identifiers import IDCONV_URL, IdentifierLookupError, full_text_target, get_identifier_cache
+from common.jobs import DONE, FAILED, get_job_store, job_backends, run_job, submit_job
+from common.profiling import profiled
+from common.warmup import describe, is_warmup, open_connections, run_warmup
 
 lambda_client = boto3.client("lambda")
+# Fail the cold start on a job store the job runner cannot share, not each async request
+job_backends()
 
 
 LAMBDA_FUNCTIONS = {
@@ -10,9 +18,91 @@ LAMBDA_FUNCTIONS = {
     "plos": "fulltext_plos_code"
 }
 
+# Poll status -> HTTP status for job responses
+JOB_STATUS_CODES = {DONE: 200, FAILED: 500}
+
+
+# source -> extractor handler, set by in-process hosts so no Lambda hop is needed
+_local_extractors = {}
+
+
+def use_local_extractors(handlers):
+    """Call these handlers directly instead of invoking the extractor Lambdas (see server/app.py)."""
+    _local_extractors.update(handlers)
+
+
+def invoke_extractor(source, forwarded_params):
+    """Synchronously invoke the extractor Lambda for `source`; returns (status code, raw payload)."""
+    if source in _local_extractors:
+        response = _local_extractors[source]({"queryStringParameters": forwarded_params}, None)
+        return 200, json.dumps(response)
+    response = lambda_client.invoke(
+        FunctionName=LAMBDA_FUNCTIONS[source],
+        InvocationType="RequestResponse",
+        Payload=json.dumps({"queryStringParameters": forwarded_params})
+    )
+    return response["StatusCode"], response["Payload"].read().decode("utf-8")
+
+
+def execute_job(job):
+    """Run one queued extraction; the extractor's error responses fail the job."""
+    _, payload = invoke_extractor(job["source"], job["params"])
+    response = json.loads(payload)
+    body = response.get("body")
+    if isinstance(body, str):
+        body = json.loads(body)
+    if response.get("statusCode", 200) >= 400 or (isinstance(body, dict) and ("error" in body or body.get("status") == "error")):
+        raise Exception((body or {}).get("error") or (body or {}).get("detail") or "Extraction failed")
+    return body
+
+
+def job_response(job, cors_headers):
+    if job is None:
+        return {
+            "statusCode": 404,
+            "headers": cors_headers,
+            "body": json.dumps({"error": "Unknown job_id."})
+        }
+    body = {"job_id": job["job_id"], "status": job["status"]}
+    if job["status"] == DONE:
+        body["result"] = job["result"]
+    elif job["status"] == FAILED:
+        body["error"] = job["error"]
+    return {
+        "statusCode": JOB_STATUS_CODES.get(job["status"], 202),
+        "headers": cors_headers,
+        "body": json.dumps(body)
+    }
+
+
+def warmup_steps():
+    # lambda_client and the extractors' parsers are built at import, i.e. by the warm-up invocation itself
+    return [
+        ("job_store", lambda: describe(get_job_store())),
+        ("identifier_cache", lambda: describe(get_identifier_cache())),
+        ("connections", lambda: open_connections([IDCONV_URL])),
+    ]
+
+
+@profiled("fulltext.dispatcher")
 def lambda_handler(event, context):
-    """Dispatcher Lambda function to route requests based on 'source' and 'url' query parameters."""
-    query_params = event.get("queryStringParameters", {})
+    """Dispatcher Lambda function to route requests based on 'source' and 'url' query parameters.
+
+    Instead of both, 'id' may name the article by PMID, PMCID or DOI.
+
+    With mode=async the extraction runs as a background job: the response is a
+    job id, and ?job_id=<id> polls for the result. Repeat submissions for the
+    same article share the job and, once done, its stored result.
+    """
+    if is_warmup(event):
+        return run_warmup("dispatcher", warmup_steps())
+
+    if "job" in event:
+        # Event invocation started by submit_job
+        run_job(get_job_store(), event["job"], execute_job)
+        return {"job_id": event["job"]["job_id"]}
+
+    query_params = event.get("queryStringParameters", {}) or {}
     source = query_params.get("source")
     url = query_params.get("url")
 
@@ -23,6 +113,38 @@ def lambda_handler(event, context):
         "Access-Control-Allow-Headers": "Content-Type"
     }
 
+    if query_params.get("job_id"):
+        try:
+            return job_response(get_job_store().get(query_params["job_id"]), cors_headers)
+        except Exception as e:
+            print(f"Error reading job {query_params['job_id']}: {str(e)}")
+            return {
+                "statusCode": 500,
+                "headers": cors_headers,
+                "body": json.dumps({"error": "Internal server error while reading job."})
+            }
+
+    identifier = query_params.get("id")
+    if identifier and not url:
+        # A PMID, PMCID or DOI instead of source and url; mappings are cached
+        try:
+            target = full_text_target(identifier)
+        except IdentifierLookupError as e:
+            # Unknown is not the same as absent: let the client retry instead of caching a 404
+            print(f"Identifier lookup failed for {identifier}: {str(e)}")
+            return {
+                "statusCode": e.status_code,
+                "headers": cors_headers,
+                "body": json.dumps({"error": f"Could not look up '{identifier}' right now. Try again later."})
+            }
+        if target is None:
+            return {
+                "statusCode": 404,
+                "headers": cors_headers,
+                "body": json.dumps({"error": f"No full text found for '{identifier}'."})
+            }
+        source, url = target
+
     if not source or source not in LAMBDA_FUNCTIONS:
         return {
             "statusCode": 400,
@@ -34,23 +156,43 @@ def lambda_handler(event, context):
         return {
             "statusCode": 400,
             "headers": cors_headers,
-            "body": json.dumps({"error": "Missing 'url' parameter. Provide a valid URL."})
+            "body": json.dumps({"error": "Missing 'url' parameter. Provide a valid URL or an 'id' (PMID, PMCID or DOI)."})
+        }
+
+    # Validate section selection, reference paging and output format here so bad requests never reach the extractors
+    try:
+        parse_sections(query_params.get("sections"))
+        parse_reference_page(query_params)
+        parse_format(query_params.get("format"))
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "headers": cors_headers,
+            "body": json.dumps({"error": str(e)})
         }
 
     target_lambda = LAMBDA_FUNCTIONS[source]
 
-    invoke_params = {
-        "FunctionName": target_lambda,
-        "InvocationType": "RequestResponse",  
-        "Payload": json.dumps({"queryStringParameters": {"url": url}})  
-    }
+    forwarded_params = {"url": url}
+    forwarded_params.update({key: query_params[key] for key in PASSTHROUGH_PARAMS if query_params.get(key)})
+
+    if query_params.get("mode") == "async":
+        try:
+            job = submit_job(source, forwarded_params, execute_job, getattr(context, "function_name", None))
+            return job_response(job, cors_headers)
+        except Exception as e:
+            print(f"Error submitting job for {url}: {str(e)}")
+            return {
+                "statusCode": 500,
+                "headers": cors_headers,
+                "body": json.dumps({"error": "Internal server error while submitting job."})
+            }
 
     try:
-        response = lambda_client.invoke(**invoke_params)
-        response_payload = response["Payload"].read().decode("utf-8")
+        status_code, response_payload = invoke_extractor(source, forwarded_params)
 
         return {
-            "statusCode": response["StatusCode"],
+            "statusCode": status_code,
             "headers": cors_headers, 
             "body": response_payload  
         }
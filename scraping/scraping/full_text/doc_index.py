@@ -0,0 +1,47 @@
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, List, Optional
+from bs4 import Tag
+
+Matcher = Callable[[Tag], bool]
+
+
+def anchor(name: str, class_: Optional[str] = None) -> Matcher:
+    """Matcher for `name` tags, optionally carrying `class_`, like find(name, class_=...)."""
+    def match(tag: Tag) -> bool:
+        return tag.name == name and (class_ is None or class_ in tag.get('class', []))
+    return match
+
+
+class DocumentIndex:
+    """Document-order positions of every tag plus sorted positions of caption/heading anchors.
+
+    Built in a single pass, it answers find_previous/find_next style lookups
+    for the registered anchors with a binary search instead of a linear scan
+    over the rest of the document.
+    """
+
+    def __init__(self, root: Tag, anchors: Dict[str, Matcher]):
+        self._position: Dict[int, int] = {}
+        self._anchor_positions: Dict[str, List[int]] = {key: [] for key in anchors}
+        self._anchor_tags: Dict[str, List[Tag]] = {key: [] for key in anchors}
+
+        for position, tag in enumerate(root.find_all(True)):
+            self._position[id(tag)] = position
+            for key, match in anchors.items():
+                if match(tag):
+                    self._anchor_positions[key].append(position)
+                    self._anchor_tags[key].append(tag)
+
+    def position(self, tag: Tag) -> int:
+        return self._position[id(tag)]
+
+    def previous(self, tag: Tag, key: str) -> Optional[Tag]:
+        """Nearest `key` anchor opening before `tag` (the same set find_previous searches)."""
+        idx = bisect_left(self._anchor_positions[key], self.position(tag)) - 1
+        return self._anchor_tags[key][idx] if idx >= 0 else None
+
+    def next(self, tag: Tag, key: str) -> Optional[Tag]:
+        """Nearest `key` anchor opening after `tag`, descendants included (like find_next)."""
+        positions = self._anchor_positions[key]
+        idx = bisect_right(positions, self.position(tag))
+        return self._anchor_tags[key][idx] if idx < len(positions) else None
@@ -1,24 +1,124 @@
 import json
 import requests
 from bs4 import BeautifulSoup, Tag
-from typing import List, Dict, Union
-
-def extract_content_with_structure(url: str) -> List[Dict[str, Union[str, Dict]]]:
+from typing import FrozenSet, List, Dict, Optional, Union
+from compact import COMPACT, compact_blocks, parse_format
+from tree_walker import DispatchTable, skip, text_block, walk
+from sections import ALL_SECTIONS, BODY, FIGURES, FRONT, REFERENCES, page_slice, parse_reference_page, parse_sections, reference_page_meta, store_kind
+from common import http_pool
+from common.article_store import get_article_store, read_through
+from common.profiling import profiled
+from common.search_index import get_search_index, index_full_text_blocks
+from common.warmup import describe, is_warmup, open_connections, run_warmup, warm_parser
+
+BASE_URL = "https://journals.plos.org/digitalhealth"
+
+PARSER_VERSION = "1"
+
+def extract_figure(child: Tag) -> Dict[str, Union[str, Dict]]:
+    figure_data = {}
+
+    # Extract image URL
+    img_box = child.find('div', class_='img-box')
+    if img_box:
+        img_tag = img_box.find('img')
+        if img_tag and 'src' in img_tag.attrs:
+            img_src = img_tag['src'].replace("amp;", "")
+            figure_data['image_url'] = f"{BASE_URL}/{img_src}" if not img_src.startswith("http") else img_src
+
+    # Extract caption
+    caption = child.find('div', class_='figcaption')
+    if caption:
+        figure_data['caption'] = caption.get_text(strip=True)
+
+    # Extract download links
+    downloads = child.find('div', class_='figure-inline-download')
+    if downloads:
+        figure_data['downloads'] = {}
+        for link in downloads.find_all('a', href=True):
+            file_type = link.find('div', class_='definition-label')
+            if file_type:
+                file_type = file_type.get_text(strip=True)
+                href = link['href'].replace("amp;", "")
+                full_url = f"{BASE_URL}/{href}" if not href.startswith("http") else href
+                figure_data['downloads'][file_type] = full_url
+
+    return {'type': 'figure', 'content': figure_data}
+
+def extract_references(child: Tag, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Union[str, List]]:
+    references = []
+    items = child.find_all('li', recursive=False)
+    for li in page_slice(items, offset, limit):
+        ref_id = li.get('id', '')
+        order_span = li.find('span', class_='order')
+        citation_parts = []
+        # Iterate through the elements of the li to build the citation
+        for element in li.contents:
+            # Skip the order span and any elements after reflinks
+            if element == order_span:
+                continue
+            if isinstance(element, Tag) and element.name == 'ul' and 'reflinks' in element.get('class', []):
+                break
+            if isinstance(element, str):
+                text = element.strip()
+                if text:
+                    citation_parts.append(text)
+            else:
+                text = element.get_text(strip=True)
+                if text:
+                    citation_parts.append(text)
+        citation = ' '.join(citation_parts).strip()
+        # Extract links from reflinks
+        links = []
+        reflinks = li.find('ul', class_='reflinks')
+        if reflinks:
+            for a_tag in reflinks.find_all('a', href=True):
+                link_text = a_tag.get_text(strip=True)
+                link_url = a_tag['href']
+                links.append({'text': link_text, 'url': link_url})
+        references.append({
+            'id': ref_id,
+            'citation': citation,
+            'links': links
+        })
+    return {'type': 'references', 'content': references, **reference_page_meta(len(items), offset, limit)}
+
+def build_article_text_dispatch(sections: FrozenSet[str] = ALL_SECTIONS, ref_offset: int = 0, ref_limit: Optional[int] = None) -> DispatchTable:
+    # Figures and reference lists are handled as whole subtrees, so their inner
+    # <p> tags are not visited again as body text. Unrequested block types are
+    # mapped to `skip` so their subtrees are never entered.
+    def body(block_type):
+        return text_block(block_type) if BODY in sections else skip
+
+    return (
+        DispatchTable()
+        .on('h1', body('title'))
+        .on('h2', body('subheading'))
+        .on('h3', body('subsubheading'))
+        .on('h4', body('subsubsubheading'))
+        .on('p', body('text'))
+        .on('div', extract_figure if FIGURES in sections else skip, class_='figure')
+        .on('ol', (lambda tag: extract_references(tag, ref_offset, ref_limit)) if REFERENCES in sections else skip, class_='references')
+    )
+
+@profiled("fulltext.plos.extract")
+def extract_content_with_structure(url: str, sections: FrozenSet[str] = ALL_SECTIONS, ref_offset: int = 0, ref_limit: Optional[int] = None) -> List[Dict[str, Union[str, Dict]]]:
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
     }
 
-    response = requests.get(url, headers=headers)
+    response = http_pool.get(url, headers=headers)
     if response.status_code != 200:
         raise Exception(f"Error fetching the article: HTTP {response.status_code}")
 
     soup = BeautifulSoup(response.text, 'html.parser')
+    return parse_plos_full_text(soup, sections, ref_offset, ref_limit)
 
+def parse_plos_full_text(soup: BeautifulSoup, sections: FrozenSet[str] = ALL_SECTIONS, ref_offset: int = 0, ref_limit: Optional[int] = None) -> List[Dict[str, Union[str, Dict]]]:
     content_blocks = []
-    base_url = "https://journals.plos.org/digitalhealth"
 
     # Extract the main title
-    main_title = soup.find('h1', {'id': 'artTitle'})
+    main_title = soup.find('h1', {'id': 'artTitle'}) if FRONT in sections else None
     if main_title:
         content_blocks.append({'type': 'title', 'content': main_title.get_text(strip=True)})
 
@@ -27,86 +127,10 @@ def extract_content_with_structure(url: str) -> List[Dict[str, Union[str, Dict]]
     if not main_content:
         raise Exception("No article content found")
 
-    
-
-    for child in main_content.descendants:
-        if child.name == 'h1':
-            content_blocks.append({'type': 'title', 'content': child.get_text(strip=True)})
-        elif child.name == 'h2':
-            content_blocks.append({'type': 'subheading', 'content': child.get_text(strip=True)})
-        elif child.name == 'h3':
-            content_blocks.append({'type': 'subsubheading', 'content': child.get_text(strip=True)})
-        elif child.name == 'h4':
-            content_blocks.append({'type': 'subsubsubheading', 'content': child.get_text(strip=True)})
-        elif child.name == 'p':
-            content_blocks.append({'type': 'text', 'content': child.get_text(strip=True)})
-        elif child.name == 'div' and 'figure' in child.get('class', []):
-            figure_data = {}
-
-            # Extract image URL
-            img_box = child.find('div', class_='img-box')
-            if img_box:
-                img_tag = img_box.find('img')
-                if img_tag and 'src' in img_tag.attrs:
-                    img_src = img_tag['src'].replace("amp;", "")
-                    figure_data['image_url'] = f"{base_url}/{img_src}" if not img_src.startswith("http") else img_src
-
-            # Extract caption
-            caption = child.find('div', class_='figcaption')
-            if caption:
-                figure_data['caption'] = caption.get_text(strip=True)
-
-            # Extract download links
-            downloads = child.find('div', class_='figure-inline-download')
-            if downloads:
-                figure_data['downloads'] = {}
-                for link in downloads.find_all('a', href=True):
-                    file_type = link.find('div', class_='definition-label')
-                    if file_type:
-                        file_type = file_type.get_text(strip=True)
-                        href = link['href'].replace("amp;", "")
-                        full_url = f"{base_url}/{href}" if not href.startswith("http") else href
-                        figure_data['downloads'][file_type] = full_url
-
-            content_blocks.append({'type': 'figure', 'content': figure_data})
-        elif child.name == 'ol' and 'references' in child.get('class', []):
-            # Process references list
-            references = []
-            for li in child.find_all('li', recursive=False):
-                ref_id = li.get('id', '')
-                order_span = li.find('span', class_='order')
-                order = order_span.get_text(strip=True) if order_span else ''
-                citation_parts = []
-                # Iterate through the elements of the li to build the citation
-                for element in li.contents:
-                    # Skip the order span and any elements after reflinks
-                    if element == order_span:
-                        continue
-                    if isinstance(element, Tag) and element.name == 'ul' and 'reflinks' in element.get('class', []):
-                        break
-                    if isinstance(element, str):
-                        text = element.strip()
-                        if text:
-                            citation_parts.append(text)
-                    else:
-                        text = element.get_text(strip=True)
-                        if text:
-                            citation_parts.append(text)
-                citation = ' '.join(citation_parts).strip()
-                # Extract links from reflinks
-                links = []
-                reflinks = li.find('ul', class_='reflinks')
-                if reflinks:
-                    for a_tag in reflinks.find_all('a', href=True):
-                        link_text = a_tag.get_text(strip=True)
-                        link_url = a_tag['href']
-                        links.append({'text': link_text, 'url': link_url})
-                references.append({
-                    'id': ref_id,
-                    'citation': citation,
-                    'links': links
-                })
-            content_blocks.append({'type': 'references', 'content': references})
+    content_blocks.extend(walk(main_content, build_article_text_dispatch(sections, ref_offset, ref_limit)))
+
+    if FRONT not in sections:
+        return content_blocks
 
     # Extract publication date and DOI
     pub_date = soup.find('li', {'id': 'artPubDate'})
@@ -132,7 +156,18 @@ HEADERS = {
     "Access-Control-Allow-Methods": "GET, OPTIONS",
     "Access-Control-Allow-Headers": "Content-Type"
 }
+def warmup_steps():
+    return [
+        ("parser", warm_parser),
+        ("article_store", lambda: describe(get_article_store())),
+        ("search_index", lambda: describe(get_search_index())),
+        ("connections", lambda: open_connections(["https://journals.plos.org/"])),
+    ]
+
+@profiled("fulltext.plos.handler")
 def lambda_handler(event, context):
+    if is_warmup(event):
+        return run_warmup("plos", warmup_steps())
     try:
         query_params = event.get('queryStringParameters', {})
         url = query_params.get('url')
@@ -144,7 +179,22 @@ def lambda_handler(event, context):
                 "body": json.dumps({"error": "URL is required in query parameters"})
             }
 
-        structured_content = extract_content_with_structure(url)
+        try:
+            sections = parse_sections(query_params.get('sections'))
+            ref_offset, ref_limit = parse_reference_page(query_params)
+            output_format = parse_format(query_params.get('format'))
+        except ValueError as e:
+            return {
+                "statusCode": 400,
+                "headers":HEADERS,
+                "body": json.dumps({"error": str(e)})
+            }
+
+        structured_content = read_through(url, store_kind(sections, ref_offset, ref_limit), PARSER_VERSION,
+                                          lambda: extract_content_with_structure(url, sections, ref_offset, ref_limit))
+        index_full_text_blocks(url, "plos", structured_content)
+        if output_format == COMPACT:
+            structured_content = compact_blocks(structured_content)
         return {
             "statusCode": 200,
             "headers":HEADERS,
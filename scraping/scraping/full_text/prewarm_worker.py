@@ -0,0 +1,82 @@
+import json
+from bs4 import BeautifulSoup
+from typing import Optional
+import bioRxiv_full
+import plos_full
+import pubmed_full
+from sections import ALL_SECTIONS, store_kind
+from common import http_pool
+from common.article_store import get_article_store, read_through
+from common.identifiers import IDCONV_URL, PMCID, get_identifier_cache, pmc_article_url, resolve_identifiers
+from common.profiling import profiled
+from common.warmup import describe, is_warmup, open_connections, run_warmup, warm_parser
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
+}
+
+
+def full_text_url_for(source: str, url: str) -> Optional[str]:
+    """The URL the dispatcher will be called with, as the abstract handler reports it."""
+    if source == "medrxiv":
+        return url if url.endswith(".full-text") else url + ".full-text"
+    if source == "plos":
+        return url
+    if source == "pubmed":
+        if "pmc" in url:
+            return url
+        # Listing links point at PubMed; the full text lives at the linked PMC article
+        record = resolve_identifiers([url]).get(url)
+        if record is not None:
+            return pmc_article_url(record[PMCID]) if record.get(PMCID) else None
+        # ID conversion unavailable: find the PMC link on the PubMed page instead
+        response = http_pool.get(url, headers=HEADERS)
+        pmc_link = BeautifulSoup(response.text, "html.parser").find("a", class_="link-item pmc")
+        return pmc_link["href"] if pmc_link and "href" in pmc_link.attrs else None
+    return None
+
+
+def prewarm_article(source: str, url: str) -> None:
+    """Parse the default (all sections) full text into the article store ahead of the click."""
+    full_text_url = full_text_url_for(source, url)
+    if not full_text_url:
+        return
+    kind = store_kind(ALL_SECTIONS)
+    if source == "medrxiv":
+        read_through(full_text_url, kind, bioRxiv_full.PARSER_VERSION,
+                     lambda: bioRxiv_full.extract_content_from_biorxiv(full_text_url))
+    elif source == "plos":
+        read_through(full_text_url, kind, plos_full.PARSER_VERSION,
+                     lambda: plos_full.extract_content_with_structure(full_text_url))
+    elif source == "pubmed":
+        read_through(full_text_url, kind, pubmed_full.PARSER_VERSION,
+                     lambda: [block.to_dict() for block in pubmed_full.extract_content_with_front_matter(full_text_url)])
+
+
+def warmup_steps():
+    return [
+        ("parser", warm_parser),
+        ("article_store", lambda: describe(get_article_store())),
+        ("identifier_cache", lambda: describe(get_identifier_cache())),
+        ("connections", lambda: open_connections(["https://pmc.ncbi.nlm.nih.gov/", "https://www.medrxiv.org/",
+                                                  "https://journals.plos.org/", IDCONV_URL])),
+    ]
+
+
+@profiled("fulltext.prewarm_worker")
+def lambda_handler(event, context):
+    """SQS-triggered worker; each message body is {"source": ..., "url": ...}.
+
+    Failures are only logged: a missed prewarm just means a cold fetch on click.
+    """
+    if is_warmup(event):
+        return run_warmup("prewarm_worker", warmup_steps())
+    warmed = 0
+    for record in event.get("Records", []):
+        try:
+            job = json.loads(record["body"])
+            prewarm_article(job["source"], job["url"])
+            warmed += 1
+        except Exception as e:
+            print(f"Prewarm failed for message {record.get('messageId')}: {str(e)}")
+    return {"warmed": warmed}
@@ -1,15 +1,32 @@
 import json
+import os
 import requests
 from bs4 import BeautifulSoup
-from typing import List, Dict, Union
+from typing import Callable, FrozenSet, Iterator, List, Dict, Optional, Tuple, Union
+from compact import COMPACT, compact_blocks, parse_format
+from doc_index import DocumentIndex, anchor
+from stream_parser import CaptureRule, FragmentStreamParser, has_class, inside
+from sections import ALL_SECTIONS, BODY, FIGURES, FRONT, REFERENCES, TABLES, page_slice, parse_reference_page, parse_sections, reference_page_meta, store_kind
+from common import http_pool
+from common.article_store import get_article_store, read_through
+from common.identifiers import PMCID, parse_identifier
+from common.profiling import profiled
+from common.search_index import get_search_index, index_full_text_blocks
+from common.warmup import describe, is_warmup, open_connections, run_warmup, warm_parser
+
+PARSER_VERSION = "1"
+
+# Bytes of the response fed to the incremental parser at a time
+STREAM_CHUNK_SIZE = 64 * 1024
 
 class ContentBlock:
-    def __init__(self, type: str, content: Union[str, list, dict]):
+    def __init__(self, type: str, content: Union[str, list, dict], meta: Optional[dict] = None):
         self.type = type
         self.content = content
+        self.meta = meta or {}
 
     def to_dict(self):
-        return {"type": self.type, "content": self.content}
+        return {"type": self.type, "content": self.content, **self.meta}
 
 def fetch_pubmed_citation(pmcid: str) -> List[Dict[str, str]]:
     api_url = f"https://pmc.ncbi.nlm.nih.gov/resources/citations/{pmcid}/"
@@ -17,7 +34,7 @@ def fetch_pubmed_citation(pmcid: str) -> List[Dict[str, str]]:
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
         "Referer": "https://www.ncbi.nlm.nih.gov/"
     }
-    response = requests.get(api_url, headers=headers)    
+    response = http_pool.get(api_url, headers=headers)    
     try:
         data = response.json()
     except json.JSONDecodeError:
@@ -39,139 +56,289 @@ def extract_pmcid(soup):
             break  
     return pmcid
 
+def pmcid_from_url(url: str) -> Optional[str]:
+    # PMC article URLs carry the PMCID, which saves scanning every text node for it
+    parsed = parse_identifier(url)
+    return parsed[1].replace('PMC', '') if parsed and parsed[0] == PMCID else None
 
 
-def extract_content_with_front_matter(url: str) -> List[ContentBlock]:
+
+def front_matter_blocks(front_matter, pmcid: Optional[str],
+                        fetch_citations: Optional[Callable[[str], List[Dict[str, str]]]] = fetch_pubmed_citation) -> List[ContentBlock]:
+    content_blocks = []
+
+    # Title
+    title = front_matter.find('h1').get_text(strip=True) if front_matter.find('h1') else "No Title Found"
+    content_blocks.append(ContentBlock(type="title", content=title))
+
+    # Fetch citations if PMCID is found (callers that cannot do I/O here pass None and add them later)
+    if pmcid and fetch_citations is not None:
+        citations = fetch_citations(pmcid)
+        if citations:
+            content_blocks.append(ContentBlock(type="citations", content=citations))
+
+    # Authors
+    authors = front_matter.find('span', {'class': 'collab'})
+    if authors:
+        content_blocks.append(ContentBlock(type="heading", content="Authors"))
+        content_blocks.append(ContentBlock(type="text", content=authors.get_text(strip=True)))
+
+    # Additional panels (Remove Article Notes and License)
+    panels = front_matter.find_all('div', {'class': 'd-panel'})
+    for panel in panels:
+        panel_id = panel.get('id')
+        if panel_id == "aip_a":  # Keep only Author Information
+            content = panel.get_text(strip=True)
+            content_blocks.append(ContentBlock(type="subheading", content="Author Information"))
+            content_blocks.append(ContentBlock(type="text", content=content))
+
+    # PMCID and PMID
+    identifiers = front_matter.find('div', text=lambda x: "PMCID" in x if x else False)
+    if identifiers:
+        content_blocks.append(ContentBlock(type="subheading", content="Identifiers"))
+        content_blocks.append(ContentBlock(type="text", content=identifiers.get_text(strip=True)))
+
+    return content_blocks
+
+def wanted_body_tags(sections: FrozenSet[str]) -> List[str]:
+    # Only look for the tag kinds that feed the requested block types. Figures
+    # are still visited for body text so their captions are not repeated as paragraphs.
+    wanted_tags = []
+    if BODY in sections:
+        wanted_tags += ['h2', 'h3', 'h4', 'p']
+    if BODY in sections or FIGURES in sections:
+        wanted_tags += ['figure']
+    if TABLES in sections:
+        wanted_tags += ['table']
+    return wanted_tags
+
+class ArticleBodyExtractor:
+    """Turns article-content elements into blocks, in document order.
+
+    Keeps the last figure caption (to drop paragraphs repeating it) and the
+    running table number between elements.
+    """
+
+    def __init__(self, sections: FrozenSet[str] = ALL_SECTIONS):
+        self.sections = sections
+        self.last_caption = ""
+        self.table_count = 0
+
+    def blocks(self, section, figure_heading: Callable[[object], Optional[str]]) -> List[ContentBlock]:
+        if section.name == 'h2':
+            return [ContentBlock(type="subheading", content=section.get_text(strip=True))]
+        elif section.name == 'h3':
+            return [ContentBlock(type="subsubheading", content=section.get_text(strip=True))]
+        elif section.name == 'h4':
+            return [ContentBlock(type="subsubsubheading", content=section.get_text(strip=True))]
+        elif section.name == 'p':
+            # Skip text if it matches the last image caption
+            if self.last_caption and self.last_caption in section.get_text(strip=True):
+                return []
+            return [ContentBlock(type="text", content=section.get_text(strip=True))]
+        elif section.name == 'figure':
+            img_tag = section.find('img')
+            fig_caption = section.find('figcaption').get_text(strip=True) if section.find('figcaption') else "No caption provided"
+            blocks = []
+            if img_tag and 'src' in img_tag.attrs:
+                if FIGURES in self.sections:
+                    heading_text = figure_heading(section)
+                    # Add image and caption along with the figure heading if available
+                    blocks.append(ContentBlock(type="image", content={
+                        'url': img_tag['src'],
+                        'caption': f"{heading_text}: {fig_caption}" if heading_text else fig_caption
+                    }))
+                self.last_caption = fig_caption
+            return blocks
+        elif section.name == 'table':
+            # Increment table count
+            self.table_count += 1
+            table_number = f"Table {self.table_count}"
+
+            # Extract table content
+            rows = []
+            for row in section.find_all('tr'):
+                cells = [cell.get_text(strip=True) for cell in row.find_all(['th', 'td'])]
+                rows.append(cells)
+
+            # Use a real caption if available; otherwise, fallback to table number
+            caption = section.find('caption').get_text(strip=True) if section.find('caption') else table_number
+
+            # Only add tables with valid captions
+            if caption != "No caption provided":
+                return [ContentBlock(type="table", content={
+                    "caption": caption,
+                    "rows": rows
+                })]
+        return []
+
+def reference_entry(ref) -> Dict:
+    ref_id = ref.get("id", "unknown")
+    ref_text = ref.cite.get_text(strip=True) if ref.cite else ref.get_text(strip=True)
+
+    # Extract links
+    links_data = []
+    for a in ref.find_all('a', href=True):
+        link_text = a.get_text(strip=True)
+        link_url = a['href']
+        links_data.append({
+            "text": link_text,
+            "url": link_url
+        })
+
+    return {
+        "id": ref_id,
+        "citation": ref_text,
+        "links": links_data
+    }
+
+def references_blocks(references_data: List[Dict], total: int, ref_offset: int, ref_limit: Optional[int]) -> List[ContentBlock]:
+    # Append references section in required format
+    return [
+        ContentBlock(type="subheading", content="References"),
+        ContentBlock(type="references", content=references_data, meta=reference_page_meta(total, ref_offset, ref_limit)),
+    ]
+
+@profiled("fulltext.pubmed.extract")
+def extract_content_with_front_matter(url: str, sections: FrozenSet[str] = ALL_SECTIONS, ref_offset: int = 0, ref_limit: Optional[int] = None) -> List[ContentBlock]:
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
     }
-    response = requests.get(url, headers=headers)
+    response = http_pool.get(url, headers=headers)
     response.raise_for_status()
     soup = BeautifulSoup(response.text, 'html.parser')
+    return parse_pubmed_full_text(soup, sections, ref_offset, ref_limit, pmcid=pmcid_from_url(url))
 
+def parse_pubmed_full_text(soup: BeautifulSoup, sections: FrozenSet[str] = ALL_SECTIONS, ref_offset: int = 0, ref_limit: Optional[int] = None,
+                           fetch_citations: Optional[Callable[[str], List[Dict[str, str]]]] = fetch_pubmed_citation,
+                           pmcid: Optional[str] = None) -> List[ContentBlock]:
     content_blocks = []
-    last_caption = ""
-    table_count = 0 
-
-    
 
     # Extract front matter
-    front_matter = soup.find('section', {'class': 'front-matter'})
+    front_matter = soup.find('section', {'class': 'front-matter'}) if FRONT in sections else None
     if front_matter:
-        # Title
-        title = front_matter.find('h1').get_text(strip=True) if front_matter.find('h1') else "No Title Found"
-        content_blocks.append(ContentBlock(type="title", content=title))
-
-
-        # Extract PMCID
-        pmcid = extract_pmcid(soup)  
-    
-        # Fetch citations if PMCID is found
-        if pmcid:
-            citations = fetch_pubmed_citation(pmcid)
-            if citations:
-                content_blocks.append(ContentBlock(type="citations", content=citations))
-
-        # Authors
-        authors = front_matter.find('span', {'class': 'collab'})
-        if authors:
-            content_blocks.append(ContentBlock(type="heading", content="Authors"))
-            content_blocks.append(ContentBlock(type="text", content=authors.get_text(strip=True)))
-
-        # Additional panels (Remove Article Notes and License)
-        panels = front_matter.find_all('div', {'class': 'd-panel'})
-        for panel in panels:
-            panel_id = panel.get('id')
-            if panel_id == "aip_a":  # Keep only Author Information
-                content = panel.get_text(strip=True)
-                content_blocks.append(ContentBlock(type="subheading", content="Author Information"))
-                content_blocks.append(ContentBlock(type="text", content=content))
-
-        # PMCID and PMID
-        identifiers = front_matter.find('div', text=lambda x: "PMCID" in x if x else False)
-        if identifiers:
-            content_blocks.append(ContentBlock(type="subheading", content="Identifiers"))
-            content_blocks.append(ContentBlock(type="text", content=identifiers.get_text(strip=True)))
+        content_blocks.extend(front_matter_blocks(front_matter, pmcid or extract_pmcid(soup), fetch_citations))
+
+    # Drop the reference list up front when it was not requested so the
+    # body scan below never walks into it
+    references_section = soup.find('section', {'id': 'ref-list1'})
+    if references_section and REFERENCES not in sections:
+        references_section.decompose()
+        references_section = None
+
+    wanted_tags = wanted_body_tags(sections)
 
     # Extract main article content
-    article_section = soup.find('section', {'aria-label': 'Article content'})
+    article_section = soup.find('section', {'aria-label': 'Article content'}) if wanted_tags else None
     if article_section:
-        for section in article_section.find_all(['h2', 'h3', 'h4', 'p', 'figure', 'table']):
-            if section.name == 'h2':
-                content_blocks.append(ContentBlock(type="subheading", content=section.get_text(strip=True)))
-            elif section.name == 'h3':
-                content_blocks.append(ContentBlock(type="subsubheading", content=section.get_text(strip=True)))
-            elif section.name == 'h4':
-                content_blocks.append(ContentBlock(type="subsubsubheading", content=section.get_text(strip=True)))
-            elif section.name == 'p':
-                # Skip text if it matches the last image caption
-                if last_caption and last_caption in section.get_text(strip=True):
-                    continue
-                content_blocks.append(ContentBlock(type="text", content=section.get_text(strip=True)))
-            elif section.name == 'figure':
-                img_tag = section.find('img')
-                fig_caption = section.find('figcaption').get_text(strip=True) if section.find('figcaption') else "No caption provided"
-                fig_heading = section.find_previous('h3', class_='obj_head')
-                heading_text = fig_heading.get_text(strip=True) if fig_heading else None
-                if img_tag and 'src' in img_tag.attrs:
-                    # Add image and caption along with the figure heading if available
-                    content_blocks.append(ContentBlock(type="image", content={
-                        'url': img_tag['src'],
-                        'caption': f"{heading_text}: {fig_caption}" if heading_text else fig_caption
-                    }))
-                    last_caption = fig_caption
-            elif section.name == 'table':
-                # Increment table count
-                table_count += 1
-                table_number = f"Table {table_count}"
-
-                # Extract table content
-                rows = []
-                for row in section.find_all('tr'):
-                    cells = [cell.get_text(strip=True) for cell in row.find_all(['th', 'td'])]
-                    rows.append(cells)
-
-                # Use a real caption if available; otherwise, fallback to table number
-                caption = section.find('caption').get_text(strip=True) if section.find('caption') else table_number
-
-                # Only add tables with valid captions
-                if caption != "No caption provided":
-                    content_blocks.append(ContentBlock(type="table", content={
-                        "caption": caption,
-                        "rows": rows
-                    }))
+        # Figure headings are resolved from a one-pass index instead of find_previous per figure
+        index = DocumentIndex(soup, {'obj_head': anchor('h3', 'obj_head')}) if FIGURES in sections else None
 
-    references_section = soup.find('section', {'id': 'ref-list1'})
-    if references_section:
-        references_data = []
-        references = references_section.find_all('li')
+        def figure_heading(section):
+            fig_heading = index.previous(section, 'obj_head')
+            return fig_heading.get_text(strip=True) if fig_heading else None
 
-        for ref in references:
-            ref_id = ref.get("id", "unknown")
-            ref_text = ref.cite.get_text(strip=True) if ref.cite else ref.get_text(strip=True)
-            
-            # Extract links
-            links_data = []
-            for a in ref.find_all('a', href=True):
-                link_text = a.get_text(strip=True)
-                link_url = a['href']
-                links_data.append({
-                    "text": link_text,
-                    "url": link_url
-                })
-
-            references_data.append({
-                "id": ref_id,
-                "citation": ref_text,
-                "links": links_data
-            })
+        body = ArticleBodyExtractor(sections)
+        for section in article_section.find_all(wanted_tags):
+            content_blocks.extend(body.blocks(section, figure_heading))
 
-        # Append references section in required format
-        content_blocks.append(ContentBlock(type="subheading", content="References"))
-        content_blocks.append(ContentBlock(type="references", content=references_data))
+    if references_section:
+        references = references_section.find_all('li')
+        references_data = [reference_entry(ref) for ref in page_slice(references, ref_offset, ref_limit)]
+        content_blocks.extend(references_blocks(references_data, len(references), ref_offset, ref_limit))
 
     return content_blocks
 
+def extract_content_incrementally(url: str, sections: FrozenSet[str] = ALL_SECTIONS, ref_offset: int = 0, ref_limit: Optional[int] = None) -> Iterator[ContentBlock]:
+    """Streaming variant of extract_content_with_front_matter for very large articles.
+
+    The response body is fed chunk by chunk into an event-based parser. Front
+    matter, each body element and each reference item are materialized only
+    when they close, turned into blocks and dropped, so peak memory follows the
+    largest single element instead of the whole page. Blocks are yielded as
+    they are produced, with the references block last.
+    """
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
+    }
+    response = http_pool.get(url, headers=headers, stream=True)
+    response.raise_for_status()
+    if not response.encoding:
+        response.encoding = 'utf-8'
+
+    pending: List[ContentBlock] = []
+    state = {"pmcid": pmcid_from_url(url), "front_done": False, "ref_section": False, "ref_total": 0}
+    obj_heads: List[Tuple[int, str]] = []  # (start position, text) of h3.obj_head headings
+    references_data: List[Dict] = []
+    body = ArticleBodyExtractor(sections)
+    wanted_tags = set(wanted_body_tags(sections))
+    ref_end = None if ref_limit is None else ref_offset + ref_limit
+
+    def on_text(text):
+        # Same first-match rule as extract_pmcid, applied to text as it streams past
+        if state["pmcid"] is None and "PMCID:" in text:
+            after = text.split("PMCID:")[-1].split()
+            if after:
+                state["pmcid"] = after[0].strip().replace('PMC', '')
+
+    def match_front(name, attrs, ancestors):
+        return FRONT in sections and not state["front_done"] and name == 'section' and has_class(attrs, 'front-matter')
+
+    def on_front(element, seq):
+        state["front_done"] = True
+        pending.extend(front_matter_blocks(element, state["pmcid"] or extract_pmcid(element)))
+
+    def match_obj_head(name, attrs, ancestors):
+        return FIGURES in sections and name == 'h3' and has_class(attrs, 'obj_head')
+
+    def on_obj_head(element, seq):
+        obj_heads.append((seq, element.get_text(strip=True)))
+
+    def match_body(name, attrs, ancestors):
+        if name not in wanted_tags or not inside(ancestors, 'section', **{'aria-label': 'Article content'}):
+            return False
+        return REFERENCES in sections or not inside(ancestors, 'section', id='ref-list1')
+
+    def on_body(element, seq):
+        # Start positions of nested elements follow from the fragment's document order
+        positions = {id(tag): seq + i for i, tag in enumerate([element] + element.find_all(True))}
+
+        def figure_heading(section):
+            start = positions.get(id(section), seq)
+            before = [text for position, text in obj_heads if position < start]
+            return before[-1] if before else None
+        for section in [element] + element.find_all(list(wanted_tags)):
+            pending.extend(body.blocks(section, figure_heading))
+
+    def match_reference(name, attrs, ancestors):
+        # An empty reference list still gets its heading, as in the tree-based path
+        if name == 'section' and attrs.get('id') == 'ref-list1':
+            state["ref_section"] = True
+        return REFERENCES in sections and name == 'li' and inside(ancestors, 'section', id='ref-list1')
+
+    def on_reference(element, seq):
+        for ref in [element] + element.find_all('li'):
+            position = state["ref_total"]
+            state["ref_total"] += 1
+            if position >= ref_offset and (ref_end is None or position < ref_end):
+                references_data.append(reference_entry(ref))
+
+    parser = FragmentStreamParser([
+        CaptureRule(match_front, on_front),
+        CaptureRule(match_obj_head, on_obj_head),
+        CaptureRule(match_body, on_body),
+        CaptureRule(match_reference, on_reference),
+    ], on_text=on_text)
+
+    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True):
+        parser.feed(chunk)
+        yield from pending
+        pending.clear()
+    parser.close()
+    yield from pending
+
+    if REFERENCES in sections and state["ref_section"]:
+        yield from references_blocks(references_data, state["ref_total"], ref_offset, ref_limit)
 
 HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -179,7 +346,18 @@ HEADERS = {
     "Access-Control-Allow-Headers": "Content-Type"
 }
 
+def warmup_steps():
+    return [
+        ("parser", warm_parser),
+        ("article_store", lambda: describe(get_article_store())),
+        ("search_index", lambda: describe(get_search_index())),
+        ("connections", lambda: open_connections(["https://pmc.ncbi.nlm.nih.gov/"])),
+    ]
+
+@profiled("fulltext.pubmed.handler")
 def lambda_handler(event, context):
+    if is_warmup(event):
+        return run_warmup("pubmed", warmup_steps())
     try:
         # Extract the URL from query string parameters
         url = event.get('queryStringParameters', {}).get('url')
@@ -190,11 +368,30 @@ def lambda_handler(event, context):
                 "body": json.dumps({"error": "URL is required in the query string parameters."})
             }
 
-        # Extract content from the provided URL
-        content_blocks = extract_content_with_front_matter(url)
+        query_params = event.get('queryStringParameters', {})
+        try:
+            sections = parse_sections(query_params.get('sections'))
+            ref_offset, ref_limit = parse_reference_page(query_params)
+            output_format = parse_format(query_params.get('format'))
+        except ValueError as e:
+            return {
+                "statusCode": 400,
+                "headers": HEADERS,
+                "body": json.dumps({"error": str(e)})
+            }
 
-        # Convert to dictionary for JSON serialization
-        result = [block.to_dict() for block in content_blocks]
+        # Very large articles can be parsed incrementally; both modes produce the same blocks
+        incremental = query_params.get('mode') == 'incremental' or os.environ.get('PMC_INCREMENTAL') == '1'
+        extract = extract_content_incrementally if incremental else extract_content_with_front_matter
+
+        # Extract content from the provided URL, converted to dictionaries for
+        # JSON serialization, unless the article store already has it
+        result = read_through(url, store_kind(sections, ref_offset, ref_limit), PARSER_VERSION,
+                              lambda: [block.to_dict() for block in extract(url, sections, ref_offset, ref_limit)])
+        index_full_text_blocks(url, "pubmed", result)
+        # The store and search index keep the verbose blocks; only the response is packed
+        if output_format == COMPACT:
+            result = compact_blocks(result)
 
         return {
             "statusCode": 200,
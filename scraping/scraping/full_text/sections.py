@@ -0,0 +1,56 @@
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+# Block groups a caller can ask for with `sections=`
+FRONT = "front"            # title, DOI, citation, authors, identifiers, dates
+BODY = "body"              # headings and paragraph text
+FIGURES = "figures"
+TABLES = "tables"
+REFERENCES = "references"
+
+ALL_SECTIONS: FrozenSet[str] = frozenset([FRONT, BODY, FIGURES, TABLES, REFERENCES])
+
+# Query parameters passed through from the dispatcher to the extractors
+PASSTHROUGH_PARAMS = ("sections", "ref_offset", "ref_limit", "format")
+
+
+def parse_sections(value: Optional[str]) -> FrozenSet[str]:
+    """Parse a comma-separated `sections` parameter; missing or empty means everything."""
+    if not value:
+        return ALL_SECTIONS
+    requested = frozenset(part.strip().lower() for part in value.split(",") if part.strip())
+    unknown = requested - ALL_SECTIONS
+    if unknown:
+        raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}. Choose from {', '.join(sorted(ALL_SECTIONS))}.")
+    return requested or ALL_SECTIONS
+
+
+def parse_reference_page(query_params: Dict) -> Tuple[int, Optional[int]]:
+    """Read `ref_offset`/`ref_limit` from the query string."""
+    try:
+        offset = int(query_params.get("ref_offset") or 0)
+        limit = query_params.get("ref_limit")
+        limit = int(limit) if limit not in (None, "") else None
+    except ValueError:
+        raise ValueError("'ref_offset' and 'ref_limit' must be integers.")
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("'ref_offset' and 'ref_limit' must not be negative.")
+    return offset, limit
+
+
+def page_slice(items: List, offset: int = 0, limit: Optional[int] = None) -> List:
+    """Cut the requested page out of a reference list before any per-item parsing."""
+    return items[offset:] if limit is None else items[offset:offset + limit]
+
+
+def reference_page_meta(total: int, offset: int, limit: Optional[int]) -> Dict:
+    """Extra keys for a references block; empty when the caller did not page."""
+    if not offset and limit is None:
+        return {}
+    return {"total": total, "offset": offset, "limit": limit}
+
+
+def store_kind(sections: FrozenSet[str], offset: int = 0, limit: Optional[int] = None) -> str:
+    """Article store kind for a full-text result; each selection/page is stored separately."""
+    if sections == ALL_SECTIONS and not offset and limit is None:
+        return "full_text"
+    return f"full_text:{','.join(sorted(sections))}:{offset}:{'' if limit is None else limit}"
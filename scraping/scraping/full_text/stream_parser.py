@@ -0,0 +1,130 @@
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from bs4 import BeautifulSoup, Tag
+
+# Elements that never have children or an end tag
+VOID_ELEMENTS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+])
+
+# (tag name, attributes) of every element enclosing the current position
+Ancestors = List[Tuple[str, Dict[str, Optional[str]]]]
+
+
+def has_class(attrs: Dict[str, Optional[str]], class_: str) -> bool:
+    return class_ in (attrs.get("class") or "").split()
+
+
+def inside(ancestors: Ancestors, name: str, **attrs: str) -> bool:
+    """True when some enclosing element is `name` with the given attribute values (class_ for class)."""
+    for tag, tag_attrs in ancestors:
+        if tag != name:
+            continue
+        if all(has_class(tag_attrs, value) if key == "class_" else tag_attrs.get(key) == value
+               for key, value in attrs.items()):
+            return True
+    return False
+
+
+class CaptureRule:
+    """Capture elements for which `match(name, attrs, ancestors)` holds.
+
+    Only the outermost match is captured; nested matches travel inside its
+    fragment. When the element closes, `on_close(element, start_seq)` gets it
+    as a standalone BeautifulSoup tag and the raw markup is released.
+    """
+
+    def __init__(self, match: Callable[[str, Dict, Ancestors], bool], on_close: Callable[[Tag, int], None]):
+        self.match = match
+        self.on_close = on_close
+
+
+class _Capture:
+    __slots__ = ("rule", "depth", "seq", "parts")
+
+    def __init__(self, rule: CaptureRule, depth: int, seq: int, start: str):
+        self.rule = rule
+        self.depth = depth
+        self.seq = seq
+        self.parts = [start]
+
+
+class FragmentStreamParser(HTMLParser):
+    """Event-based HTML parser that materializes only the captured elements.
+
+    Memory stays proportional to the open-element stack plus the largest
+    element being captured, not to the whole document. Unclosed elements are
+    closed when an enclosing end tag arrives, as BeautifulSoup's html.parser
+    builder does.
+    """
+
+    def __init__(self, rules: Iterable[CaptureRule], on_text: Optional[Callable[[str], None]] = None):
+        super().__init__(convert_charrefs=False)
+        self._rules = list(rules)
+        self._on_text = on_text
+        self._stack: Ancestors = []
+        self._captures: List[_Capture] = []
+        self._seq = 0
+
+    def _append(self, text: str) -> None:
+        for capture in self._captures:
+            capture.parts.append(text)
+
+    def _start(self, tag: str, attrs, void: bool) -> None:
+        raw = self.get_starttag_text()
+        attrs = dict(attrs)
+        self._seq += 1
+        self._append(raw)
+        capturing = {id(capture.rule) for capture in self._captures}
+        for rule in self._rules:
+            if id(rule) in capturing or not rule.match(tag, attrs, self._stack):
+                continue
+            if void:
+                self._emit(rule, raw, self._seq)
+            else:
+                self._captures.append(_Capture(rule, len(self._stack), self._seq, raw))
+        if not void:
+            self._stack.append((tag, attrs))
+
+    def _pop_to(self, depth: int) -> None:
+        while len(self._stack) > depth:
+            self._stack.pop()
+            closing = [capture for capture in self._captures if capture.depth == len(self._stack)]
+            for capture in closing:
+                self._captures.remove(capture)
+                self._emit(capture.rule, "".join(capture.parts), capture.seq)
+
+    def _emit(self, rule: CaptureRule, markup: str, seq: int) -> None:
+        element = BeautifulSoup(markup, "html.parser").find(True)
+        if element is not None:
+            rule.on_close(element, seq)
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs, tag in VOID_ELEMENTS)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth][0] == tag:
+                self._append(f"</{tag}>")
+                self._pop_to(depth)
+                return
+        # Stray end tag with nothing to close; ignore it like BeautifulSoup does
+
+    def handle_data(self, data):
+        self._append(data)
+        if self._on_text:
+            self._on_text(data)
+
+    def handle_entityref(self, name):
+        self._append(f"&{name};")
+
+    def handle_charref(self, name):
+        self._append(f"&#{name};")
+
+    def close(self):
+        super().close()
+        # Flush elements left open at the end of the document
+        self._pop_to(0)
@@ -0,0 +1,69 @@
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from bs4 import Tag
+
+# A handler receives the matched tag and returns a block, a list of blocks or None.
+Handler = Callable[[Tag], Union[Dict, List[Dict], None]]
+
+
+class DispatchTable:
+    """Maps tag names (optionally narrowed by class or id) to block handlers."""
+
+    def __init__(self):
+        self._by_id: Dict[Tuple[str, str], Handler] = {}
+        self._by_class: Dict[Tuple[str, str], Handler] = {}
+        self._by_name: Dict[str, Handler] = {}
+
+    def on(self, name: str, handler: Handler, class_: Optional[str] = None, id_: Optional[str] = None) -> "DispatchTable":
+        if id_:
+            self._by_id[(name, id_)] = handler
+        elif class_:
+            self._by_class[(name, class_)] = handler
+        else:
+            self._by_name[name] = handler
+        return self
+
+    def lookup(self, tag: Tag) -> Optional[Handler]:
+        # Most specific match wins: id, then class, then bare tag name
+        tag_id = tag.get('id')
+        if tag_id and (tag.name, tag_id) in self._by_id:
+            return self._by_id[(tag.name, tag_id)]
+        for cls in tag.get('class', []):
+            handler = self._by_class.get((tag.name, cls))
+            if handler:
+                return handler
+        return self._by_name.get(tag.name)
+
+
+def walk(root: Tag, table: DispatchTable) -> List[Dict]:
+    """Visit every tag under `root` once in document order.
+
+    When a tag matches the dispatch table its handler consumes the whole
+    subtree and the walker does not descend into it, so nested paragraphs
+    inside figures or reference lists are never emitted twice.
+    """
+    blocks: List[Dict] = []
+    stack = [child for child in reversed(root.contents) if isinstance(child, Tag)]
+    while stack:
+        node = stack.pop()
+        handler = table.lookup(node)
+        if handler is not None:
+            result = handler(node)
+            if isinstance(result, list):
+                blocks.extend(result)
+            elif result:
+                blocks.append(result)
+            continue
+        stack.extend(child for child in reversed(node.contents) if isinstance(child, Tag))
+    return blocks
+
+
+def text_block(block_type: str) -> Handler:
+    """Handler that emits the stripped text of the tag as a block of `block_type`."""
+    def handle(tag: Tag) -> Dict:
+        return {'type': block_type, 'content': tag.get_text(strip=True)}
+    return handle
+
+
+def skip(tag: Tag) -> None:
+    """Handler that drops the tag and its whole subtree without looking inside it."""
+    return None
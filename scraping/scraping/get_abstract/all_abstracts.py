@@ -1,7 +1,28 @@
 import json
-import requests
 from typing import Dict, List, Union, Callable
 from bs4 import BeautifulSoup
+from common import http_pool
+from common.article_store import ABSTRACT_PARSER_VERSION, get_article_store, read_through, remember
+from common.identifiers import PMCID, PMID, get_identifier_cache, parse_identifier, remember_identifiers
+from common.profiling import profiled
+from common.search_index import get_search_index, index_abstract_record, index_full_text_blocks
+from common.warmup import describe, is_warmup, open_connections, run_warmup, warm_parser
+
+try:
+    # The full-text parsers, when packaged alongside, let one download serve
+    # both the abstract and the full text for medRxiv and PLOS
+    from bioRxiv_full import PARSER_VERSION as BIORXIV_FULL_TEXT_VERSION, parse_biorxiv_full_text
+    from plos_full import PARSER_VERSION as PLOS_FULL_TEXT_VERSION, parse_plos_full_text
+    # source -> (full-text parser, its parser version)
+    FULL_TEXT_PARSERS = {
+        "medrxiv": (parse_biorxiv_full_text, BIORXIV_FULL_TEXT_VERSION),
+        "plos": (parse_plos_full_text, PLOS_FULL_TEXT_VERSION),
+    }
+except ImportError:
+    FULL_TEXT_PARSERS = {}
+
+# Stored abstracts from an older parser version are re-derived on read; bump it in common/article_store
+PARSER_VERSION = ABSTRACT_PARSER_VERSION
 
 def extract_relevant_plos(section):
    
@@ -120,12 +141,9 @@ def extract_relevant_biorxiv(abstract_div) -> List[Dict[str, str]]:
     return result
 
 def get_biorxiv(url: str):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
-    }
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.text, "html.parser")
-    
+    return parse_biorxiv_abstract(fetch_article_page(url), url)
+
+def parse_biorxiv_abstract(soup: BeautifulSoup, url: str):
     title = soup.find("h1", class_="highwire-cite-title").get_text(strip=True) if soup.find("h1", class_="highwire-cite-title") else "Title not available"
     doi = soup.find("meta", {"name": "citation_doi"})["content"] if soup.find("meta", {"name": "citation_doi"}) else "DOI not available"
     authors_tag = soup.find_all("meta", {"name": "citation_author"})
@@ -139,18 +157,19 @@ def get_biorxiv(url: str):
 
 
 def get_pubmed(url):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
-    }
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.text, "html.parser")
-    
+    soup = fetch_article_page(url)
+
     title = soup.find("h1", class_="heading-title").get_text(strip=True) if soup.find("h1", class_="heading-title") else "Title not available"
     doi = soup.find("span", class_="doi").get_text(strip=True).replace("DOI:", "").strip() if soup.find("span", class_="doi") else "DOI not available"
     authors = [a.get_text(strip=True) for a in soup.find_all("a", class_="full-name")] or ["Authors not available"]
     # Extract PMC full text URL
     pmc_link = soup.find("a", class_="link-item pmc")
     full_text_url = pmc_link["href"] if pmc_link and "href" in pmc_link.attrs else url  # Fallback to input URL if PMC link not found
+    if full_text_url != url:
+        # The page already maps this PMID to its PMC copy; keep it for identifier lookups
+        pmid, pmcid = parse_identifier(url), parse_identifier(full_text_url)
+        if pmid and pmid[0] == PMID and pmcid and pmcid[0] == PMCID:
+            remember_identifiers({"pmid": pmid[1], "pmcid": pmcid[1], "doi": doi})
     abstract = extract_relevant_pubmed(soup.find("div", class_="abstract"))
     
     return {
@@ -162,14 +181,9 @@ def get_pubmed(url):
     }
 
 def get_plos(url: str):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
-    }
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        return {"error": f"Error fetching PLOS article: HTTP {response.status_code}"}
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
+    return parse_plos_abstract(fetch_article_page(url), url)
+
+def parse_plos_abstract(soup: BeautifulSoup, url: str):
     title_element = soup.find('h1', {'id': 'artTitle'})
     title = title_element.get_text(strip=True) if title_element else "Title not found"
     author_elements = soup.select('ul#author-list li a.author-name')
@@ -181,6 +195,64 @@ def get_plos(url: str):
     
     return {"title": title, "doi": doi, "authors": authors, "abstract": abstract_text, "full_text_url": url}
 
+def fetch_article_page(url: str) -> BeautifulSoup:
+    """Download and parse an article page. Error pages raise, so read_through never stores them as abstracts."""
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
+    }
+    response = http_pool.get(url, headers=headers)
+    if response.status_code != 200:
+        raise Exception(f"Error fetching the article: HTTP {response.status_code}")
+    return BeautifulSoup(response.text, "html.parser")
+
+def get_article(source: str, url: str) -> Dict:
+    """Download the full-text page once and parse both the abstract and the full-text blocks from it.
+
+    medRxiv's `.full-text` page carries the same abstract and citation metadata
+    as the article page; PLOS serves both from the same URL.
+    """
+    parse_full_text, _ = FULL_TEXT_PARSERS[source]
+    if source == "medrxiv":
+        soup = fetch_article_page(url + ".full-text")
+        parse_abstract = parse_biorxiv_abstract
+    else:
+        soup = fetch_article_page(url)
+        parse_abstract = parse_plos_abstract
+
+    # Full text first: extract_relevant_biorxiv strips the <strong> subheadings out of the abstract
+    try:
+        full_text = parse_full_text(soup)
+    except Exception as e:
+        print(f"Full-text parse failed for {url}: {str(e)}")
+        full_text = None
+    return {"abstract": parse_abstract(soup, url), "full_text": full_text}
+
+def abstract_from_article(source: str, url: str, fallback: Callable[[str], Dict]) -> Dict:
+    """Serve the abstract from the shared fetch and keep the full text for the read that usually follows."""
+    try:
+        article = get_article(source, url)
+    except Exception as e:
+        # No full-text page (yet); the article page still has the abstract
+        print(f"Shared article fetch failed for {url}: {str(e)}")
+        return fallback(url)
+    if article["full_text"]:
+        full_text_url = article["abstract"]["full_text_url"]
+        remember(full_text_url, "full_text", FULL_TEXT_PARSERS[source][1], article["full_text"])
+        index_full_text_blocks(full_text_url, source, article["full_text"])
+    return article["abstract"]
+
+def warmup_steps():
+    return [
+        ("parser", warm_parser),
+        ("full_text_parsers", lambda: sorted(FULL_TEXT_PARSERS)),
+        ("article_store", lambda: describe(get_article_store())),
+        ("search_index", lambda: describe(get_search_index())),
+        ("identifier_cache", lambda: describe(get_identifier_cache())),
+        ("connections", lambda: open_connections(["https://pubmed.ncbi.nlm.nih.gov/", "https://www.medrxiv.org/",
+                                                  "https://journals.plos.org/"])),
+    ]
+
+@profiled("abstract.handler")
 def lambda_handler(event, context):
     CORS_HEADERS = {
         "Content-Type": "application/json",
@@ -189,6 +261,9 @@ def lambda_handler(event, context):
         "Access-Control-Allow-Headers": "Content-Type",
     }
 
+    if is_warmup(event):
+        return run_warmup("abstract", warmup_steps())
+
     try:
         print("Event Received:", json.dumps(event))
 
@@ -213,7 +288,20 @@ def lambda_handler(event, context):
         if handler is None:
             return {"statusCode": 400, "headers": CORS_HEADERS, "body": json.dumps({"error": "Invalid source. Use 'biorxiv', 'pubmed', or 'plos'"})}
 
-        result = handler(url)
+        if source in FULL_TEXT_PARSERS:
+            compute = lambda: abstract_from_article(source, url, handler)
+        else:
+            compute = lambda: handler(url)
+        result = read_through(url, "abstract", PARSER_VERSION, compute,
+                              doi_of=lambda record: record.get("doi"))
+        index_abstract_record(url, source, result)
+
+        if query_params.get("include") == "full_text" and source in FULL_TEXT_PARSERS:
+            # Usually a store hit: the abstract miss above kept the full text from the same download
+            result = dict(result)
+            result["full_text"] = read_through(result["full_text_url"], "full_text", FULL_TEXT_PARSERS[source][1],
+                                               lambda: get_article(source, url)["full_text"])
+
         return {"statusCode": 200, "headers": CORS_HEADERS, "body": json.dumps(result)}
     
     except Exception as e:
@@ -1,14 +1,49 @@
 import json
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
 import requests
 import boto3
+import os
 import re
+import threading
+import time
+from common import http_pool
+from common.article_store import ABSTRACT_PARSER_VERSION, get_article_store
+from common.identifiers import PMCID, IDCONV_URL, get_identifier_cache, pmc_article_url, resolve_identifiers
+from common.listing_cache import cached_listing, get_listing_cache, listing_key, store_listing
+from common.parse_pool import run_parse, start_parse_workers
+from common.query_log import log_query
+from common.saved_searches import Watermark, get_saved_search_store, saved_search_id
+from common.warmup import describe, is_warmup, open_connections, run_warmup, warm_parser
+from common.search_index import abstract_text, get_search_index, index_listing_articles
+from common.prewarm import LISTING_SOURCES, enqueue_top_results
+from common.profiling import profiled
+from common.single_flight import single_flight
+from listing_parsers import parse_biorxiv_listing, parse_pubmed_listing
+from plos_api import PLOS_SEARCH_API, count_plos, search_plos
 
 dynamodb = boto3.resource('dynamodb')
 article_url_table = dynamodb.Table('articles_urls')
 
+# Roughly what one live page returns across the three sources
+LOCAL_PAGE_SIZE = 30
+SOURCE_MODES = ("live", "local", "hybrid")
+
+# "api" queries the PLOS search API directly; "lambda" uses the Playwright listing Lambda
+PLOS_LISTING_BACKEND = os.environ.get("PLOS_LISTING_BACKEND", "api").lower()
+
+# "off" leaves full_text_url out of listing results
+LISTING_FULL_TEXT_LINKS = os.environ.get("LISTING_FULL_TEXT_LINKS", "on").lower() != "off"
+
+RANKING_URL = "https://yf5xrpkaqwg46fzfiyoq5paeza0ibfhn.lambda-url.ap-south-1.on.aws/"
+# Ranking cascade stage two: rerank the RERANK_TOP_K best title matches with their abstracts (0 turns it off)
+RERANK_TOP_K = int(os.environ.get("RERANK_TOP_K", "10"))
+# Past this the stage-one order is returned as is
+RERANK_BUDGET_SECONDS = float(os.environ.get("RERANK_BUDGET_MS", "1500")) / 1000.0
+# Abstract Lambda invoked for abstracts not in the article store yet; unset means store hits only
+ABSTRACT_FUNCTION_NAME = os.environ.get("ABSTRACT_FUNCTION_NAME")
+
 def get_rated_articles():
     all_items = []
     last_evaluated_key = None
@@ -26,7 +61,8 @@ def combine_and_sort_articles(rated_articles, scraped_articles):
     for article in scraped_articles:
         url = article.get('url')
         article['average_rating'] = float(rated_map.get(url, {}).get('average_rating', 0))
-    scraped_articles.sort(key=lambda x: (-x['average_rating'], -x.get('final_score', 0)))
+    # Stable sort: equal ratings keep the ranked order they came in, which rerank_top_k may have refined
+    scraped_articles.sort(key=lambda x: -x['average_rating'])
     return scraped_articles
 
 def normalize(values):
@@ -34,15 +70,20 @@ def normalize(values):
     return [1 if min_val == max_val else (v - min_val) / (max_val - min_val) for v in values]
 
 
+def similarity_scores(query, documents, timeout=None):
+    """Cosine similarity of the query to each document, from the ranking model."""
+    response = http_pool.post(RANKING_URL, json={"documents": [query] + documents}, timeout=timeout)
+    response.raise_for_status()
+    return json.loads(response.json().get('body', '{}')).get('similarity_matrix', [[]])[0][1:]
+
+@profiled("listing.rank")
 def rank_articles(query, articles):
     titles = [article.get('title', '') for article in articles]
     if not titles:
         return []
 
     try:
-        response = requests.post("https://yf5xrpkaqwg46fzfiyoq5paeza0ibfhn.lambda-url.ap-south-1.on.aws/", json={"documents": [query] + titles})
-        response.raise_for_status()
-        cosine_sim = json.loads(response.json().get('body', '{}')).get('similarity_matrix', [[]])[0][1:]
+        cosine_sim = similarity_scores(query, titles)
     except Exception:
         return []
 
@@ -51,25 +92,295 @@ def rank_articles(query, articles):
         article['final_score'] = 0.7 * (cosine_sim[idx] if idx < len(cosine_sim) else 0) + 0.3 * citation_scores[idx]
     return articles
 
-def scrape_articles_multithreaded(query, page=1, sort="relevance", start_date=None, end_date=None,article_types=None, subject_areas=None):
+# Abstract handler called in-process instead of invoking ABSTRACT_FUNCTION_NAME (see server/app.py)
+_local_abstract_handler = None
+_lambda_client = None
+
+def use_local_abstracts(handler):
+    global _local_abstract_handler
+    _local_abstract_handler = handler
+
+def fetch_abstract(article):
+    """Plain abstract text for a listing result, or None.
+
+    The article store answers abstracts anyone has opened before; the rest go
+    through the abstract handler, which stores them for next time.
+    """
+    global _lambda_client
+    source = LISTING_SOURCES.get(article.get('source'))
+    url = article.get('url') or ''
+    if not source or not url.startswith('http'):
+        return None
+
+    record = None
+    store = get_article_store()
+    if store is not None:
+        try:
+            record = store.get(url, "abstract", ABSTRACT_PARSER_VERSION)
+        except Exception as e:
+            print(f"Article store read failed: {str(e)}")
+    if record is None:
+        event = {"queryStringParameters": {"source": source, "url": url}}
+        if _local_abstract_handler is not None:
+            response = _local_abstract_handler(event, None)
+        elif ABSTRACT_FUNCTION_NAME:
+            if _lambda_client is None:
+                _lambda_client = boto3.client('lambda')
+            payload = _lambda_client.invoke(FunctionName=ABSTRACT_FUNCTION_NAME, InvocationType="RequestResponse",
+                                            Payload=json.dumps(event))["Payload"].read()
+            response = json.loads(payload)
+        else:
+            return None
+        if response.get("statusCode") != 200:
+            return None
+        record = json.loads(response["body"])
+
+    text = " ".join(abstract_text(record.get("abstract")).split())
+    return None if not text or text == "Abstract not available" else text
+
+@profiled("listing.rerank")
+def rerank_top_k(query, articles, top_k=RERANK_TOP_K, budget_seconds=RERANK_BUDGET_SECONDS):
+    """Stage two of the ranking cascade over rank_articles' title scores.
+
+    Abstracts of the top_k results are fetched concurrently and those results
+    are rescored on title plus abstract into rerank_score. They swap places
+    only among themselves, each keeping its own final_score, so the returned
+    order rather than final_score is the ranking. Whatever has not finished
+    when the budget runs out keeps its stage-one position; if nothing has,
+    the stage-one order is returned.
+    """
+    ranked = sorted(articles, key=lambda article: -article.get('final_score', 0))
+    if top_k <= 0 or not ranked:
+        return ranked
+    deadline = time.monotonic() + budget_seconds
+    head = ranked[:top_k]
+
+    executor = ThreadPoolExecutor(max_workers=len(head))
+    futures = {executor.submit(fetch_abstract, article): i for i, article in enumerate(head)}
+    # The last third of the budget is kept for the scoring call
+    done, _ = wait(futures, timeout=budget_seconds * 2 / 3)
+    # Stragglers finish in the background and are in the article store next time
+    executor.shutdown(wait=False)
+    abstracts = {}
+    for future in done:
+        try:
+            text = future.result()
+        except Exception as e:
+            print(f"Abstract fetch for reranking failed: {str(e)}")
+            continue
+        if text:
+            abstracts[futures[future]] = text
+
+    remaining = deadline - time.monotonic()
+    if not abstracts or remaining <= 0:
+        return ranked
+    positions = sorted(abstracts)
+    try:
+        similarity = similarity_scores(query, [f"{head[i].get('title', '')}. {abstracts[i]}" for i in positions], timeout=remaining)
+    except Exception as e:
+        print(f"Rerank skipped: {str(e)}")
+        return ranked
+    if time.monotonic() > deadline or len(similarity) < len(positions):
+        return ranked
+
+    for i, score in zip(positions, similarity):
+        head[i]['rerank_score'] = 0.6 * score + 0.4 * head[i].get('final_score', 0)
+    reordered = sorted((head[i] for i in positions), key=lambda article: -article['rerank_score'])
+    for i, article in zip(positions, reordered):
+        head[i] = article
+    return head + ranked[top_k:]
+
+def search_local_index(query, page=1, sort="relevance", start_date=None, end_date=None):
+    index = get_search_index()
+    if index is None:
+        return []
+    try:
+        articles = index.search(query, limit=LOCAL_PAGE_SIZE, offset=(max(int(page), 1) - 1) * LOCAL_PAGE_SIZE,
+                                sort=sort, start_date=start_date, end_date=end_date)
+    except Exception as e:
+        print(f"Local index search failed: {str(e)}")
+        return []
+    # BM25 already orders local hits by relevance; expose it as the ranking score
+    scores = normalize([article.pop('local_score', 0) for article in articles])
+    for article, score in zip(articles, scores):
+        article['final_score'] = score
+    return articles
+
+def link_full_text(articles):
+    """Add full_text_url (the dispatcher URL) to each result that has one.
+
+    PubMed results are mapped PMID -> PMCID in one batched, cached ID
+    conversion; articles without a PMC copy get no link. Never fails the listing.
+    """
+    if not LISTING_FULL_TEXT_LINKS:
+        return articles
+    pmids = [article['pmid'] for article in articles if article.get('source') == 'PubMed' and article.get('pmid')]
+    try:
+        records = resolve_identifiers(pmids) if pmids else {}
+    except Exception as e:
+        print(f"Full-text link resolution failed: {str(e)}")
+        records = {}
+    for article in articles:
+        url = article.get('url') or ''
+        if article.get('source') == 'PubMed':
+            pmcid = (records.get(article.get('pmid')) or {}).get(PMCID)
+            if pmcid:
+                article['pmcid'] = pmcid
+                article['full_text_url'] = pmc_article_url(pmcid)
+        elif article.get('source') == 'MedRxiv' and url.startswith('http'):
+            article['full_text_url'] = url if url.endswith('.full-text') else url + '.full-text'
+        elif article.get('source') == 'PLOS' and url.startswith('http'):
+            article['full_text_url'] = url
+    return articles
+
+def coalesced_scrape(scraper, *args):
+    # Concurrent identical upstream requests share one fetch and parse. Each
+    # caller gets its own copies because ranking writes scores into the dicts.
+    result = single_flight(f"listing|{scraper.__name__}|{json.dumps(args)}", lambda: scraper(*args))
+    return [dict(article) for article in result] if isinstance(result, list) else result
+
+@profiled("listing.search")
+def scrape_articles_multithreaded(query, page=1, sort="relevance", start_date=None, end_date=None,article_types=None, subject_areas=None, source_mode="live"):
+    cache_key = listing_key(query, page, sort, start_date, end_date, article_types, subject_areas, source_mode)
+    cached = cached_listing(cache_key)
+    if cached is not None:
+        return cached[0]
+    # Identical concurrent searches wait on one fan-out, ranking and rating lookup
+    key = f"search|{json.dumps([query, page, sort, start_date, end_date, article_types, subject_areas, source_mode])}"
+    return single_flight(key, lambda: warm_listing(query, page, sort, start_date, end_date, article_types, subject_areas, source_mode))
+
+def warm_listing(query, page=1, sort="relevance", start_date=None, end_date=None,article_types=None, subject_areas=None, source_mode="live"):
+    # Always searches upstream; the scheduled prewarmer calls this to refresh popular queries
+    result = search_articles(query, page, sort, start_date, end_date, article_types, subject_areas, source_mode)
+    store_listing(listing_key(query, page, sort, start_date, end_date, article_types, subject_areas, source_mode), result)
+    return result
+
+def search_articles(query, page=1, sort="relevance", start_date=None, end_date=None,article_types=None, subject_areas=None, source_mode="live"):
     try:
+        local_results = []
+        # The index knows nothing about article types or subject areas, so filtered searches stay live
+        if source_mode in ("local", "hybrid") and not article_types and not subject_areas:
+            local_results = search_local_index(query, page, sort, start_date, end_date)
+            if source_mode == "local" or len(local_results) >= LOCAL_PAGE_SIZE:
+                if not local_results:
+                    return {"statusCode": 404, "body": json.dumps({"error": "No articles found."})}
+                link_full_text(local_results)
+                rated_articles = get_rated_articles()
+                sorted_articles = combine_and_sort_articles(rated_articles, local_results)
+                enqueue_top_results(sorted_articles)
+                return {"statusCode": 200, "body": {"articles": sorted_articles}}
+
         with ThreadPoolExecutor() as executor:
             futures = [
-                executor.submit(scrape_pubmed, query, page, sort, start_date, end_date,article_types),
-                executor.submit(scrape_biorxiv, query, page, sort, start_date, end_date),                
-                executor.submit(scrape_plos_articles, query, page, sort,start_date,end_date,article_types, subject_areas),
+                executor.submit(coalesced_scrape, scrape_pubmed, query, page, sort, start_date, end_date,article_types),
+                executor.submit(coalesced_scrape, scrape_biorxiv, query, page, sort, start_date, end_date),                
+                executor.submit(coalesced_scrape, scrape_plos_articles, query, page, sort,start_date,end_date,article_types, subject_areas),
             ]
             results = [future.result() for future in futures]
         all_results = sum((res if isinstance(res, list) else [] for res in results), [])
+        index_listing_articles(all_results)
+        # Hybrid mode tops up the local hits with upstream results it did not already have
+        live_urls = {article.get('url') for article in all_results}
+        all_results += [article for article in local_results if article['url'] not in live_urls]
+        link_full_text(all_results)
         if not all_results:
             return {"statusCode": 404, "body": json.dumps({"error": "No articles found."})}
         rated_articles = get_rated_articles()
-        sorted_articles = combine_and_sort_articles(rated_articles, rank_articles(query, all_results))
+        sorted_articles = combine_and_sort_articles(rated_articles, rerank_top_k(query, rank_articles(query, all_results)))
+        # Users usually open one of the first few results; start parsing them now
+        enqueue_top_results(sorted_articles)
         return {"statusCode": 200, "body":{"articles": sorted_articles}}
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
 
 
+def sse_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def stream_search_articles(query, page=1, sort="relevance", start_date=None, end_date=None,article_types=None, subject_areas=None):
+    """Progressive live search: yields (event, data) pairs as results become available.
+
+    "source" carries one upstream's articles as soon as it returns, "ratings"
+    and "ranking" map result URLs to their average rating and final score,
+    and "final" is the ordered list the non-streaming endpoint would return.
+    A failed search ends with an "error" event instead.
+    """
+    cache_key = listing_key(query, page, sort, start_date, end_date, article_types, subject_areas, "live")
+    cached = cached_listing(cache_key)
+    if cached is not None and cached[0].get("statusCode") == 200:
+        yield "final", cached[0]["body"]
+        return
+
+    with ThreadPoolExecutor() as executor:
+        # The rating scan does not depend on the results, so it overlaps the upstream fetches
+        ratings_future = executor.submit(get_rated_articles)
+        futures = {
+            executor.submit(coalesced_scrape, scrape_pubmed, query, page, sort, start_date, end_date,article_types): "PubMed",
+            executor.submit(coalesced_scrape, scrape_biorxiv, query, page, sort, start_date, end_date): "MedRxiv",
+            executor.submit(coalesced_scrape, scrape_plos_articles, query, page, sort,start_date,end_date,article_types, subject_areas): "PLOS",
+        }
+        all_results = []
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"{futures[future]} listing failed: {str(e)}")
+                result = []
+            articles = link_full_text(result if isinstance(result, list) else [])
+            all_results += articles
+            yield "source", {"source": futures[future], "articles": articles}
+
+        index_listing_articles(all_results)
+        if not all_results:
+            yield "error", {"statusCode": 404, "error": "No articles found."}
+            return
+
+        try:
+            rated_articles = ratings_future.result()
+        except Exception as e:
+            yield "error", {"statusCode": 500, "error": str(e)}
+            return
+    rated_map = {article['url']: float(article.get('average_rating', 0)) for article in rated_articles}
+    yield "ratings", {article['url']: rated_map[article['url']] for article in all_results if article.get('url') in rated_map}
+
+    ranked_articles = rerank_top_k(query, rank_articles(query, all_results))
+    yield "ranking", {article.get('url'): article.get('final_score', 0) for article in ranked_articles}
+
+    sorted_articles = combine_and_sort_articles(rated_articles, ranked_articles)
+    enqueue_top_results(sorted_articles)
+    store_listing(cache_key, {"statusCode": 200, "body": {"articles": sorted_articles}})
+    yield "final", {"articles": sorted_articles}
+
+
+# PubMed article type names -> search page filter values
+PUBMED_ARTICLE_TYPES = {
+    "Adaptive Clinical Trial": "pubt.adaptiveclinicaltrial",
+    "Clinical Study": "pubt.clinicalstudy",
+    "Observational Study": "pubt.observationalstudy",
+    "Randomized Controlled Trial": "pubt.randomizedcontrolledtrial",
+    "Comparative Study": "pubt.comparativestudy",
+    "Published Erratum": "pubt.publishederratum",
+    "Corrected and Republished Article": "pubt.correctedrepublishedarticle",
+    "Review": "pubt.review",
+    "Systematic Review": "pubt.systematicreview",
+    "Meta-Analysis": "pubt.metaanalysis",
+    "Editorial": "pubt.editorial",
+    "Personal Narrative": "pubt.personalnarrative",
+    "Comment": "pubt.comment",
+    "Letter": "pubt.letter",
+    "Practice Guideline": "pubt.practiceguideline",
+    "Guideline": "pubt.guideline",
+    "Consensus Development Conference": "pubt.consensusdevelopmentconference",
+    "Case Reports": "pubt.casereports",
+    "Historical Article": "pubt.historicalarticle",
+    "Interview": "pubt.interview",
+    "Congress": "pubt.congress",
+    "Technical Report": "pubt.technicalreport",
+    "Dataset": "pubt.dataset",
+    "Video-Audio Media": "pubt.videoaudiomedia"
+}
+
+@profiled("listing.scrape_pubmed")
 def scrape_pubmed(query, page=1, sort='relevance',start_date=None, end_date=None,article_types=None):
     base_url = "https://pubmed.ncbi.nlm.nih.gov/"
     search_url = f"{base_url}?term={query.replace(' ', '+')}&page={page}"
@@ -84,38 +395,12 @@ def scrape_pubmed(query, page=1, sort='relevance',start_date=None, end_date=None
         search_url += "&filter=simsearch1.fha&filter=simsearch2.ffrft"
     
 
-    article_type_mapping = {
-        "Adaptive Clinical Trial": "pubt.adaptiveclinicaltrial",
-        "Clinical Study": "pubt.clinicalstudy",
-        "Observational Study": "pubt.observationalstudy",
-        "Randomized Controlled Trial": "pubt.randomizedcontrolledtrial",
-        "Comparative Study": "pubt.comparativestudy",
-        "Published Erratum": "pubt.publishederratum",
-        "Corrected and Republished Article": "pubt.correctedrepublishedarticle",
-        "Review": "pubt.review",
-        "Systematic Review": "pubt.systematicreview",
-        "Meta-Analysis": "pubt.metaanalysis",
-        "Editorial": "pubt.editorial",
-        "Personal Narrative": "pubt.personalnarrative",
-        "Comment": "pubt.comment",
-        "Letter": "pubt.letter",
-        "Practice Guideline": "pubt.practiceguideline",
-        "Guideline": "pubt.guideline",
-        "Consensus Development Conference": "pubt.consensusdevelopmentconference",
-        "Case Reports": "pubt.casereports",
-        "Historical Article": "pubt.historicalarticle",
-        "Interview": "pubt.interview",
-        "Congress": "pubt.congress",
-        "Technical Report": "pubt.technicalreport",
-        "Dataset": "pubt.dataset",
-        "Video-Audio Media": "pubt.videoaudiomedia"
-    }
 
 
 
     if article_types:
         for article_type in article_types:
-            pubt_filter = article_type_mapping.get(article_type)  
+            pubt_filter = PUBMED_ARTICLE_TYPES.get(article_type)  
             if pubt_filter:
                 search_url += f"&filter={pubt_filter}"
             else:
@@ -124,67 +409,16 @@ def scrape_pubmed(query, page=1, sort='relevance',start_date=None, end_date=None
     print("Final URL:", search_url)  # Debugging 
 
     try:
-        response = requests.get(search_url)
+        response = http_pool.get(search_url)
         if response.status_code != 200:
             raise Exception(f"Failed to fetch data from PubMed (HTTP {response.status_code})")
-        soup = BeautifulSoup(response.text, "html.parser")
-        total_results = 0
-        results_summary = soup.find('label', class_='of-total-pages')
-        if results_summary:
-            total_results_text = results_summary.get_text(strip=True).replace("of ", "")
-            total_results = int(''.join(filter(str.isdigit, total_results_text)))  
-
-        articles = soup.find_all("article", class_="full-docsum")
-        if not articles:
-            return []
-        results = []
-        for article in articles[:10]:
-            pmid = article.find("span", class_="docsum-pmid").get_text(strip=True)
-            pmid_tag = article.find("a", class_="docsum-title")
-            title = pmid_tag.get_text(strip=True) if pmid_tag else "Title not available"
-            authors_tag = article.find("span", class_="docsum-authors")
-            authors = authors_tag.get_text(strip=True) if authors_tag else "Authors not available"
-            doi_tag = article.find("span", class_="docsum-journal-citation")
-            doi = None
-            publication_date = None
-            if doi_tag:
-                doi_text = doi_tag.get_text(strip=True)
-                if "doi:" in doi_text.lower():
-                    doi = doi_text.split("doi:")[-1].strip()
-                citation_text = doi_tag.get_text(strip=True)
-                date_match = re.search(r'\b(\d{4} [A-Za-z]{3,4}(?: \d{1,2})?)\b', citation_text)
-                if date_match:
-                    raw_date = date_match.group(1)
-                    parts = raw_date.split()
-                    try:
-                        if len(parts) == 2:
-                            date_str = f"{parts[0]} {parts[1]} 01"
-                        elif len(parts) == 3:
-                            date_str = f"{parts[0]} {parts[1]} {parts[2]}"
-                        else:
-                            raise ValueError
-                        parsed_date = datetime.strptime(date_str, "%Y %b %d")
-                        publication_date = parsed_date.strftime("%d-%b-%Y")
-                    except (ValueError, IndexError):
-                        publication_date = None
-            url = f"{base_url}{pmid}/"
-            results.append({
-                "pmid": pmid,
-                "title": title,
-                "authors": authors,
-                "url": url,
-                "doi": doi,
-                "date": publication_date,  
-                "source": "PubMed",
-                'total results':total_results
-               
-            })
-        return results
+        # Parsing is CPU-bound; on the parse pool it no longer queues behind the other sources' parses on the GIL
+        return run_parse(parse_pubmed_listing, response.content)
     except Exception as e:
         raise Exception(f"Error occurred while scraping PubMed: {str(e)}")
 
 
-def scrape_biorxiv(query, page=0, sort='relevance', start_date=None, end_date=None):
+def biorxiv_search_url(query, page=0, sort='relevance', start_date=None, end_date=None, numresults=10):
     formatted_query = query.replace(' ', '+')
     date_filter = ""
 
@@ -198,76 +432,19 @@ def scrape_biorxiv(query, page=0, sort='relevance', start_date=None, end_date=No
     else:
         sort_param = "relevance-rank"
 
-    articles = []
+    return f"https://www.medrxiv.org/search/{formatted_query}%20jcode%3Amedrxiv%20{date_filter}numresults%3A{numresults}%20sort%3A{sort_param}%20format_result%3Astandard?page={page}"
 
-    url = f"https://www.medrxiv.org/search/{formatted_query}%20jcode%3Amedrxiv%20{date_filter}numresults%3A10%20sort%3A{sort_param}%20format_result%3Astandard?page={page}"
+def fetch_biorxiv_listing(query, page=0, sort='relevance', start_date=None, end_date=None):
+    # Raises on failure; scrape_biorxiv turns that into an empty result for the listing
+    response = http_pool.get(biorxiv_search_url(query, page, sort, start_date, end_date))
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch data from medRxiv (HTTP {response.status_code})")
+    return run_parse(parse_biorxiv_listing, response.content)
 
+@profiled("listing.scrape_biorxiv")
+def scrape_biorxiv(query, page=0, sort='relevance', start_date=None, end_date=None):
     try:
-        response = requests.get(url)
-        if response.status_code != 200:
-            return {"total_results": 0, "articles": []}
-
-        html = response.text
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Extract total number of results
-        total_results = 0
-        results_summary = soup.find('h1', id='page-title')
-        if results_summary:
-            total_results_text = results_summary.get_text(strip=True)
-            total_results = int(''.join(filter(str.isdigit, total_results_text)))  # Extract only numbers
-
-        # Extract articles
-        article_elements = soup.find_all('div', class_='highwire-article-citation')
-
-        for article in article_elements:
-            title_element = article.find('span', class_='highwire-cite-title')
-            title = title_element.get_text(strip=True) if title_element else "Title not available"
-
-            link_element = article.find('a', class_='highwire-cite-linked-title')
-            link = f"https://www.medrxiv.org{link_element['href']}" if link_element else "Link not available"
-
-            authors_element = article.find('div', class_='highwire-cite-authors')
-            authors = authors_element.get_text(strip=True) if authors_element else "Authors not available"
-
-            metadata_element = article.find('div', class_='highwire-cite-metadata')
-            doi = "DOI not available"
-            formatted_date = "Date not available"
-
-            if metadata_element:
-                doi_element = metadata_element.find('span', class_='highwire-cite-metadata-doi')
-                if doi_element:
-                    doi = doi_element.get_text(strip=True).replace('doi:', '').strip()
-                    try:
-                        doi_parts = doi.split('/')
-                        if len(doi_parts) > 1:
-                            date_part = doi_parts[-1].split('.')[:3]
-                            if len(date_part) == 3:
-                                raw_date = '-'.join(date_part)
-                                formatted_date = datetime.strptime(raw_date, "%Y-%m-%d").strftime("%d-%b-%Y")
-                    except ValueError:
-                        formatted_date = "Date extraction error from DOI"
-
-                date_element = metadata_element.find('span', class_='highwire-cite-metadata-pages')
-                if date_element:
-                    raw_date = date_element.get_text(strip=True)
-                    try:
-                        formatted_date = datetime.strptime(raw_date, "%d-%b-%Y").strftime("%d-%b-%Y")
-                    except ValueError:
-                        pass
-
-            articles.append({
-                'title': title,
-                'url': link,
-                'source': 'MedRxiv',
-                'authors': authors,
-                'doi': doi,
-                'date': formatted_date,
-                'results': total_results
-            })
-
-        return articles
-
+        return fetch_biorxiv_listing(query, page, sort, start_date, end_date)
     except Exception as e:
         print(f"Error occurred while scraping BioRxiv: {str(e)}")
         return {"total_results": 0, "articles": []}
@@ -275,7 +452,8 @@ def scrape_biorxiv(query, page=0, sort='relevance', start_date=None, end_date=No
 
 
 
-def scrape_plos_articles(query, page=1, sort="relevance",start_date=None, end_date=None,article_types=None,subject_areas=None):
+def fetch_plos_listing_lambda(query, page=1, sort="relevance",start_date=None, end_date=None,article_types=None,subject_areas=None):
+    # Browser-backed listing Lambda (listing/get_plos_list.py), kept for PLOS_LISTING_BACKEND=lambda
     api_url = "https://uvdzsuhkzxo7lu4uawyc6dop3u0typdc.lambda-url.ap-south-1.on.aws/"
     # Convert lists to comma-separated strings
     article_types_str = ",".join(article_types) if isinstance(article_types, list) else article_types
@@ -292,56 +470,351 @@ def scrape_plos_articles(query, page=1, sort="relevance",start_date=None, end_da
     }
 
     print(f"Final API Request Params for PLOS: {params}")  # Debugging statemen
+    response = http_pool.get(api_url, params=params)
+    response.raise_for_status()
+    data = response.json()
+
+    if isinstance(data, dict) and data.get('statusCode') == 200:
+        return json.loads(data.get('body', "[]"))
+    return []
+
+def fetch_plos_listing(query, page=1, sort="relevance",start_date=None, end_date=None,article_types=None,subject_areas=None):
+    # Raises on failure; scrape_plos_articles turns that into an empty result for the listing
+    if PLOS_LISTING_BACKEND == "lambda":
+        articles = fetch_plos_listing_lambda(query, page, sort, start_date, end_date, article_types, subject_areas)
+    else:
+        # Query the PLOS search API in-process: no browser and no extra Lambda hop
+        articles = search_plos(query, page, sort, start_date, end_date, article_types, subject_areas)
+
+    parsed_articles = []
+    for article in articles:
+        raw_date = article.get('date', 'Date not available')
+        try:
+            formatted_date = datetime.strptime(raw_date, "published %d %b %Y").strftime("%d-%b-%Y")
+        except ValueError:
+            formatted_date = raw_date
+
+        parsed_articles.append({
+            'title': article.get('title', 'Title not available'),
+            'url': article.get('link', 'Link not available'),
+            'authors': article.get('authors', 'Authors not available'),
+            'source': 'PLOS',
+            'date': formatted_date,
+            'doi': article.get('doi', 'DOI not available')
+        })
+
+    return parsed_articles
+
+@profiled("listing.scrape_plos")
+def scrape_plos_articles(query, page=1, sort="relevance",start_date=None, end_date=None,article_types=None,subject_areas=None):
     try:
-        response = requests.get(api_url, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        if isinstance(data, dict) and data.get('statusCode') == 200:
-            articles = json.loads(data.get('body', "[]"))
-            parsed_articles = []
-            for article in articles:
-                raw_date = article.get('date', 'Date not available')
-                try:
-                    formatted_date = datetime.strptime(raw_date, "published %d %b %Y").strftime("%d-%b-%Y")
-                except ValueError:
-                    formatted_date = raw_date
-
-                parsed_articles.append({
-                    'title': article.get('title', 'Title not available'),
-                    'url': article.get('link', 'Link not available'),
-                    'authors': article.get('authors', 'Authors not available'),
-                    'source': 'PLOS',
-                    'date': formatted_date,
-                    'doi': article.get('doi', 'DOI not available')
-                })
-
-            return parsed_articles
-        else:
-            return []
+        return fetch_plos_listing(query, page, sort, start_date, end_date, article_types, subject_areas)
     except requests.exceptions.RequestException as e:
         return []
     except json.JSONDecodeError as e:
         return []
 
-def lambda_handler(event, context):
-    # Extract query parameters
-    query = event.get('queryStringParameters', {}).get('query', '')
-    page = int(event.get('queryStringParameters', {}).get('page', 1))
-    sort = event.get('queryStringParameters', {}).get('sort', 'relevance')
-    start_date = event.get('queryStringParameters', {}).get('start_date', None)
-    end_date = event.get('queryStringParameters', {}).get('end_date', None)
-
+PUBMED_ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+MEDRXIV_PAGE_TITLE = re.compile(rb'<h1[^>]*id="page-title"[^>]*>(.*?)</h1>', re.S)
+# Hit counts drift slowly, so each distinct count is fetched at most this often per container
+COUNT_CACHE_TTL = int(os.environ.get("COUNT_CACHE_TTL", "3600"))
+# Every distinct query and filter combination is a key, so the least recently used are evicted past this many
+COUNT_CACHE_SIZE = int(os.environ.get("COUNT_CACHE_SIZE", "2048"))
+
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+def pubmed_count_term(query, sort='relevance', start_date=None, end_date=None, article_types=None):
+    # E-utilities spelling of the filters scrape_pubmed puts on the search page URL
+    clauses = [f"({query})"]
+    if sort == 'oldest':
+        clauses.append("2008:2025[dp]")
+    else:
+        clauses += ["hasabstract", "free full text[sb]"]
+    if start_date and end_date:
+        clauses.append(f"{start_date.replace('-', '/')}:{end_date.replace('-', '/')}[dp]")
+    known_types = [article_type for article_type in article_types or [] if article_type in PUBMED_ARTICLE_TYPES]
+    if known_types:
+        clauses.append("(" + " OR ".join(f'"{article_type}"[pt]' for article_type in known_types) + ")")
+    return " AND ".join(clauses)
+
+def count_pubmed(query, sort='relevance', start_date=None, end_date=None, article_types=None):
+    # esearch with rettype=count answers with a few bytes of JSON instead of a results page
+    params = {"db": "pubmed", "term": pubmed_count_term(query, sort, start_date, end_date, article_types),
+              "rettype": "count", "retmode": "json"}
+    if os.environ.get("NCBI_API_KEY"):
+        params["api_key"] = os.environ["NCBI_API_KEY"]
+    response = http_pool.get(PUBMED_ESEARCH_URL, params=params, timeout=10)
+    response.raise_for_status()
+    return int(response.json()["esearchresult"]["count"])
+
+def count_biorxiv(query, sort='relevance', start_date=None, end_date=None):
+    # Request a one-result page and stop reading once the "N Results" heading has arrived
+    url = biorxiv_search_url(query, 0, sort, start_date, end_date, numresults=1)
+    head = b""
+    with http_pool.get(url, stream=True, timeout=10) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            head += chunk
+            match = MEDRXIV_PAGE_TITLE.search(head)
+            if match:
+                number = re.search(rb"\d[\d,]*", re.sub(rb"<[^>]+>", b"", match.group(1)))
+                return int(number.group(0).replace(b",", b"")) if number else 0
+    return 0
+
+def cached_count(counter, *args):
+    key = f"count|{counter.__name__}|{json.dumps(args)}"
+    now = time.time()
+    with _count_cache_lock:
+        entry = _count_cache.get(key)
+        if entry and entry[1] > now:
+            _count_cache.move_to_end(key)
+            return entry[0]
+        if entry:
+            del _count_cache[key]
+    try:
+        count = single_flight(key, lambda: counter(*args))
+    except Exception as e:
+        print(f"{counter.__name__} failed: {str(e)}")
+        return None
+    with _count_cache_lock:
+        _count_cache[key] = (count, now + COUNT_CACHE_TTL)
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > COUNT_CACHE_SIZE:
+            _count_cache.popitem(last=False)
+    return count
+
+def count_articles(query, sort="relevance", start_date=None, end_date=None, article_types=None, subject_areas=None, facet_article_types=False):
+    """Hit counts per source, and optionally per requested article type, without fetching any results.
+
+    A source whose count could not be fetched reports None.
+    """
+    cache_key = listing_key(query, 0, sort, start_date, end_date, article_types, subject_areas,
+                            "facets" if facet_article_types else "count")
+    cached = cached_listing(cache_key)
+    if cached is not None:
+        return cached[0]
+
+    jobs = {
+        ("PubMed", None): (count_pubmed, query, sort, start_date, end_date, article_types),
+        ("MedRxiv", None): (count_biorxiv, query, sort, start_date, end_date),
+        ("PLOS", None): (count_plos, query, start_date, end_date, article_types, subject_areas),
+    }
+    if facet_article_types:
+        # medRxiv has no article types, so its facet counts are not meaningful
+        for article_type in article_types or []:
+            jobs[("PubMed", article_type)] = (count_pubmed, query, sort, start_date, end_date, [article_type])
+            jobs[("PLOS", article_type)] = (count_plos, query, start_date, end_date, [article_type], subject_areas)
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = {key: executor.submit(cached_count, *job) for key, job in jobs.items()}
+        counts = {key: future.result() for key, future in futures.items()}
+
+    body = {"counts": {source: count for (source, facet), count in counts.items() if facet is None}}
+    body["total"] = sum(count for count in body["counts"].values() if count is not None)
+    if facet_article_types:
+        facets = {}
+        for (source, facet), count in counts.items():
+            if facet is not None:
+                facets.setdefault(facet, {})[source] = count
+        body["facets"] = {"article_types": facets}
+
+    result = {"statusCode": 200, "body": body}
+    if all(count is not None for count in counts.values()):
+        store_listing(cache_key, result)
+    return result
+
+# Pages fetched per source in one delta run; a source with more new articles than this is caught up next run
+DELTA_MAX_PAGES = int(os.environ.get("DELTA_MAX_PAGES", "5"))
+DELTA_PAGE_SIZE = 10
+
+def iso_date(value):
+    try:
+        return datetime.strptime(value, "%d-%b-%Y").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+def new_articles_from_source(source, fetch_page, first_page, watermark, max_pages):
+    """Page one source newest-first until an article the watermark already covers; returns the newer ones.
+
+    `fetch_page` raises when the source fails, so a failure is never read as an empty page.
+    """
+    fresh = []
+    for page in range(first_page, first_page + max_pages):
+        articles = fetch_page(page)
+        for article in articles:
+            if watermark.has_seen(article) or watermark.is_older(source, iso_date(article.get('date'))):
+                return fresh
+            fresh.append(article)
+        if len(articles) < DELTA_PAGE_SIZE:
+            break
+    return fresh
+
+def search_new_articles(query, start_date=None, end_date=None, article_types=None, subject_areas=None, saved_search=None):
+    """Saved-search delta: only the articles not returned by earlier runs of the same search.
+
+    Each source's first successful run records its page one as the baseline
+    and returns it. A source that fails is listed in failed_sources and left
+    as it was, so its baseline or its new articles come with a later run.
+    """
+    search_id = saved_search_id(query, start_date, end_date, article_types, subject_areas)
+    if saved_search:
+        # The name alone would let a reused name pick up another query's watermark
+        search_id = f"name:{saved_search}:{search_id}"
+
+    def run():
+        store = get_saved_search_store()
+        watermark = store.get(search_id) or Watermark()
+        first_run = watermark.runs == 0
+        # The fetchers raise on failure, unlike the scrape_* wrappers the listing uses
+        sources = {
+            "PubMed": (lambda page: coalesced_scrape(scrape_pubmed, query, page, 'recent', start_date, end_date, article_types), 1),
+            # medRxiv numbers its result pages from 0
+            "MedRxiv": (lambda page: coalesced_scrape(fetch_biorxiv_listing, query, page, 'recent', start_date, end_date), 0),
+            "PLOS": (lambda page: coalesced_scrape(fetch_plos_listing, query, page, 'recent', start_date, end_date, article_types, subject_areas), 1),
+        }
+        with ThreadPoolExecutor() as executor:
+            # Without a baseline nothing is known to be seen, so deeper pages would all come back as new
+            futures = {source: executor.submit(new_articles_from_source, source, fetch_page, first_page, watermark,
+                                               DELTA_MAX_PAGES if watermark.has_baseline(source) else 1)
+                       for source, (fetch_page, first_page) in sources.items()}
+        new_by_source, failed_sources = {}, []
+        for source, future in futures.items():
+            try:
+                new_by_source[source] = future.result()
+            except Exception as e:
+                print(f"{source} delta failed: {str(e)}")
+                failed_sources.append(source)
+        if not new_by_source:
+            return {"statusCode": 502, "body": json.dumps({"error": "Every source failed.", "failed_sources": failed_sources})}
+
+        # The same preprint can show up twice across sources within one run
+        unique, baselined = [], []
+        for source, articles in new_by_source.items():
+            fresh = [article for article in articles if not watermark.has_seen(article)]
+            watermark.mark_seen(fresh)
+            watermark.record_dates(source, (iso_date(article.get('date')) for article in fresh))
+            if not watermark.has_baseline(source):
+                watermark.record_baseline(source)
+                baselined.append(source)
+            unique += fresh
+        watermark.record_run()
+        store.put(search_id, {"query": query, "start_date": start_date, "end_date": end_date,
+                              "article_types": article_types, "subject_areas": subject_areas,
+                              "name": saved_search}, watermark)
+
+        unique.sort(key=lambda article: iso_date(article.get('date')) or "", reverse=True)
+        link_full_text(unique)
+        return {"statusCode": 200, "body": {
+            "articles": unique,
+            "new_count": len(unique),
+            "first_run": first_run,
+            "baselined_sources": baselined,
+            "failed_sources": failed_sources,
+            "watermark": {"last_dates": watermark.last_dates, "runs": watermark.runs},
+        }}
+
+    # Overlapping runs of one saved search would both report the same articles as new
+    return single_flight(f"since|{search_id}", run)
+
+def parse_listing_params(query_params):
+    query_params = query_params or {}
     # Convert comma-separated strings into lists
-    article_types = event.get("queryStringParameters", {}).get('article_types', None)
+    article_types = query_params.get('article_types', None)
     if article_types:
         article_types = [atype.strip() for atype in article_types.split(',')]
 
-    subject_areas = event.get("queryStringParameters", {}).get('subject_areas', None)
+    subject_areas = query_params.get('subject_areas', None)
     if subject_areas:
         subject_areas = [sarea.strip() for sarea in subject_areas.split(',')]
 
-    response_data = scrape_articles_multithreaded(query, page, sort, start_date, end_date, article_types, subject_areas)
+    source_mode = query_params.get('source_mode', 'live')
+    if source_mode not in SOURCE_MODES:
+        source_mode = 'live'
+
+    return {
+        'query': query_params.get('query', ''),
+        'page': int(query_params.get('page', 1)),
+        'sort': query_params.get('sort', 'relevance'),
+        'start_date': query_params.get('start_date', None),
+        'end_date': query_params.get('end_date', None),
+        'article_types': article_types,
+        'subject_areas': subject_areas,
+        'source_mode': source_mode,
+    }
+
+def warmup_steps():
+    return [
+        ("parser", warm_parser),
+        # Starts the parse workers and their bs4 import so the first search doesn't
+        ("parse_pool", lambda: start_parse_workers(parse_pubmed_listing, b"<html></html>")),
+        ("rating_table", lambda: article_url_table.table_status),
+        ("listing_cache", lambda: describe(get_listing_cache())),
+        ("search_index", lambda: describe(get_search_index())),
+        ("identifier_cache", lambda: describe(get_identifier_cache())),
+        ("saved_search_store", lambda: describe(get_saved_search_store())),
+        # Not RANKING_URL: any request to a Lambda function URL, HEAD included, invokes the function
+        ("connections", lambda: open_connections(["https://pubmed.ncbi.nlm.nih.gov/", "https://www.medrxiv.org/",
+                                                  PLOS_SEARCH_API, PUBMED_ESEARCH_URL, IDCONV_URL])),
+    ]
+
+@profiled("listing.handler")
+def lambda_handler(event, context):
+    if is_warmup(event):
+        return run_warmup("listing", warmup_steps())
+    params = parse_listing_params(event.get('queryStringParameters', {}))
+    query, page, sort = params['query'], params['page'], params['sort']
+    start_date, end_date = params['start_date'], params['end_date']
+    article_types, subject_areas, source_mode = params['article_types'], params['subject_areas'], params['source_mode']
+
+    if str(event.get('queryStringParameters', {}).get('count_only', '')).lower() in ('1', 'true'):
+        # Totals only: no result parsing, ranking or rating lookup, and not logged as a search
+        facet_article_types = event.get('queryStringParameters', {}).get('facets') == 'article_types'
+        response_data = count_articles(query, sort, start_date, end_date, article_types, subject_areas, facet_article_types)
+        return {
+            'statusCode': 200,
+            'body': json.dumps(response_data),
+            'headers': {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Methods": "GET, OPTIONS",
+                "Access-Control-Allow-Headers": "*"
+            }
+        }
+
+    if event.get('queryStringParameters', {}).get('mode') == 'since':
+        saved_search = event.get('queryStringParameters', {}).get('saved_search')
+        response_data = search_new_articles(query, start_date, end_date, article_types, subject_areas, saved_search)
+        return {
+            'statusCode': 200,
+            'body': json.dumps(response_data),
+            'headers': {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Methods": "GET, OPTIONS",
+                "Access-Control-Allow-Headers": "*"
+            }
+        }
+
+    log_query(event.get('queryStringParameters', {}))
+
+    if str(event.get('queryStringParameters', {}).get('stream', '')).lower() in ('1', 'true'):
+        # Buffered server-sent events; stream_server.py flushes the same events one by one
+        body = "".join(sse_event(name, data) for name, data in
+                       stream_search_articles(query, page, sort, start_date, end_date, article_types, subject_areas))
+        return {
+            'statusCode': 200,
+            'body': body,
+            'headers': {
+                "Content-Type": "text/event-stream",
+                "Cache-Control": "no-cache",
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Methods": "GET, OPTIONS",
+                "Access-Control-Allow-Headers": "*"
+            }
+        }
+
+    response_data = scrape_articles_multithreaded(query, page, sort, start_date, end_date, article_types, subject_areas, source_mode)
     
     if isinstance(response_data, str):
         body = response_data
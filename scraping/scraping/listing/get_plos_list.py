@@ -1,17 +1,29 @@
+import asyncio
 import json
-from concurrent.futures import ThreadPoolExecutor
-from playwright.sync_api import sync_playwright
+import shutil
+import tempfile
+import threading
+from playwright.async_api import TargetClosedError, async_playwright
 from bs4 import BeautifulSoup
-from math import ceil
+from common.profiling import profiled
+from common.warmup import is_warmup, run_warmup, warm_parser
 
-def fetch_page_content(url: str, context):
+PLOS_SEARCH_URL = "https://journals.plos.org/plosone/search"
+# Tabs opened at once for a `pages` range
+MAX_PARALLEL_PAGES = 10
+
+async def fetch_page_content(url: str, context):
     try:
-        page = context.new_page()
-        page.goto(url, wait_until="domcontentloaded", timeout=5000)
-        page.wait_for_selector("dl#searchResultsList", timeout=5000)
-        html = page.content()
-        page.close()
-        return html
+        page = await context.new_page()
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=5000)
+            await page.wait_for_selector("dl#searchResultsList", timeout=5000)
+            return await page.content()
+        finally:
+            await page.close()
+    except TargetClosedError:
+        # The browser is gone, not just this page; let a shared browser relaunch
+        raise
     except Exception as e:
         print(f"Error loading page: {str(e)}")
         return ""
@@ -47,8 +59,8 @@ def scrape_articles_chunk(article_chunks):
         })
     return articles
 
-def scrape_plos_articles(query: str, page: int = 1, sort: str = "relevance",start_date=None, end_date=None):
-    base_url = f"https://journals.plos.org/plosone/search?filterJournals=PLoSONE"
+def build_search_url(query: str, page: int = 1, sort: str = "relevance", start_date=None, end_date=None) -> str:
+    base_url = f"{PLOS_SEARCH_URL}?filterJournals=PLoSONE"
 
     # Apply date filters if provided
     if start_date and end_date:
@@ -66,69 +78,204 @@ def scrape_plos_articles(query: str, page: int = 1, sort: str = "relevance",star
         sort_order = "RELEVANCE"
     
     # Append sort order to the URL
-    url = f"{base_url}&sortOrder={sort_order}"
-    # Append date filters if they are provided
-    with sync_playwright() as p:
-        browser = p.chromium.launch_persistent_context(
-            user_data_dir="/tmp/playwright",
-            headless=True,
-            args=[
-                "--disable-gpu",
-                "--no-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-setuid-sandbox",
-                "--single-process",
-                "--disable-software-rasterizer"
-            ]
-        )
-        context = browser
-        html = fetch_page_content(url, context)
-        if not html:
-            print("Failed to fetch page content")
-            return []
-         soup = BeautifulSoup(html, 'html.parser')
-        search_results = soup.find('dl', {'id': 'searchResultsList'})
-
-        if not search_results:
-            print("No search results found")
-            return []
-
-        dt_tags = search_results.find_all('dt', {'class': 'search-results-title'})
-        dd_tags = search_results.find_all('dd', recursive=False)
-
-        if not dt_tags or not dd_tags:
-            print("No articles found in search results")
-            return []
-
-        articles_data = list(zip(dt_tags, dd_tags))
-        total_articles = len(articles_data)
-        chunk_sizes = [ceil(total_articles / 3) for _ in range(3)]
-        chunks = [articles_data[start:start + size] for start, size in zip(range(0, total_articles, chunk_sizes[0]), chunk_sizes)]
-
-        articles = []
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            futures = [executor.submit(scrape_articles_chunk, chunk) for chunk in chunks]
-            for future in futures:
-                try:
-                    articles.extend(future.result())
-                except Exception as e:
-                    print(f"Error processing chunk: {str(e)}")
-
-        context.close()
-    return articles
+    return f"{base_url}&sortOrder={sort_order}"
+
+def parse_search_results(html: str):
+    if not html:
+        print("Failed to fetch page content")
+        return []
+    soup = BeautifulSoup(html, 'html.parser')
+    search_results = soup.find('dl', {'id': 'searchResultsList'})
+
+    if not search_results:
+        print("No search results found")
+        return []
+
+    dt_tags = search_results.find_all('dt', {'class': 'search-results-title'})
+    dd_tags = search_results.find_all('dd', recursive=False)
+
+    if not dt_tags or not dd_tags:
+        print("No articles found in search results")
+        return []
+
+    # A results page holds about ten entries; parsing them inline is cheaper
+    # than handing chunks to threads that contend for the GIL
+    return scrape_articles_chunk(zip(dt_tags, dd_tags))
+
+async def launch_context(playwright, single_process: bool = False):
+    # Chromium allows one browser per profile directory, and server workers,
+    # or concurrent unshared scrapes, each launch their own
+    user_data_dir = tempfile.mkdtemp(prefix="playwright-")
+    args = [
+        "--disable-gpu",
+        "--no-sandbox",
+        "--disable-dev-shm-usage",
+        "--disable-setuid-sandbox",
+        "--disable-software-rasterizer"
+    ]
+    if single_process:
+        # Cheapest for a single tab, but Chromium can't run several renderers in one process
+        args.append("--single-process")
+    context = await playwright.chromium.launch_persistent_context(
+        user_data_dir=user_data_dir,
+        headless=True,
+        args=args
+    )
+    context.on("close", lambda _: shutil.rmtree(user_data_dir, ignore_errors=True))
+    return context
+
+async def load_pages(context, query: str, pages, sort: str = "relevance", start_date=None, end_date=None):
+    async def load(idx, page):
+        return idx, await fetch_page_content(build_search_url(query, page, sort, start_date, end_date), context)
+
+    # One tab per results page in the same context; each page is parsed
+    # as soon as it loads and slotted back into page order
+    results = [[] for _ in pages]
+    for loaded in asyncio.as_completed([load(idx, page) for idx, page in enumerate(pages)]):
+        idx, html = await loaded
+        results[idx] = parse_search_results(html)
+    return [article for page_articles in results for article in page_articles]
+
+async def scrape_plos_pages(query: str, pages, sort: str = "relevance", start_date=None, end_date=None):
+    async with async_playwright() as p:
+        context = await launch_context(p, single_process=len(pages) == 1)
+        try:
+            return await load_pages(context, query, pages, sort, start_date, end_date)
+        finally:
+            await context.close()
+
+class SharedBrowser:
+    """One Chromium context kept open on a private event loop for the life of the process.
+
+    Long-running hosts (server/app.py) use it so requests open tabs in a warm
+    browser instead of launching Chromium each time. Concurrent requests and
+    page ranges share it, so it runs multi-process. Playwright objects belong
+    to the loop that created them, hence the dedicated loop thread.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._playwright = None
+        self._context = None
+        self._launching = None
+
+    async def _get_context(self):
+        if self._context is None:
+            if self._launching is None:
+                self._launching = asyncio.ensure_future(self._launch())
+            await asyncio.shield(self._launching)
+        return self._context
+
+    async def _launch(self):
+        try:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            try:
+                context = await launch_context(self._playwright)
+            except Exception:
+                # Don't leave the driver process running behind a failed launch
+                await self._playwright.stop()
+                self._playwright = None
+                raise
+            # A crashed or closed context is relaunched on the next scrape
+            context.on("close", lambda _: self._forget(context))
+            self._context = context
+        finally:
+            self._launching = None
+
+    def _forget(self, context):
+        if self._context is context:
+            self._context = None
+
+    async def _discard(self, context):
+        self._forget(context)
+        try:
+            await context.close()
+        except Exception as e:
+            print(f"Error closing PLOS browser: {str(e)}")
+
+    async def _load(self, query, pages, sort, start_date, end_date):
+        context = await self._get_context()
+        try:
+            return await load_pages(context, query, pages, sort, start_date, end_date)
+        except TargetClosedError as e:
+            print(f"PLOS browser closed, relaunching: {str(e)}")
+            await self._discard(context)
+            return await load_pages(await self._get_context(), query, pages, sort, start_date, end_date)
+
+    def start(self) -> None:
+        """Launch Chromium now rather than on the first scrape."""
+        asyncio.run_coroutine_threadsafe(self._get_context(), self._loop).result()
+
+    def scrape(self, query: str, pages, sort: str = "relevance", start_date=None, end_date=None):
+        future = asyncio.run_coroutine_threadsafe(self._load(query, pages, sort, start_date, end_date), self._loop)
+        return future.result()
+
+    async def _shutdown(self):
+        if self._context is not None:
+            await self._context.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._context = self._playwright = None
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+_shared_browser = None
+
+def use_shared_browser():
+    """Keep one browser for every later scrape in this process; returns it so the host can close it."""
+    global _shared_browser
+    if _shared_browser is None:
+        _shared_browser = SharedBrowser()
+    return _shared_browser
+
+@profiled("plos_list.playwright")
+def scrape_plos_articles(query: str, page: int = 1, sort: str = "relevance",start_date=None, end_date=None, pages=None):
+    pages = list(pages) if pages else [page]
+    if _shared_browser is not None:
+        return _shared_browser.scrape(query, pages, sort, start_date, end_date)
+    return asyncio.run(scrape_plos_pages(query, pages, sort, start_date, end_date))
+
+def parse_pages(value):
+    """Parse a `pages` parameter such as "3" or "2-5" into a range of page numbers."""
+    start, _, end = str(value).partition("-")
+    start = int(start)
+    end = int(end) if end else start
+    if start < 1 or end < start:
+        raise ValueError("Invalid pages parameter. Use a page number or a range such as '2-5'.")
+    if end - start + 1 > MAX_PARALLEL_PAGES:
+        raise ValueError(f"At most {MAX_PARALLEL_PAGES} pages can be loaded in one request.")
+    return range(start, end + 1)
+
+def warmup_steps():
+    # The browser started here stays up, so later invocations of this container reuse it
+    return [
+        ("parser", warm_parser),
+        ("browser", lambda: use_shared_browser().start()),
+    ]
 
+@profiled("plos_list.handler")
 def handler(event, context):
+    if is_warmup(event):
+        return run_warmup("plos_list", warmup_steps())
     query = event.get("queryStringParameters", {}).get("query", "")
     page = event.get("queryStringParameters", {}).get("page", 1)
     sort = event.get("queryStringParameters", {}).get("sort", "relevance").lower()
     start_date = event.get('queryStringParameters', {}).get('start_date', None)
     end_date = event.get('queryStringParameters', {}).get('end_date', None)
+    pages = event.get('queryStringParameters', {}).get('pages', None)
 
     try:
         page = int(page)
+        if pages:
+            pages = parse_pages(pages)
         if page < 1:
             raise ValueError("Page number must be 1 or greater.")
-         if sort not in ["relevance", "recent", "oldest"]:
+        if sort not in ["relevance", "recent", "oldest"]:
             raise ValueError("Invalid sort parameter. Must be 'relevance', 'recent', or 'oldest'.")
 
     except ValueError as e:
@@ -144,7 +291,7 @@ def handler(event, context):
         }
 
     try:
-        results = scrape_plos_articles(query, page, sort,start_date,end_date)
+        results = scrape_plos_articles(query, page, sort,start_date,end_date, pages)
         return {
             "statusCode": 200,
             "body": json.dumps(results)
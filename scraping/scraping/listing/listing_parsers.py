@@ -0,0 +1,132 @@
+"""HTML parsers for the listing scrapers, run on the parse pool (common/parse_pool).
+
+Each takes the raw bytes of one search results page and returns plain dicts,
+so both directions pickle cheaply. Keep this module's imports light: every
+pool worker imports it.
+"""
+import re
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+PUBMED_BASE_URL = "https://pubmed.ncbi.nlm.nih.gov/"
+
+
+def parse_pubmed_listing(html: bytes):
+    """Up to ten articles from a PubMed search results page."""
+    soup = BeautifulSoup(html, "html.parser")
+    total_results = 0
+    results_summary = soup.find('label', class_='of-total-pages')
+    if results_summary:
+        total_results_text = results_summary.get_text(strip=True).replace("of ", "")
+        total_results = int(''.join(filter(str.isdigit, total_results_text)))
+
+    articles = soup.find_all("article", class_="full-docsum")
+    if not articles:
+        return []
+    results = []
+    for article in articles[:10]:
+        pmid = article.find("span", class_="docsum-pmid").get_text(strip=True)
+        pmid_tag = article.find("a", class_="docsum-title")
+        title = pmid_tag.get_text(strip=True) if pmid_tag else "Title not available"
+        authors_tag = article.find("span", class_="docsum-authors")
+        authors = authors_tag.get_text(strip=True) if authors_tag else "Authors not available"
+        doi_tag = article.find("span", class_="docsum-journal-citation")
+        doi = None
+        publication_date = None
+        if doi_tag:
+            doi_text = doi_tag.get_text(strip=True)
+            if "doi:" in doi_text.lower():
+                doi = doi_text.split("doi:")[-1].strip()
+            citation_text = doi_tag.get_text(strip=True)
+            date_match = re.search(r'\b(\d{4} [A-Za-z]{3,4}(?: \d{1,2})?)\b', citation_text)
+            if date_match:
+                raw_date = date_match.group(1)
+                parts = raw_date.split()
+                try:
+                    if len(parts) == 2:
+                        date_str = f"{parts[0]} {parts[1]} 01"
+                    elif len(parts) == 3:
+                        date_str = f"{parts[0]} {parts[1]} {parts[2]}"
+                    else:
+                        raise ValueError
+                    parsed_date = datetime.strptime(date_str, "%Y %b %d")
+                    publication_date = parsed_date.strftime("%d-%b-%Y")
+                except (ValueError, IndexError):
+                    publication_date = None
+        url = f"{PUBMED_BASE_URL}{pmid}/"
+        results.append({
+            "pmid": pmid,
+            "title": title,
+            "authors": authors,
+            "url": url,
+            "doi": doi,
+            "date": publication_date,
+            "source": "PubMed",
+            'total results':total_results
+        })
+    return results
+
+
+def parse_biorxiv_listing(html: bytes):
+    """Articles from a medRxiv search results page."""
+    articles = []
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract total number of results
+    total_results = 0
+    results_summary = soup.find('h1', id='page-title')
+    if results_summary:
+        total_results_text = results_summary.get_text(strip=True)
+        total_results = int(''.join(filter(str.isdigit, total_results_text)))  # Extract only numbers
+
+    # Extract articles
+    article_elements = soup.find_all('div', class_='highwire-article-citation')
+
+    for article in article_elements:
+        title_element = article.find('span', class_='highwire-cite-title')
+        title = title_element.get_text(strip=True) if title_element else "Title not available"
+
+        link_element = article.find('a', class_='highwire-cite-linked-title')
+        link = f"https://www.medrxiv.org{link_element['href']}" if link_element else "Link not available"
+
+        authors_element = article.find('div', class_='highwire-cite-authors')
+        authors = authors_element.get_text(strip=True) if authors_element else "Authors not available"
+
+        metadata_element = article.find('div', class_='highwire-cite-metadata')
+        doi = "DOI not available"
+        formatted_date = "Date not available"
+
+        if metadata_element:
+            doi_element = metadata_element.find('span', class_='highwire-cite-metadata-doi')
+            if doi_element:
+                doi = doi_element.get_text(strip=True).replace('doi:', '').strip()
+                try:
+                    doi_parts = doi.split('/')
+                    if len(doi_parts) > 1:
+                        date_part = doi_parts[-1].split('.')[:3]
+                        if len(date_part) == 3:
+                            raw_date = '-'.join(date_part)
+                            formatted_date = datetime.strptime(raw_date, "%Y-%m-%d").strftime("%d-%b-%Y")
+                except ValueError:
+                    formatted_date = "Date extraction error from DOI"
+
+            date_element = metadata_element.find('span', class_='highwire-cite-metadata-pages')
+            if date_element:
+                raw_date = date_element.get_text(strip=True)
+                try:
+                    formatted_date = datetime.strptime(raw_date, "%d-%b-%Y").strftime("%d-%b-%Y")
+                except ValueError:
+                    pass
+
+        articles.append({
+            'title': title,
+            'url': link,
+            'source': 'MedRxiv',
+            'authors': authors,
+            'doi': doi,
+            'date': formatted_date,
+            'results': total_results
+        })
+
+    return articles
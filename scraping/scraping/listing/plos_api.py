@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from common import http_pool
+
+PLOS_SEARCH_API = "https://api.plos.org/search"
+RESULTS_PER_PAGE = 10
+FIELDS = "id,title_display,author_display,article_type,publication_date,journal"
+
+# article_type values of PLOS ONE articles; the listing's type filter may name these directly
+PLOS_ARTICLE_TYPES = {
+    "Research Article", "Review", "Editorial", "Formal Comment", "Correction", "Retraction",
+    "Expression of Concern", "Perspective", "Viewpoints", "Study Protocol", "Lab Protocol",
+    "Registered Report Protocol", "Collection Review",
+}
+# The PubMed type names the listing also offers, where PLOS ONE has an equivalent
+PUBMED_TYPE_EQUIVALENTS = {
+    "Review": "Review",
+    "Editorial": "Editorial",
+    "Comment": "Formal Comment",
+    "Published Erratum": "Correction",
+}
+
+SORT_ORDERS = {
+    "recent": "publication_date desc",
+    "oldest": "publication_date asc",
+}
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def plos_article_types(article_types: Optional[List[str]]) -> List[str]:
+    """The requested types PLOS knows, mapped from PubMed names; the rest are dropped.
+
+    The listing sends the same types to every source, and filtering PLOS on a
+    PubMed-only type would match nothing.
+    """
+    mapped = [PUBMED_TYPE_EQUIVALENTS.get(t, t) for t in article_types or []]
+    return [t for i, t in enumerate(mapped) if t in PLOS_ARTICLE_TYPES and t not in mapped[:i]]
+
+
+def build_search_params(query: str, page: int = 1, sort: str = "relevance", start_date: Optional[str] = None,
+                        end_date: Optional[str] = None, article_types: Optional[List[str]] = None,
+                        subject_areas: Optional[List[str]] = None) -> Dict:
+    # Same filters the PLOS ONE search page offers: journal, date range, article type, subject area
+    filters = ["journal_key:PLoSONE", "doc_type:full"]
+    if start_date and end_date:
+        filters.append(f"publication_date:[{start_date}T00:00:00Z TO {end_date}T23:59:59Z]")
+    article_types = plos_article_types(article_types)
+    if article_types:
+        filters.append("article_type:(" + " OR ".join(_quote(t) for t in article_types) + ")")
+    if subject_areas:
+        filters.append("subject:(" + " OR ".join(_quote(s) for s in subject_areas) + ")")
+
+    params = {
+        "q": query,
+        "fl": FIELDS,
+        "fq": filters,
+        "rows": RESULTS_PER_PAGE,
+        "start": (max(int(page), 1) - 1) * RESULTS_PER_PAGE,
+        "wt": "json",
+    }
+    if sort in SORT_ORDERS:
+        params["sort"] = SORT_ORDERS[sort]
+    return params
+
+
+def search_plos(query: str, page: int = 1, sort: str = "relevance", start_date: Optional[str] = None,
+                end_date: Optional[str] = None, article_types: Optional[List[str]] = None,
+                subject_areas: Optional[List[str]] = None) -> List[Dict]:
+    """Query the PLOS Solr search API and return articles shaped like get_plos_list.scrape_plos_articles."""
+    params = build_search_params(query, page, sort, start_date, end_date, article_types, subject_areas)
+    response = http_pool.get(PLOS_SEARCH_API, params=params, timeout=10)
+    response.raise_for_status()
+    docs = response.json().get("response", {}).get("docs", [])
+
+    articles = []
+    for doc in docs:
+        doi = doc.get("id")
+        authors = doc.get("author_display") or []
+        raw_date = doc.get("publication_date")
+        try:
+            publication_date = datetime.strptime(raw_date, "%Y-%m-%dT%H:%M:%SZ").strftime("published %d %b %Y")
+        except (TypeError, ValueError):
+            publication_date = "Date not available"
+
+        articles.append({
+            'title': doc.get("title_display") or "Title not available",
+            'link': f"https://journals.plos.org/plosone/article?id={doi}" if doi else "Link not available",
+            'authors': ", ".join(authors) if authors else "Authors not available",
+            'type': doc.get("article_type") or "Type not available",
+            'date': publication_date,
+            'doi': f"https://doi.org/{doi}" if doi else "DOI not available",
+            'source': "PLOS ONE"
+        })
+    return articles
+
+
+def count_plos(query: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+               article_types: Optional[List[str]] = None, subject_areas: Optional[List[str]] = None) -> int:
+    """Number of PLOS ONE articles matching the search, without fetching any documents."""
+    params = build_search_params(query, 1, "relevance", start_date, end_date, article_types, subject_areas)
+    params.update({"rows": 0, "fl": "id", "start": 0})
+    response = http_pool.get(PLOS_SEARCH_API, params=params, timeout=10)
+    response.raise_for_status()
+    return int(response.json().get("response", {}).get("numFound", 0))
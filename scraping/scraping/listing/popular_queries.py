@@ -0,0 +1,118 @@
+"""Scheduled prewarmer: re-run the most frequent listing searches into the listing cache.
+
+Run it from an EventBridge schedule before peak hours. Popular searches come
+from the query log (see common/query_log.py); every search is re-run for its
+first PREWARM_PAGES pages and most used sort orders, one search at a time and
+no faster than each upstream's rate limit allows, until PREWARM_BUDGET_SECONDS
+or PREWARM_MAX_SEARCHES is used up. The event may override any of
+top_n, pages, sorts_per_query, window_hours, budget_seconds and max_searches.
+"""
+import json
+import os
+import threading
+import time
+
+from common.listing_cache import LISTING_CACHE_TTL, cached_listing, get_listing_cache, listing_key
+from common.query_log import popular_searches, read_query_log
+from common.warmup import is_warmup, run_warmup
+from filter import warm_listing, warmup_steps
+
+# Minimum seconds between requests to each upstream; every warmed search hits all of them once
+UPSTREAM_MIN_INTERVAL = {
+    "pubmed": float(os.environ.get("PREWARM_PUBMED_INTERVAL", "1.0")),
+    "medrxiv": float(os.environ.get("PREWARM_MEDRXIV_INTERVAL", "2.0")),
+    "plos": float(os.environ.get("PREWARM_PLOS_INTERVAL", "1.0")),
+}
+# Entries younger than this are left alone
+REFRESH_AFTER = int(os.environ.get("PREWARM_REFRESH_AFTER", str(LISTING_CACHE_TTL // 2)))
+# Time kept back from the Lambda deadline for the last search to finish
+DEADLINE_MARGIN_SECONDS = 60
+
+
+class RateLimiter:
+    def __init__(self, min_interval: float):
+        self._min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self._min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _split(value):
+    return [item.strip() for item in value.split(",")] if value else None
+
+
+def prewarm_popular_queries(top_n=20, pages=1, sorts_per_query=2, window_hours=168, budget_seconds=600,
+                            max_searches=50, deadline=None):
+    """Warm the listing cache for popular searches; returns a summary of what was done."""
+    started = time.monotonic()
+    stop_at = started + budget_seconds
+    if deadline is not None:
+        stop_at = min(stop_at, deadline - DEADLINE_MARGIN_SECONDS)
+    limiters = {upstream: RateLimiter(interval) for upstream, interval in UPSTREAM_MIN_INTERVAL.items()}
+
+    records = read_query_log(time.time() - window_hours * 3600)
+    summary = {"logged_requests": len(records), "warmed": 0, "fresh": 0, "failed": 0, "skipped_budget": 0}
+    durations = []
+
+    for params, sorts in popular_searches(records, top_n, sorts_per_query):
+        for sort in sorts:
+            for page in range(1, pages + 1):
+                args = (params["query"], page, sort, params.get("start_date"), params.get("end_date"),
+                        _split(params.get("article_types")), _split(params.get("subject_areas")), "live")
+                cached = cached_listing(listing_key(*args))
+                if cached is not None and time.time() - cached[1] < REFRESH_AFTER:
+                    summary["fresh"] += 1
+                    continue
+
+                # Leave room for a search as slow as the slowest so far
+                expected = max(durations, default=0)
+                if summary["warmed"] + summary["failed"] >= max_searches or time.monotonic() + expected > stop_at:
+                    summary["skipped_budget"] += 1
+                    continue
+
+                for limiter in limiters.values():
+                    limiter.wait()
+                search_started = time.monotonic()
+                try:
+                    result = warm_listing(*args)
+                    ok = isinstance(result, dict) and result.get("statusCode") == 200
+                except Exception as e:
+                    print(f"Prewarm search failed for {params['query']!r}: {str(e)}")
+                    ok = False
+                durations.append(time.monotonic() - search_started)
+                summary["warmed" if ok else "failed"] += 1
+
+    summary["elapsed_seconds"] = round(time.monotonic() - started, 1)
+    return summary
+
+
+def handler(event, context):
+    event = event or {}
+    if is_warmup(event):
+        # Same dependencies as the listing handler
+        return run_warmup("popular_queries", warmup_steps())
+    if get_listing_cache() is None:
+        return {"statusCode": 400, "body": json.dumps({"error": "LISTING_CACHE is not configured; nothing to warm."})}
+
+    deadline = None
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000.0
+
+    summary = prewarm_popular_queries(
+        top_n=int(event.get("top_n", os.environ.get("PREWARM_TOP_QUERIES", "20"))),
+        pages=int(event.get("pages", os.environ.get("PREWARM_PAGES", "1"))),
+        sorts_per_query=int(event.get("sorts_per_query", os.environ.get("PREWARM_SORTS_PER_QUERY", "2"))),
+        window_hours=float(event.get("window_hours", os.environ.get("QUERY_LOG_WINDOW_HOURS", "168"))),
+        budget_seconds=float(event.get("budget_seconds", os.environ.get("PREWARM_BUDGET_SECONDS", "600"))),
+        max_searches=int(event.get("max_searches", os.environ.get("PREWARM_MAX_SEARCHES", "50"))),
+        deadline=deadline,
+    )
+    print(f"Popular-query prewarm: {json.dumps(summary)}")
+    return {"statusCode": 200, "body": json.dumps(summary)}
@@ -0,0 +1,76 @@
+"""Serve progressive listing results as server-sent events.
+
+GET /search?query=...&page=...&sort=... answers with text/event-stream and
+flushes each event from `filter.stream_search_articles` as soon as it is
+produced. Run it locally, or behind the AWS Lambda Web Adapter with a
+function URL in RESPONSE_STREAM invoke mode to stream from Lambda:
+
+    python stream_server.py --port 8080
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from filter import parse_listing_params, sse_event, stream_search_articles
+from common.query_log import log_query
+
+
+class ListingStreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _headers(self, status, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "*")
+
+    def do_OPTIONS(self):
+        self._headers(200, "text/plain")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path.rstrip("/") not in ("/search", ""):
+            self._headers(404, "text/plain")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        query_params = dict(parse_qsl(parts.query))
+        params = parse_listing_params(query_params)
+        log_query(query_params)
+
+        self._headers(200, "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = stream_search_articles(params["query"], params["page"], params["sort"], params["start_date"],
+                                        params["end_date"], params["article_types"], params["subject_areas"])
+        try:
+            for name, data in events:
+                self._chunk(sse_event(name, data).encode("utf-8"))
+            self._chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away; stop producing events
+            events.close()
+
+    def _chunk(self, payload: bytes):
+        self.wfile.write(f"{len(payload):X}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), ListingStreamHandler)
+    server.daemon_threads = True
+    print(f"Listing stream listening on http://{args.host}:{args.port}/search")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Replay API Gateway events against the Lambda handlers in-process and report latency.
+
+Every outbound `requests` call (and the Playwright PLOS search page) is
+redirected to the local upstream stub, so runs are repeatable and never touch
+the real sites. DynamoDB is still reached through boto3; point it at a local
+endpoint with AWS_ENDPOINT_URL_DYNAMODB.
+
+    python replay.py --recordings ./recordings --events events.jsonl --concurrency 8 --rate 20
+    python replay.py --recordings ./recordings --synthetic listing --count 200 --latency-ms 400
+
+Each line of an events file is {"target": "<name>", "event": {...API Gateway event...}}.
+
+Targets run one after another in this process. Per target, rss_peak_mb and
+rss_growth_mb come from sampling RSS during its run; process_peak_rss_mb is
+the process high-water mark so far.
+"""
+import argparse
+import importlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+for path in (ROOT, os.path.join(ROOT, "listing"), os.path.join(ROOT, "get_abstract"), os.path.join(ROOT, "full_text"), HERE):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from upstream_stub import StubConfig, start_stub
+
+# target name -> (module, handler function)
+TARGETS = {
+    "listing": ("filter", "lambda_handler"),
+    "plos_listing": ("get_plos_list", "handler"),
+    "abstract": ("all_abstracts", "lambda_handler"),
+    "fulltext_pubmed": ("pubmed_full", "lambda_handler"),
+    "fulltext_medrxiv": ("bioRxiv_full", "lambda_handler"),
+    "fulltext_plos": ("plos_full", "lambda_handler"),
+}
+
+SAMPLE_QUERIES = ["diabetes", "covid-19 vaccine", "asthma children", "hypertension", "sepsis biomarkers"]
+SAMPLE_ARTICLES = {
+    "pubmed": "https://pubmed.ncbi.nlm.nih.gov/33301246/",
+    "medrxiv": "https://www.medrxiv.org/content/10.1101/2020.12.14.20248168v1",
+    "plos": "https://journals.plos.org/plosone/article?id=10.1371/journal.pone.0247461",
+}
+SAMPLE_FULL_TEXT = {
+    "fulltext_pubmed": "https://pmc.ncbi.nlm.nih.gov/articles/PMC7745181/",
+    "fulltext_medrxiv": "https://www.medrxiv.org/content/10.1101/2020.12.14.20248168v1.full-text",
+    "fulltext_plos": "https://journals.plos.org/plosone/article?id=10.1371/journal.pone.0247461",
+}
+
+
+def redirect_upstreams(stub_base: str) -> None:
+    """Send every non-local HTTP request to the stub as /<host>/<path>?<query>."""
+    original_request = requests.sessions.Session.request
+
+    def request(self, method, url, *args, **kwargs):
+        parts = urlsplit(url)
+        if parts.hostname not in ("127.0.0.1", "localhost"):
+            url = f"{stub_base}/{parts.netloc}{parts.path or '/'}" + (f"?{parts.query}" if parts.query else "")
+        return original_request(self, method, url, *args, **kwargs)
+
+    requests.sessions.Session.request = request
+    try:
+        get_plos_list = importlib.import_module("get_plos_list")
+        get_plos_list.PLOS_SEARCH_URL = f"{stub_base}/journals.plos.org/plosone/search"
+    except ImportError as e:
+        print(f"PLOS listing target unavailable: {str(e)}")
+
+
+def synthetic_events(target: str, count: int) -> List[Dict]:
+    events = []
+    for i in range(count):
+        if target in ("listing", "plos_listing"):
+            params = {"query": SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)], "page": "1", "sort": "relevance"}
+        elif target == "abstract":
+            source = list(SAMPLE_ARTICLES)[i % len(SAMPLE_ARTICLES)]
+            params = {"source": source, "url": SAMPLE_ARTICLES[source]}
+        else:
+            params = {"url": SAMPLE_FULL_TEXT[target]}
+        events.append({"target": target, "event": {"httpMethod": "GET", "queryStringParameters": params}})
+    return events
+
+
+def load_events(path: str, default_target: Optional[str] = None) -> List[Dict]:
+    events = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "event" not in record:
+                # A bare API Gateway event; needs --target
+                record = {"target": default_target, "event": record}
+            events.append(record)
+    return events
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process right now, from /proc (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class RssSampler:
+    """Polls current RSS while a target runs.
+
+    ru_maxrss is the high-water mark of the whole process, so after the first
+    target it mostly reports earlier targets (and the imports); the peak seen
+    here belongs to this target alone.
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.start_mb = self.peak_mb = current_rss_mb()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def _status_of(response) -> int:
+    if isinstance(response, dict) and isinstance(response.get("statusCode"), int):
+        return response["statusCode"]
+    return 200
+
+
+def run_scenario(target: str, events: List[Dict], concurrency: int, rate: Optional[float]) -> Dict:
+    """Drive one handler. With `rate` arrivals are open-loop at that many per second
+    and latency includes time spent waiting for a free worker."""
+    module_name, function_name = TARGETS[target]
+    handler = getattr(importlib.import_module(module_name), function_name)
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def invoke(event, scheduled_at):
+        try:
+            status = str(_status_of(handler(event, None)))
+        except Exception as e:
+            status = f"exception:{type(e).__name__}"
+        elapsed = time.perf_counter() - scheduled_at
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i, record in enumerate(events):
+            scheduled_at = started + (i / rate if rate else 0)
+            if rate:
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled_at = time.perf_counter()
+            executor.submit(invoke, record["event"], scheduled_at)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+    report = {
+        "target": target,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "statuses": statuses,
+        # ru_maxrss is KiB on Linux, and covers every target run so far
+        "process_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if rss.start_mb is not None:
+        report["rss_start_mb"] = round(rss.start_mb, 1)
+        report["rss_peak_mb"] = round(rss.peak_mb, 1)
+        report["rss_growth_mb"] = round(rss.peak_mb - rss.start_mb, 1)
+    if tracemalloc.is_tracing():
+        report["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+    return report
+
+
+def group_by_target(events: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    grouped: Dict[str, List[Dict]] = {}
+    for record in events:
+        if record.get("target") not in TARGETS:
+            raise ValueError(f"Unknown target {record.get('target')!r}. Choose from {', '.join(TARGETS)}.")
+        grouped.setdefault(record["target"], []).append(record)
+    return grouped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recordings", required=True, help="directory of recorded upstream responses")
+    parser.add_argument("--events", help="JSONL file of recorded events")
+    parser.add_argument("--target", choices=sorted(TARGETS), help="target for bare events in --events")
+    parser.add_argument("--synthetic", choices=sorted(TARGETS), action="append", help="generate events for a target")
+    parser.add_argument("--count", type=int, default=100, help="synthetic events per target")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, help="arrivals per second (default: as fast as workers allow)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="stub latency per upstream request")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of stub responses that fail")
+    parser.add_argument("--trace-memory", action="store_true", help="report tracemalloc peak per target (slower)")
+    parser.add_argument("--keep-caches", action="store_true", help="leave the article store and search index enabled")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    if not args.keep_caches:
+        # Stored articles would turn every repeat into a cache hit and hide parse cost
+        os.environ.setdefault("ARTICLE_STORE_BACKEND", "none")
+        os.environ.setdefault("SEARCH_INDEX", "off")
+
+    events: List[Dict] = []
+    if args.events:
+        events += load_events(args.events, args.target)
+    for target in args.synthetic or []:
+        events += synthetic_events(target, args.count)
+    if not events:
+        parser.error("provide --events or --synthetic")
+
+    stub = start_stub(StubConfig(args.recordings, args.latency_ms, args.jitter_ms, args.error_rate))
+    redirect_upstreams(f"http://127.0.0.1:{stub.server_address[1]}")
+    if args.trace_memory:
+        tracemalloc.start()
+
+    reports = [run_scenario(target, target_events, args.concurrency, args.rate)
+               for target, target_events in group_by_target(events).items()]
+
+    print(f"{'target':<18}{'reqs':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}{'rss +MB':>9}")
+    for report in reports:
+        print(f"{report['target']:<18}{report['requests']:>6}{report['throughput_rps']:>9}{report['p50_ms']:>10}"
+              f"{report['p95_ms']:>10}{report['p99_ms']:>10}{report['error_rate']:>9.2%}{report.get('rss_growth_mb', '-'):>9}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Local stand-in for PubMed, medRxiv, PLOS and the ranking Lambda URL.
+
+Requests arrive as http://127.0.0.1:<port>/<upstream host>/<path>?<query> and
+are answered from recordings laid out as <recordings>/<host>/<key>.html, where
+<key> is `recording_key(path, query)`. <recordings>/<host>/default.html (or
+default.json) answers anything not recorded for that host.
+
+    python upstream_stub.py serve --recordings ./recordings --latency-ms 300 --error-rate 0.02
+    python upstream_stub.py record https://pubmed.ncbi.nlm.nih.gov/?term=asthma --recordings ./recordings
+"""
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
+
+
+def recording_key(path: str, query: str = "") -> str:
+    return hashlib.sha1(f"{path}?{query}".encode("utf-8")).hexdigest()[:16]
+
+
+class StubConfig:
+    def __init__(self, recordings: str, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 error_status: int = 503):
+        self.recordings = recordings
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def lookup(self, host: str, path: str, query: str) -> Optional[Tuple[str, bytes]]:
+        host_dir = os.path.join(self.recordings, host)
+        for name in (recording_key(path, query), "default"):
+            for ext, content_type in ((".html", "text/html; charset=utf-8"), (".json", "application/json")):
+                candidate = os.path.join(host_dir, name + ext)
+                if os.path.exists(candidate):
+                    with open(candidate, "rb") as f:
+                        return content_type, f.read()
+        return None
+
+
+def _make_handler(config: StubConfig):
+    class UpstreamStubHandler(BaseHTTPRequestHandler):
+        def _serve(self):
+            delay = config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+            if delay > 0:
+                time.sleep(delay / 1000.0)
+
+            if config.error_rate and random.random() < config.error_rate:
+                self.send_response(config.error_status)
+                self.end_headers()
+                return
+
+            parts = urlsplit(self.path)
+            host, _, path = parts.path.lstrip("/").partition("/")
+            found = config.lookup(host, "/" + path, parts.query)
+            if found is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            content_type, body = found
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._serve()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            self._serve()
+
+        def log_message(self, format, *args):
+            pass
+
+    return UpstreamStubHandler
+
+
+def start_stub(config: StubConfig, port: int = 0) -> ThreadingHTTPServer:
+    """Serve the stub on a background thread; port 0 picks a free port (see server.server_address)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def record(url: str, recordings: str) -> str:
+    """Fetch `url` from the real upstream and save it where the stub will look for it."""
+    parts = urlsplit(url)
+    response = requests.get(url, headers={"User-Agent": USER_AGENT})
+    response.raise_for_status()
+    ext = ".json" if "json" in response.headers.get("Content-Type", "") else ".html"
+    host_dir = os.path.join(recordings, parts.netloc)
+    os.makedirs(host_dir, exist_ok=True)
+    path = os.path.join(host_dir, recording_key(parts.path or "/", parts.query) + ext)
+    with open(path, "wb") as f:
+        f.write(response.content)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve")
+    serve.add_argument("--recordings", required=True)
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--latency-ms", type=float, default=0)
+    serve.add_argument("--jitter-ms", type=float, default=0)
+    serve.add_argument("--error-rate", type=float, default=0)
+    serve.add_argument("--error-status", type=int, default=503)
+
+    rec = sub.add_parser("record")
+    rec.add_argument("urls", nargs="+")
+    rec.add_argument("--recordings", required=True)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        for url in args.urls:
+            print(record(url, args.recordings))
+        return
+
+    config = StubConfig(args.recordings, args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _make_handler(config))
+    print(f"Upstream stub listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Single-process ASGI host for every handler, for container deployments.
+
+Each route builds an API Gateway (REST, proxy integration) event from the
+HTTP request and calls the unchanged Lambda handler on a thread pool, so the
+handlers see exactly what they see on Lambda. Everything a worker process
+holds is shared across routes: the HTTP connection pool (common/http_pool),
+the article store, search index and listing cache (SQLite files, which
+several workers can share), and one Chromium for the PLOS search page.
+With PREWARM_QUEUE=sqlite each worker also drains the local prewarm queue.
+/fulltext dispatches to the extractors in-process instead of invoking
+Lambdas, and its async jobs run on a local worker pool.
+
+    cd scraping/scraping && uvicorn server.app:app --workers 4 --port 8000
+    python server/app.py --workers 4 --port 8000
+
+Routes:
+    GET /listing            listing/filter.lambda_handler
+    GET /listing/stream     server-sent events from filter.stream_search_articles
+    GET /listing/plos       listing/get_plos_list.handler
+    GET /abstract           get_abstract/all_abstracts.lambda_handler
+    GET /fulltext           full_text/dispatcher.lambda_handler
+    GET /fulltext/<source>  the pubmed, medrxiv and plos extractors directly
+    GET /health
+"""
+import asyncio
+import base64
+import importlib
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+for path in (ROOT, os.path.join(ROOT, "listing"), os.path.join(ROOT, "get_abstract"), os.path.join(ROOT, "full_text")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Server defaults; explicit environment settings win
+os.environ.setdefault("JOB_RUNNER", "local")
+os.environ.setdefault("LISTING_CACHE", "sqlite")
+
+from common.prewarm import SQLitePrewarmQueue, get_prewarm_queue  # noqa: E402
+from common.query_log import log_query  # noqa: E402
+
+# path -> (module, handler function)
+ROUTES = {
+    "/listing": ("filter", "lambda_handler"),
+    "/listing/plos": ("get_plos_list", "handler"),
+    "/abstract": ("all_abstracts", "lambda_handler"),
+    "/fulltext": ("dispatcher", "lambda_handler"),
+    "/fulltext/pubmed": ("pubmed_full", "lambda_handler"),
+    "/fulltext/medrxiv": ("bioRxiv_full", "lambda_handler"),
+    "/fulltext/plos": ("plos_full", "lambda_handler"),
+}
+# Dispatcher source -> route of its extractor
+EXTRACTOR_ROUTES = {"pubmed": "/fulltext/pubmed", "medrxiv": "/fulltext/medrxiv", "plos": "/fulltext/plos"}
+STREAM_ROUTE = "/listing/stream"
+
+# Handlers block on upstream I/O, so the pool is sized for waiting, not for cores
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", "32"))
+# Reported to handlers through context.get_remaining_time_in_millis()
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("SERVER_REQUEST_TIMEOUT", "120"))
+
+
+class LocalContext:
+    """The parts of the Lambda context object the handlers use."""
+
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.aws_request_id = uuid.uuid4().hex
+        self._deadline = time.monotonic() + REQUEST_TIMEOUT_SECONDS
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def api_gateway_event(scope: Dict, body: bytes) -> Dict:
+    headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+    try:
+        text_body, is_base64 = body.decode("utf-8"), False
+    except UnicodeDecodeError:
+        text_body, is_base64 = base64.b64encode(body).decode("ascii"), True
+    return {
+        "resource": scope["path"],
+        "path": scope["path"],
+        "httpMethod": scope["method"],
+        "headers": headers,
+        # API Gateway sends null without a query string; several handlers call .get on it
+        "queryStringParameters": dict(parse_qsl(scope.get("query_string", b"").decode("latin-1"))),
+        "body": text_body if body else None,
+        "isBase64Encoded": is_base64,
+        "requestContext": {
+            "httpMethod": scope["method"],
+            "path": scope["path"],
+            "requestId": uuid.uuid4().hex,
+            "stage": "local",
+        },
+    }
+
+
+def http_response(result) -> Tuple[int, Dict[str, str], bytes]:
+    """Turn a proxy-integration result into (status, headers, body bytes)."""
+    if not isinstance(result, dict) or "statusCode" not in result:
+        return 200, {"Content-Type": "application/json"}, json.dumps(result).encode("utf-8")
+    headers = {"Content-Type": "application/json", **(result.get("headers") or {})}
+    body = result.get("body", "")
+    if result.get("isBase64Encoded"):
+        payload = base64.b64decode(body)
+    elif isinstance(body, (bytes, bytearray)):
+        payload = bytes(body)
+    else:
+        # The full-text extractors return their block list unencoded
+        payload = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+    return int(result["statusCode"]), headers, payload
+
+
+class HandlerHost:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=SERVER_THREADS, thread_name_prefix="handler")
+        self.handlers = {}
+        self.unavailable = {}
+        self.browser = None
+        self.filter = None
+
+    def load(self) -> None:
+        for route, (module_name, function_name) in ROUTES.items():
+            try:
+                self.handlers[route] = getattr(importlib.import_module(module_name), function_name)
+            except ImportError as e:
+                # e.g. Playwright missing: that route answers 503, the rest keep working
+                self.unavailable[route] = str(e)
+                print(f"Route {route} unavailable: {str(e)}")
+
+        self.filter = sys.modules.get("filter")
+        if self.filter is not None and "/abstract" in self.handlers:
+            # Abstracts for the reranking cascade come from the in-process handler
+            self.filter.use_local_abstracts(self.handlers["/abstract"])
+        dispatcher = sys.modules.get("dispatcher")
+        if dispatcher is not None:
+            dispatcher.use_local_extractors({source: self.handlers[route]
+                                             for source, route in EXTRACTOR_ROUTES.items() if route in self.handlers})
+        prewarm_queue = get_prewarm_queue()
+        if isinstance(prewarm_queue, SQLitePrewarmQueue):
+            # PREWARM_QUEUE=sqlite: listing searches queue their top results here, and only this host can drain it
+            from prewarm_worker import prewarm_article
+            prewarm_queue.start_draining(prewarm_article)
+        get_plos_list = sys.modules.get("get_plos_list")
+        if get_plos_list is not None and os.environ.get("SERVER_SHARED_BROWSER", "on").lower() != "off":
+            # Launched on first use, then reused by every PLOS search page request
+            self.browser = get_plos_list.use_shared_browser()
+
+    def close(self) -> None:
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception as e:
+                print(f"Browser shutdown failed: {str(e)}")
+        self.executor.shutdown(wait=False)
+
+    async def call(self, route: str, event: Dict):
+        loop = asyncio.get_running_loop()
+        module_name, _ = ROUTES[route]
+        return await loop.run_in_executor(self.executor, self.handlers[route], event, LocalContext(module_name))
+
+
+host = HandlerHost()
+
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def send_response(send, status: int, headers: Dict[str, str], body: bytes) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin-1"), str(value).encode("latin-1")) for name, value in headers.items()],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def stream_listing(scope: Dict, send) -> None:
+    loop = asyncio.get_running_loop()
+    query_params = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+    params = host.filter.parse_listing_params(query_params)
+    log_query(query_params)
+    events = host.filter.stream_search_articles(params["query"], params["page"], params["sort"], params["start_date"],
+                                                params["end_date"], params["article_types"], params["subject_areas"])
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+                    (b"access-control-allow-origin", b"*")],
+    })
+    try:
+        while True:
+            # Each step may block on an upstream, so it runs on the handler pool
+            item = await loop.run_in_executor(host.executor, next, events, None)
+            if item is None:
+                break
+            await send({"type": "http.response.body", "body": host.filter.sse_event(*item).encode("utf-8"), "more_body": True})
+    finally:
+        events.close()
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                host.load()
+                await send({"type": "lifespan.startup.complete"})
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+        elif message["type"] == "lifespan.shutdown":
+            host.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"].rstrip("/") or "/"
+    body = await read_body(receive)
+    if path == "/health":
+        await send_response(send, 200, {"Content-Type": "application/json"},
+                            json.dumps({"status": "ok", "unavailable": host.unavailable}).encode("utf-8"))
+    elif path == STREAM_ROUTE and host.filter is not None:
+        await stream_listing(scope, send)
+    elif path in host.handlers:
+        try:
+            result = await host.call(path, api_gateway_event(dict(scope, path=path), body))
+            await send_response(send, *http_response(result))
+        except Exception as e:
+            await send_response(send, 500, {"Content-Type": "application/json"},
+                                json.dumps({"error": f"Internal server error: {str(e)}"}).encode("utf-8"))
+    elif path in host.unavailable:
+        await send_response(send, 503, {"Content-Type": "application/json"},
+                            json.dumps({"error": host.unavailable[path]}).encode("utf-8"))
+    else:
+        await send_response(send, 404, {"Content-Type": "application/json"},
+                            json.dumps({"error": "Not found"}).encode("utf-8"))
+
+
+def main(argv: Optional[list] = None) -> None:
+    import argparse
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")),
+                        help="worker processes, each with its own pools and browser")
+    args = parser.parse_args(argv)
+    uvicorn.run("server.app:app", host=args.host, port=args.port, workers=args.workers, app_dir=ROOT)
+
+
+if __name__ == "__main__":
+    main()
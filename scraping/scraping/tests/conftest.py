@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "listing"), os.path.join(ROOT, "get_abstract"), os.path.join(ROOT, "full_text")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,134 @@
+import json
+import os
+import socket
+import time
+
+import pytest
+
+from common import http_pool, identifiers
+from loadtest.upstream_stub import StubConfig, start_stub
+
+# Recorded ID Converter answer, served for every request to its host
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+IDCONV_PATH = "/pmc.ncbi.nlm.nih.gov/tools/idconv/api/v1/articles/"
+
+
+@pytest.fixture
+def idconv_requests(monkeypatch, tmp_path):
+    """A fresh SQLite identifier cache, and the params of every ID Converter request made."""
+    monkeypatch.setenv("ID_CACHE_BACKEND", "sqlite")
+    monkeypatch.setenv("ID_CACHE_PATH", str(tmp_path / "identifiers.sqlite3"))
+    monkeypatch.setattr(identifiers, "_cache", None)
+    requests_made = []
+    real_get = http_pool.get
+
+    def get(url, **kwargs):
+        requests_made.append(kwargs.get("params"))
+        return real_get(url, **kwargs)
+
+    monkeypatch.setattr(http_pool, "get", get)
+    return requests_made
+
+
+@pytest.fixture
+def stub_config(monkeypatch, idconv_requests):
+    """The stub's settings; set error_rate to 1 to have NCBI answer with error_status."""
+    config = StubConfig(RECORDINGS, error_status=500)
+    stub = start_stub(config)
+    monkeypatch.setattr(identifiers, "IDCONV_URL", f"http://127.0.0.1:{stub.server_address[1]}{IDCONV_PATH}")
+    yield config
+    stub.shutdown()
+
+
+@pytest.fixture
+def idconv_unreachable(monkeypatch, idconv_requests):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(identifiers, "IDCONV_URL", f"http://127.0.0.1:{port}{IDCONV_PATH}")
+
+
+def test_one_request_per_identifier_kind(stub_config, idconv_requests):
+    records = identifiers.resolve_identifiers(["33301246", "10.1056/NEJMoa2034577", "PMID: 32109013", "not an id"])
+    assert sorted((params["idtype"], params["ids"]) for params in idconv_requests) == [
+        ("doi", "10.1056/nejmoa2034577"), ("pmid", "32109013,33301246")]
+    assert records["33301246"] == {"pmid": "33301246", "pmcid": "PMC7745181", "doi": "10.1056/nejmoa2034577"}
+    assert records["PMID: 32109013"]["pmcid"] == "PMC7092819"
+    assert "not an id" not in records
+
+
+def test_batches_are_capped(stub_config, idconv_requests, monkeypatch):
+    monkeypatch.setattr(identifiers, "IDCONV_BATCH_SIZE", 2)
+    identifiers.resolve_identifiers(["33301246", "32109013", "1"])
+    assert [len(params["ids"].split(",")) for params in idconv_requests] == [2, 1]
+
+
+def test_every_identifier_of_a_record_is_cached(stub_config, idconv_requests):
+    identifiers.resolve_identifiers(["33301246"])
+    records = identifiers.resolve_identifiers(["PMC7745181", "https://doi.org/10.1056/NEJMoa2034577",
+                                               "https://pubmed.ncbi.nlm.nih.gov/33301246/"])
+    assert len(idconv_requests) == 1
+    assert [record["pmcid"] for record in records.values()] == ["PMC7745181"] * 3
+
+
+def test_misses_expire_sooner(stub_config, idconv_requests, monkeypatch):
+    records = identifiers.resolve_identifiers(["1", "33301246"])
+    assert records["1"] == {} and records["33301246"]["pmcid"] == "PMC7745181"
+    later = time.time() + identifiers.ID_CACHE_MISS_TTL + 60
+    monkeypatch.setattr(identifiers.time, "time", lambda: later)
+    identifiers.resolve_identifiers(["1", "33301246"])
+    # Only the miss is converted again
+    assert [params["ids"] for params in idconv_requests] == ["1,33301246", "1"]
+
+
+def test_failures_are_left_out_and_not_cached(stub_config, idconv_requests):
+    stub_config.error_rate = 1.0
+    assert identifiers.resolve_identifiers(["33301246"]) == {}
+    stub_config.error_rate = 0.0
+    assert identifiers.resolve_identifiers(["33301246"])["33301246"]["pmcid"] == "PMC7745181"
+    assert len(idconv_requests) == 2
+
+
+def test_strict_raises_502_when_ncbi_errors(stub_config):
+    stub_config.error_rate = 1.0
+    with pytest.raises(identifiers.IdentifierLookupError) as raised:
+        identifiers.resolve_identifiers(["33301246"], strict=True)
+    assert raised.value.status_code == 502
+
+
+def test_strict_raises_503_when_ncbi_is_unreachable(idconv_unreachable):
+    with pytest.raises(identifiers.IdentifierLookupError) as raised:
+        identifiers.full_text_target("33301246")
+    assert raised.value.status_code == 503
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    pytest.importorskip("boto3")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    import dispatcher
+    # The extractor echoes what it was asked for
+    monkeypatch.setitem(dispatcher._local_extractors, "pubmed", lambda event, context: event["queryStringParameters"])
+    return dispatcher
+
+
+def dispatch(dispatcher, identifier):
+    response = dispatcher.lambda_handler({"queryStringParameters": {"id": identifier}}, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_dispatcher_resolves_id(dispatcher, stub_config):
+    assert dispatch(dispatcher, "33301246") == (200, {"url": "https://pmc.ncbi.nlm.nih.gov/articles/PMC7745181/"})
+
+
+def test_dispatcher_id_without_full_text_is_404(dispatcher, stub_config):
+    assert dispatch(dispatcher, "1")[0] == 404
+
+
+def test_dispatcher_id_when_ncbi_errors_is_502(dispatcher, stub_config):
+    stub_config.error_rate = 1.0
+    assert dispatch(dispatcher, "33301246")[0] == 502
+
+
+def test_dispatcher_id_when_ncbi_is_unreachable_is_503(dispatcher, idconv_unreachable):
+    assert dispatch(dispatcher, "33301246")[0] == 503
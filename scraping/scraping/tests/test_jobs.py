@@ -0,0 +1,135 @@
+import threading
+
+import pytest
+
+from common import jobs
+
+
+@pytest.fixture
+def local_jobs(monkeypatch, tmp_path):
+    """SQLite job store and a LocalJobRunner, installed as the process-wide ones."""
+    monkeypatch.setenv("JOB_RUNNER", "local")
+    monkeypatch.setenv("JOB_STORE_BACKEND", "sqlite")
+    monkeypatch.setenv("JOB_STORE_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(jobs, "_store", None)
+    runner = jobs.LocalJobRunner(workers=2)
+    monkeypatch.setattr(jobs, "_runner", runner)
+    yield jobs.get_job_store(), runner
+    runner.shutdown()
+
+
+class Extractor:
+    """An execute function that blocks until released and counts its runs."""
+
+    def __init__(self, result=None, error=None):
+        self.result = result if result is not None else {"content": ["text"]}
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, job):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if self.error:
+            raise Exception(self.error)
+        return self.result
+
+
+PARAMS = {"url": "https://pmc.ncbi.nlm.nih.gov/articles/PMC7745181/", "sections": "body"}
+
+
+def test_job_id_is_stable_across_url_spellings():
+    same = [
+        {"url": "https://pmc.ncbi.nlm.nih.gov/articles/PMC7745181/", "sections": "body"},
+        {"url": "http://PMC.ncbi.nlm.nih.gov/articles/PMC7745181?utm_source=x", "sections": "body"},
+    ]
+    assert len({jobs.job_id_for("pubmed", params) for params in same}) == 1
+    assert jobs.job_id_for("pubmed", PARAMS) != jobs.job_id_for("pubmed", {**PARAMS, "sections": "front"})
+    assert jobs.job_id_for("pubmed", PARAMS) != jobs.job_id_for("plos", PARAMS)
+
+
+def test_repeat_submissions_share_one_run(local_jobs):
+    store, runner = local_jobs
+    extractor = Extractor()
+    first = jobs.submit_job("pubmed", PARAMS, extractor)
+    assert first["status"] in (jobs.PENDING, jobs.RUNNING)
+    assert extractor.started.wait(5)
+    second = jobs.submit_job("pubmed", dict(PARAMS), extractor)
+    assert second["job_id"] == first["job_id"]
+    assert second["status"] == jobs.RUNNING
+
+    extractor.release.set()
+    runner.shutdown()
+    done = store.get(first["job_id"])
+    assert (done["status"], done["result"], done["error"]) == (jobs.DONE, extractor.result, None)
+    # A completed job answers later submissions with its stored result
+    assert jobs.submit_job("pubmed", PARAMS, extractor)["result"] == extractor.result
+    assert extractor.calls == 1
+
+
+def test_failed_job_records_error_and_runs_again(local_jobs):
+    store, runner = local_jobs
+    failing = Extractor(error="Extraction failed")
+    failing.release.set()
+    job_id = jobs.submit_job("pubmed", PARAMS, failing)["job_id"]
+    runner.shutdown()
+    failed = store.get(job_id)
+    assert (failed["status"], failed["error"], failed["result"]) == (jobs.FAILED, "Extraction failed", None)
+
+    retry = jobs.LocalJobRunner(workers=1)
+    jobs.set_job_runner(retry)
+    working = Extractor()
+    working.release.set()
+    jobs.submit_job("pubmed", PARAMS, working)
+    retry.shutdown()
+    assert store.get(job_id)["status"] == jobs.DONE
+    assert working.calls == 1
+
+
+def test_runner_that_cannot_start_fails_the_job(local_jobs):
+    class BrokenRunner:
+        def submit(self, store, job, execute):
+            raise RuntimeError("invoke throttled")
+
+    jobs.set_job_runner(BrokenRunner())
+    job = jobs.submit_job("pubmed", PARAMS, Extractor())
+    assert job["status"] == jobs.FAILED
+    assert job["error"] == "Could not start job: invoke throttled"
+
+
+def test_claims(local_jobs, monkeypatch):
+    store, _ = local_jobs
+    job = {"job_id": jobs.job_id_for("pubmed", PARAMS), "source": "pubmed", "params": PARAMS}
+    assert store.claim(job)
+    assert not store.claim(job)
+    store.update(job["job_id"], jobs.RUNNING)
+    assert not store.claim(job)
+    # A running job nobody has updated for JOB_STALE_AFTER is presumed lost
+    monkeypatch.setattr(jobs, "JOB_STALE_AFTER", -1)
+    assert store.claim(job)
+    store.update(job["job_id"], jobs.DONE, result={"content": []})
+    assert not store.claim(job)
+    monkeypatch.setattr(jobs, "JOB_RESULT_TTL", -1)
+    assert store.claim(job)
+    assert store.get(job["job_id"])["result"] is None
+
+
+@pytest.mark.parametrize("runner, backend, expected", [
+    (None, None, ("lambda", "dynamodb")),
+    ("local", None, ("local", "sqlite")),
+    ("local", "dynamodb", ("local", "dynamodb")),
+    ("lambda", "sqlite", RuntimeError),
+])
+def test_job_backends(monkeypatch, runner, backend, expected):
+    for name, value in (("JOB_RUNNER", runner), ("JOB_STORE_BACKEND", backend)):
+        if value is None:
+            monkeypatch.delenv(name, raising=False)
+        else:
+            monkeypatch.setenv(name, value)
+    if expected is RuntimeError:
+        with pytest.raises(RuntimeError):
+            jobs.job_backends()
+    else:
+        assert jobs.job_backends() == expected
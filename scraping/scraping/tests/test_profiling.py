@@ -0,0 +1,107 @@
+import cProfile
+import glob
+import importlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from common import profiling
+
+
+@pytest.fixture
+def profiling_on(monkeypatch, tmp_path):
+    # PROFILE and PROFILE_OUTPUT are read at import
+    monkeypatch.setenv("PROFILE", "on")
+    monkeypatch.setenv("PROFILE_OUTPUT", str(tmp_path))
+    yield importlib.reload(profiling), tmp_path
+    monkeypatch.delenv("PROFILE")
+    importlib.reload(profiling)
+
+
+def nested_search(module):
+    @module.profiled("test.inner")
+    def inner(x):
+        return x * 2
+
+    @module.profiled("test.outer")
+    def outer(values):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            return list(executor.map(inner, values))
+
+    return outer
+
+
+def test_nested_profiled_call_on_worker_thread(profiling_on):
+    module, out_dir = profiling_on
+    assert nested_search(module)([1, 2, 3]) == [2, 4, 6]
+    assert glob.glob(os.path.join(out_dir, "test.outer-*.prof"))
+
+
+class SingleProfiler(cProfile.Profile):
+    """Python 3.12+ behaviour on any version: one enabled profiler per process."""
+    active = None
+    lock = threading.Lock()
+
+    def enable(self, *args, **kwargs):
+        with SingleProfiler.lock:
+            if SingleProfiler.active is not None:
+                raise ValueError("Another profiling tool is already active")
+            SingleProfiler.active = self
+        super().enable(*args, **kwargs)
+
+    def disable(self):
+        super().disable()
+        with SingleProfiler.lock:
+            if SingleProfiler.active is self:
+                SingleProfiler.active = None
+
+
+def test_pooled_call_runs_unprofiled_when_profiler_is_taken(profiling_on, monkeypatch):
+    module, out_dir = profiling_on
+    monkeypatch.setattr(module.cProfile, "Profile", SingleProfiler)
+    assert nested_search(module)([1, 2, 3]) == [2, 4, 6]
+    assert glob.glob(os.path.join(out_dir, "test.outer-*.prof"))
+    assert not glob.glob(os.path.join(out_dir, "test.inner-*.prof"))
+
+
+def test_overlapping_calls_stop_tracing_when_the_starter_finishes_first(profiling_on):
+    module, out_dir = profiling_on
+    first_running, second_running, release_second = threading.Event(), threading.Event(), threading.Event()
+
+    @module.profiled("test.first")
+    def first():
+        first_running.set()
+        second_running.wait(5)
+
+    @module.profiled("test.second")
+    def second():
+        second_running.set()
+        release_second.wait(5)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        starter = executor.submit(first)
+        # first has turned tracing on before second starts
+        first_running.wait(5)
+        later = executor.submit(second)
+        starter.result()
+        assert module.tracemalloc.is_tracing()
+        release_second.set()
+        later.result()
+
+    assert module._tracing_users == 0
+    assert not module.tracemalloc.is_tracing()
+
+
+def test_tracing_started_elsewhere_is_left_running(profiling_on):
+    module, out_dir = profiling_on
+    module.tracemalloc.start()
+    try:
+        module._start_tracing()
+        module._start_tracing()
+        module._stop_tracing()
+        module._stop_tracing()
+        assert module.tracemalloc.is_tracing()
+    finally:
+        module.tracemalloc.stop()
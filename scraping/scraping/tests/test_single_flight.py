@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+from common import single_flight as single_flight_module
+from common.single_flight import SingleFlight, single_flight
+
+
+class CountingEvent(threading.Event):
+    """Counts the callers waiting on it, so a test knows every follower has arrived."""
+    waiters = 0
+    lock = threading.Lock()
+
+    def wait(self, timeout=None):
+        with CountingEvent.lock:
+            CountingEvent.waiters += 1
+        return super().wait(timeout)
+
+
+@pytest.fixture
+def counted_waits(monkeypatch):
+    class Call(single_flight_module._Call):
+        def __init__(self):
+            super().__init__()
+            self.done = CountingEvent()
+
+    CountingEvent.waiters = 0
+    monkeypatch.setattr(single_flight_module, "_Call", Call)
+    return CountingEvent
+
+
+def run_concurrently(callers, target):
+    outcomes = [None] * callers
+
+    def call(i):
+        try:
+            outcomes[i] = ("ok", target())
+        except Exception as e:
+            outcomes[i] = ("error", e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def wait_for_followers(counted_waits, count):
+    for _ in range(500):
+        if counted_waits.waiters >= count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"only {counted_waits.waiters} of {count} followers arrived")
+
+
+def test_followers_share_the_leaders_result(counted_waits):
+    flights = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def fetch():
+        runs.append(1)
+        release.wait(5)
+        return {"articles": [1, 2]}
+
+    threads, outcomes = run_concurrently(5, lambda: flights.do("listing|q", fetch))
+    wait_for_followers(counted_waits, 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(runs) == 1
+    assert all(status == "ok" for status, _ in outcomes)
+    assert len({id(result) for _, result in outcomes}) == 1
+
+
+def test_followers_get_the_leaders_exception(counted_waits):
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise ValueError("upstream 503")
+
+    threads, outcomes = run_concurrently(4, lambda: flights.do("listing|q", fetch))
+    wait_for_followers(counted_waits, 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    errors = [error for status, error in outcomes if status == "error"]
+    assert len(errors) == 4
+    assert all(isinstance(error, ValueError) and str(error) == "upstream 503" for error in errors)
+
+
+def test_nothing_is_kept_after_the_call():
+    flights = SingleFlight()
+    results = iter([1, 2])
+    assert flights.do("key", lambda: next(results)) == 1
+    assert flights.do("key", lambda: next(results)) == 2
+    with pytest.raises(KeyError):
+        flights.do("key", lambda: {}["missing"])
+    assert flights.do("key", lambda: 3) == 3
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flights = SingleFlight()
+    release = threading.Event()
+    threads, outcomes = run_concurrently(1, lambda: flights.do("slow", lambda: release.wait(5)))
+    assert flights.do("fast", lambda: "done") == "done"
+    release.set()
+    threads[0].join(5)
+    assert outcomes == [("ok", True)]
+
+
+def test_without_a_lease_table_lookup_is_not_used(monkeypatch):
+    monkeypatch.delenv("SINGLE_FLIGHT_TABLE", raising=False)
+
+    def lookup():
+        raise AssertionError("lookup is only polled while another container holds the lease")
+
+    assert single_flight("article|x", lambda: "parsed", lookup=lookup) == "parsed"